@@ -7,7 +7,7 @@ from sys import platform
 from ctypes import cdll, c_int, c_char_p, POINTER, c_size_t
 
 
-def call_tool(name, args):
+def call_tool(name, args, max_procs=0):
     # Change the current directory
     dir_path = os.path.dirname(os.path.realpath(__file__))
     os.chdir(dir_path)
@@ -26,14 +26,17 @@ def call_tool(name, args):
         'target/release/{}whitebox_tools.{}'.format(prefix, ext))
 
     wb_tools.run_tool.restype = c_int
+    # tool name, arguments, their count and the most worker threads
+    # the tool may use (0 for the default)
     wb_tools.run_tool.argtypes = [
-        c_char_p, POINTER(c_char_p), c_size_t]
+        c_char_p, POINTER(c_char_p), c_size_t, c_size_t]
 
     wb_tools.print_tool.argtypes = [
         c_char_p]
 
-    args_list = (c_char_p * len(args))(*args)
-    ret = wb_tools.run_tool(name, args_list, len(args_list))
+    args_list = (c_char_p * len(args))(*(a.encode('utf-8') for a in args))
+    # nonzero if the tool failed; the error is in its output
+    ret = wb_tools.run_tool(name.encode('utf-8'), args_list, len(args_list), max_procs)
     print("Return value:", ret)
 
 
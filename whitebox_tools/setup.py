@@ -7,12 +7,20 @@ import versioneer
 version = versioneer.get_version()
 cmdclass = versioneer.get_cmdclass()
 
+LISTTOOLS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'whitebox_tools', 'data', 'listtools.txt')
+
+
 def make_console_scripts():
-    import whitebox_tools as wt
-    scripts = []
-    for tool in wt.tools:
-        line = 'wb-{0} = whitebox_tools:{0}Cli'.format(tool)
-        scripts.append(line)
+    # wb-<Tool> aliases of the wb dispatcher, which takes the tool from
+    # the script name (read from the data file so the package itself is
+    # not imported)
+    scripts = ['wb = whitebox_tools.wb:main']
+    with open(LISTTOOLS_FILE) as f:
+        for line in f:
+            tool = line.split(':')[0].strip()
+            if tool:
+                scripts.append('wb-{} = whitebox_tools.wb:main'.format(tool))
     return scripts
 
 
@@ -24,7 +32,7 @@ setup(name='whitebox_tools',
       install_requires=[],
       packages=find_packages(),
       entry_points={
-        'console_scripts': make_console_scripts(), #['whitebox_tools = whitebox_tools.whitebox_cli:call_whitebox_cli'],
+        'console_scripts': make_console_scripts(),
       },
       extra_link_args=['-headerpad_max_install_names',]
     )
@@ -7,7 +7,6 @@ License: MIT
 */
 
 extern crate byteorder;
-extern crate num_cpus;
 
 pub mod arcascii_raster;
 pub mod arcbinary_raster;
@@ -597,7 +596,7 @@ impl Raster {
     }
 
     pub fn update_min_max(&mut self) {
-        let num_procs = num_cpus::get();
+        let num_procs = ::tools::get_num_procs();
         let nodata = self.configs.nodata;
         let values = Arc::new(self.data.clone());
         let (tx, rx) = mpsc::channel();
@@ -669,7 +668,7 @@ impl Raster {
         let values = Arc::new(self.data.clone());
         let mut starting_idx;
         let mut ending_idx = 0;
-        let num_procs = num_cpus::get();
+        let num_procs = ::tools::get_num_procs();
         let num_cells = self.num_cells();
         let block_size = num_cells / num_procs;
         let (tx, rx) = mpsc::channel();
@@ -715,7 +714,7 @@ impl Raster {
         let mean = self.calculate_mean();
         let nodata = self.configs.nodata;
         let values = Arc::new(self.data.clone());
-        let num_procs = num_cpus::get();
+        let num_procs = ::tools::get_num_procs();
         let num_cells = self.num_cells();
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
@@ -11,42 +11,83 @@
 // pub mod tools;
 // pub mod structures;
 
+// use std::panic;
 // use std::path;
 // use std::slice;
-// use std::ffi::CStr;
-// use std::str;
-// use libc::{size_t, c_char};
+// use std::ffi::{CStr, CString};
+// use std::sync::Mutex;
+// use libc::{size_t, c_char, c_int};
 // use tools::ToolManager;
 
+// // Output callback registered by the host (e.g. the Python WhiteboxTools
+// // 'library' backend). It receives each line of tool output and returns
+// // nonzero when the host wants the running tool to stop.
+// pub type OutputCallback = Option<extern "C" fn(*const c_char) -> c_int>;
+
+// lazy_static! {
+//     static ref OUTPUT_CALLBACK: Mutex<OutputCallback> = Mutex::new(None);
+// }
+
 // #[no_mangle]
-// pub extern fn run_tool(tool_name: *const c_char, args: *const *const c_char, length: size_t) -> i32 {
-//     let c_str = unsafe {
-//         assert!(!tool_name.is_null());
-//         CStr::from_ptr(tool_name)
-//     };
+// pub extern fn set_output_callback(callback: OutputCallback) {
+//     *OUTPUT_CALLBACK.lock().unwrap() = callback;
+// }
 
-//     let tool = c_str.to_str().unwrap().to_lowercase().replace("_", "");
+// /// Sends a line of output to the registered callback, or to stdout if there
+// /// is none. Returns true if the host asked for the tool to be cancelled.
+// pub fn output_line(line: &str) -> bool {
+//     match *OUTPUT_CALLBACK.lock().unwrap() {
+//         Some(callback) => {
+//             let c_line = CString::new(line).unwrap_or_default();
+//             callback(c_line.as_ptr()) != 0
+//         },
+//         None => {
+//             println!("{}", line);
+//             false
+//         },
+//     }
+// }
 
-//     let values = unsafe { slice::from_raw_parts(args, length as usize) };
-//     let strs: Vec<&str> = values.iter()
-//         .map(|&p| unsafe { CStr::from_ptr(p) })  // iterator of &CStr
-//         .map(|cs| cs.to_bytes())                 // iterator of &[u8]
-//         .map(|bs| str::from_utf8(bs).unwrap())   // iterator of &str
-//         .collect();
+// /// Runs a tool; max_procs limits its worker threads (0 for the default, see
+// /// tools::get_num_procs) without changing the process environment. Returns 0
+// /// on success and 1 if the arguments are invalid or the tool fails, with the
+// /// error sent to the output callback: it never panics, as a panic across the
+// /// FFI boundary would abort the host process.
+// #[no_mangle]
+// pub extern fn run_tool(tool_name: *const c_char, args: *const *const c_char, length: size_t,
+//                        max_procs: size_t) -> i32 {
+//     if tool_name.is_null() || (length > 0 && args.is_null()) {
+//         output_line("Error: null tool name or arguments");
+//         return 1;
+//     }
+//     let tool = match unsafe { CStr::from_ptr(tool_name) }.to_str() {
+//         Ok(s) => s.to_lowercase().replace("_", ""),
+//         Err(_) => {
+//             output_line("Error: the tool name must be UTF-8");
+//             return 1;
+//         },
+//     };
 
+//     let values = unsafe { slice::from_raw_parts(args, length as usize) };
 //     let mut args: Vec<String> = vec![];
-//     for s in strs {
-//         args.push(s.to_string());
+//     for &p in values {
+//         match unsafe { CStr::from_ptr(p) }.to_str() {
+//             Ok(s) => args.push(s.to_string()),
+//             Err(_) => {
+//                 output_line("Error: tool arguments must be UTF-8");
+//                 return 1;
+//             },
+//         }
 //     }
 
-//     println!("Tool Name: {}", tool);
+//     output_line(&format!("Tool Name: {}", tool));
 
 //     let mut working_dir = String::new();
 //     let sep: &str = &path::MAIN_SEPARATOR.to_string();
 //     let mut verbose = false;
 //     let mut tool_args_vec: Vec<String> = vec![];
 //     for arg in &args {
-//         println!("{}", arg);
+//         output_line(arg);
 //         if arg.starts_with("-cd") || arg.starts_with("--cd") || arg.starts_with("--wd") {
 //             let mut v = arg.replace("--cd", "")
 //                 .replace("--wd", "")
@@ -68,14 +109,28 @@
 //         }
 //     }
 
-//     let tm = ToolManager::new(&working_dir, &verbose).unwrap();
-//     //let _ = tm.run_tool(tool, tool_args_vec);
-//     let _ = match tm.run_tool(tool, tool_args_vec) {
-//         Ok(()) => (), // do nothing
+//     let tm = match ToolManager::new(&working_dir, &verbose) {
+//         Ok(tm) => tm,
 //         Err(error) => {
-//             panic!("There was a problem running tool {:?}", error)
+//             output_line(&format!("Error: {}", error));
+//             return 1;
 //         },
 //     };
+//     tools::set_num_procs(max_procs as usize);
+//     // a panicking tool must not unwind into the host process
+//     let result = panic::catch_unwind(panic::AssertUnwindSafe(|| tm.run_tool(tool, tool_args_vec)));
+//     tools::set_num_procs(0);
+//     match result {
+//         Ok(Ok(())) => (),
+//         Ok(Err(error)) => {
+//             output_line(&format!("Error: There was a problem running the tool: {}", error));
+//             return 1;
+//         },
+//         Err(_) => {
+//             output_line("Error: the tool panicked");
+//             return 1;
+//         },
+//     }
 
 
 //     // let c_str = unsafe {
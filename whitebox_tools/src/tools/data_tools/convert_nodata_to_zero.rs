@@ -6,7 +6,6 @@ Last Modified: July 26, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -138,7 +137,7 @@ impl WhiteboxTool for ConvertNodataToZero {
         let mut output = Raster::initialize_using_file(&output_file, &input);
         output.configs.nodata = -32768f64; // make sure that the output image doesn't use a zero-valued nodata.
         
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -6,7 +6,6 @@ Last Modified: July 11, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -191,7 +190,7 @@ impl WhiteboxTool for CreatePlane {
         output.configs.data_type = DataType::F32;
         output.configs.palette = "spectrum.plt".to_string();
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let tx = tx.clone();
@@ -6,7 +6,6 @@ Last Modified: July 17, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -154,7 +153,7 @@ impl WhiteboxTool for D8FlowAccumulation {
         let diag_cell_size = (cell_size_x * cell_size_x + cell_size_y * cell_size_y).sqrt();
         
         let mut flow_dir: Array2D<i8> = Array2D::new(rows, columns, -1, -1)?;
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -1,5 +1,4 @@
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -125,7 +124,7 @@ impl WhiteboxTool for D8Pointer {
         let nodata = input.configs.nodata;
         let columns = input.configs.columns as isize;
                 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
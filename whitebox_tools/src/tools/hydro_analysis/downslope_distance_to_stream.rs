@@ -6,7 +6,6 @@ Last Modified: July 9, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -152,7 +151,7 @@ impl WhiteboxTool for DownslopeDistanceToStream {
                                 "The input files must have the same number of rows and columns and spatial extent."));
         }
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let dem = dem.clone();
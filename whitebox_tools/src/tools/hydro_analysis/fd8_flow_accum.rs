@@ -6,7 +6,6 @@ Last Modified: July 2, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -172,7 +171,7 @@ impl WhiteboxTool for FD8FlowAccumulation {
         let mut num_inflowing: Array2D<i8> = Array2D::new(rows, columns, -1, -1)?;
         let mut starting_row;
         let mut ending_row = 0;
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
         let (tx, rx) = mpsc::channel();
         let mut id = 0;
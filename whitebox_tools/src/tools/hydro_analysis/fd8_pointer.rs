@@ -1,5 +1,4 @@
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -117,7 +116,7 @@ impl WhiteboxTool for FD8Pointer {
         let rows = input.configs.rows as isize;
         let nodata = input.configs.nodata;
         let columns = input.configs.columns as isize;
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -9,7 +9,6 @@ NOTES: This tool provides a full workflow D8 flow operation. This includes remov
 the D8 pointer raster and finally the D8 flow accumulation operation. 
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::sync::Arc;
 use std::sync::mpsc;
@@ -197,7 +196,7 @@ impl WhiteboxTool for FlowAccumulationFullWorkflow {
 
         let eight_grid_res = input.configs.resolution_x * 8.0;
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -1,5 +1,4 @@
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -125,7 +124,7 @@ impl WhiteboxTool for NumInflowingNeighbours {
 
         let mut starting_row;
         let mut ending_row = 0;
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
         let (tx, rx) = mpsc::channel();
         let mut id = 0;
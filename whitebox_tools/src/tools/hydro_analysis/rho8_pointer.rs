@@ -1,5 +1,4 @@
 extern crate time;
-extern crate num_cpus;
 extern crate rand;
 
 use std::env;
@@ -122,7 +121,7 @@ impl WhiteboxTool for Rho8Pointer {
         let mut output = Raster::initialize_using_file(&output_file, &input);
         let rows = input.configs.rows as isize;
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -6,7 +6,6 @@ Last Modified: June 26, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -228,7 +227,7 @@ impl WhiteboxTool for AdaptiveFilter {
         let i2 = Arc::new(integral2); // wrap integral2 in an Arc
         let i_n = Arc::new(integral_n); // wrap integral_n in an Arc
         let mut output = Raster::initialize_using_file(&output_file, &input);
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
         let mut starting_row;
         let mut ending_row = 0;
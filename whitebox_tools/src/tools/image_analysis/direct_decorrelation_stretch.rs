@@ -6,7 +6,6 @@ Last Modified: July 21, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -176,7 +175,7 @@ impl WhiteboxTool for DirectDecorrelationStretch {
         let nodata = input.configs.nodata;
         let rgb_nodata = 0f64;
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -8,7 +8,6 @@ License: MIT
 NOTES: The input image should contain integer values but floating point data will be handled using a multiplier.
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -182,7 +181,7 @@ impl WhiteboxTool for DiversityFilter {
         
         let mut starting_row;
         let mut ending_row = 0;
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
         let (tx, rx) = mpsc::channel();
         let mut id = 0;
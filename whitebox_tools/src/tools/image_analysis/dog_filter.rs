@@ -6,7 +6,6 @@ Last Modified: June 26, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -250,7 +249,7 @@ impl WhiteboxTool for DiffOfGaussianFilter {
     
         let mut output = Raster::initialize_using_file(&output_file, &input);
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
         let (tx, rx) = mpsc::channel();
         let mut starting_row;
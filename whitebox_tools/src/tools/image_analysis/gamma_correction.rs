@@ -8,7 +8,6 @@ License: MIT
 NOTES: The tool should be updated to take multiple file inputs.
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -143,7 +142,7 @@ impl WhiteboxTool for GammaCorrection {
         if gamma < 0.0 { gamma = 0f64; }
         if gamma > 4.0 { gamma = 4f64; }
         
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -6,7 +6,6 @@ Last Modified: July 25, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -196,7 +195,7 @@ impl WhiteboxTool for IhsToRgb {
                                 "The input files must have the same number of rows and columns and spatial extent."));
         }
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input_i = input_i.clone();
@@ -6,7 +6,6 @@ Last Modified: June 27, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::cmp::Ordering::Less;
 use std::env;
@@ -183,7 +182,7 @@ impl WhiteboxTool for KNearestMeanFilter {
         let nodata = input.configs.nodata;
         
         let (tx, rx) = mpsc::channel();
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         for tid in 0..num_procs {
             let input = input.clone();
             let tx = tx.clone();
@@ -6,7 +6,6 @@ Last Modified: June 27, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -189,7 +188,7 @@ impl WhiteboxTool for LeeFilter {
         let nodata = input.configs.nodata;
         
         let (tx, rx) = mpsc::channel();
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         for tid in 0..num_procs {
             let input = input.clone();
             let tx = tx.clone();
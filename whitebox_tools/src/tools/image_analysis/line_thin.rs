@@ -9,7 +9,6 @@ NOTE: This algorithm can't easily be parallelized because the output raster must
 and written to during the same loop. Doing so would involve using a mutex.
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -135,7 +134,7 @@ impl WhiteboxTool for LineThinning {
 
         let mut starting_row;
         let mut ending_row = 0;
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
         let (tx, rx) = mpsc::channel();
         let mut id = 0;
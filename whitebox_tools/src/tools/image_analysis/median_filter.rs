@@ -8,7 +8,6 @@ License: MIT
 NOTES: This tool uses the efficient running-median filtering algorithm of Huang, Yang, and Tang (1979).
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -188,7 +187,7 @@ impl WhiteboxTool for MedianFilter {
         let bin_nodata = i64::MIN;
         let mut binned_data : Array2D<i64> = Array2D::new(rows, columns, bin_nodata, bin_nodata)?;
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -6,7 +6,6 @@ Last Modified: July 27, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -194,7 +193,7 @@ impl WhiteboxTool for PanchromaticSharpening {
             output_file = format!("{}{}", working_directory, output_file);
         }
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
 
         // let get_row_from_y; //: &Fn(f64) -> isize;
         // let get_column_from_x; //: &Fn(f64) -> isize;
@@ -6,7 +6,6 @@ Last Modified: July 26, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -174,7 +173,7 @@ impl WhiteboxTool for RgbToIhs {
             saturation_file = format!("{}{}", working_directory, saturation_file);
         }
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
 
         if !use_composite {
             if verbose { println!("Reading red band data...") };
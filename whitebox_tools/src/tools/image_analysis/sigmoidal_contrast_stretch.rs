@@ -8,7 +8,6 @@ License: MIT
 NOTES: The tool should be updated to take multiple file inputs.
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -166,7 +165,7 @@ impl WhiteboxTool for SigmoidalContrastStretch {
         let a = 1f64/(1f64+(gain * cutoff).exp());
         let b = 1f64/(1f64+(gain*(cutoff-1f64)).exp()) - 1f64/(1f64+(gain*cutoff).exp());
         
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -8,7 +8,6 @@ License: MIT
 NOTES: The tool should be updated to take multiple file inputs.
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -158,7 +157,7 @@ impl WhiteboxTool for StandardDeviationContrastStretch {
                                 "The calculated clip values are incorrect."));
         }
         
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -6,7 +6,6 @@ Last Modified: June 28, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -176,7 +175,7 @@ impl WhiteboxTool for TophatTransform {
         let nodata = input.configs.nodata;
         let mut starting_row;
         let mut ending_row = 0;
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
             
 
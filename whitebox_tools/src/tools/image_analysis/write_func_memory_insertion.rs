@@ -6,7 +6,6 @@ Last Modified: July 19, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 // use std::mem;
 use std::env;
@@ -177,7 +176,7 @@ impl WhiteboxTool for WriteFunctionMemoryInsertion {
         let blue_range = input_b.configs.display_max - blue_min;
         
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input_r = input_r.clone();
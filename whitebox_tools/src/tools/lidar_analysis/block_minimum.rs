@@ -6,7 +6,6 @@ Last Modified: July 16, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::f64;
@@ -191,7 +190,7 @@ impl WhiteboxTool for BlockMinimum {
         let input = Arc::new(input); // wrap input in an Arc
         let mut starting_pt;
         let mut ending_pt = 0;
-        let num_procs = num_cpus::get();
+        let num_procs = ::tools::get_num_procs();
         let pt_block_size = n_points / num_procs;
         let (tx, rx) = mpsc::channel();
         let mut id = 0;
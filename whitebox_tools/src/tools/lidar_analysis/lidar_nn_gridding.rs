@@ -10,7 +10,6 @@ Exclude points based on max scan angle divation
 Interpolate all LAS files within a directory (i.e. directory input rather than single file).
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::f64;
@@ -395,7 +394,7 @@ impl WhiteboxTool for LidarNearestNeighbourGridding {
 
         let frs = Arc::new(frs); // wrap FRS in an Arc
         let interp_vals = Arc::new(interp_vals); // wrap interp_vals in an Arc
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
         let (tx, rx) = mpsc::channel();
         let mut starting_row;
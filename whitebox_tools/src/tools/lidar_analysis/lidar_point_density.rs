@@ -6,7 +6,6 @@ Last Modified: July 17, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::f64;
@@ -284,7 +283,7 @@ impl WhiteboxTool for LidarPointDensity {
 
         let frs = Arc::new(frs); // wrap FRS in an Arc
         let search_area = f64::consts::PI * search_radius * search_radius;
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let frs = frs.clone();
@@ -9,7 +9,6 @@ NOTE: This tool differs from the Whitebox GAT equivalent in that in additional t
 of continous data, it also handles Boolean data by reversing values (i.e. 0-1 to 1-0).
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -128,7 +127,7 @@ impl WhiteboxTool for Negate {
 
         let mut starting_row;
         let mut ending_row = 0;
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
         let (tx, rx) = mpsc::channel();
         let mut id = 0;
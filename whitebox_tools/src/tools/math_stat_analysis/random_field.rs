@@ -6,7 +6,6 @@ Last Modified: July 11, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 extern crate rand;
 
 use std::env;
@@ -138,7 +137,7 @@ impl WhiteboxTool for RandomField {
 
         let mut output = Raster::initialize_using_file(&output_file, &input);
         
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let tx = tx.clone();
@@ -6,7 +6,6 @@ Last Modified: July 1, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -116,7 +115,7 @@ impl WhiteboxTool for RasterSummaryStats {
         //let (mean, stdev) = input.calculate_mean_and_stdev();
         
         // calculate the number of downslope cells
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -6,7 +6,6 @@ Last Modified: July 14, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 extern crate rand;
 
 use std::env;
@@ -333,7 +332,7 @@ impl WhiteboxTool for TurningBandsSimulation {
             }
 
             // scan through each grid cell and assign it the closest value on the line segment
-            let num_procs = num_cpus::get() as isize;
+            let num_procs = ::tools::get_num_procs() as isize;
             let (tx, rx) = mpsc::channel();
             let y = Arc::new(y);
             for tid in 0..num_procs {
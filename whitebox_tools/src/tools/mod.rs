@@ -7,7 +7,11 @@ pub mod math_stat_analysis;
 pub mod stream_network_analysis;
 pub mod terrain_analysis;
 
+extern crate num_cpus;
+
 use tools;
+use std::cell::Cell;
+use std::env;
 use std::io::{Error, ErrorKind};
 
 #[derive(Default)]
@@ -672,6 +676,38 @@ pub trait WhiteboxTool {
                -> Result<(), Error>;
 }
 
+thread_local! {
+    static NUM_PROCS: Cell<usize> = Cell::new(0);
+}
+
+/// Limits the tools run on the calling thread to n worker threads (0 for no
+/// limit of its own). A library host running several tools at once sets it
+/// per call rather than through the process-wide environment.
+pub fn set_num_procs(n: usize) {
+    NUM_PROCS.with(|procs| procs.set(n));
+}
+
+/// Returns the number of worker threads a tool should spawn: the limit set
+/// with set_num_procs on this thread, else the value of the
+/// WHITEBOX_MAX_PROCS environment variable if it is a positive integer, so that
+/// callers running several tools at once can share the cores between them,
+/// and the number of CPUs otherwise.
+pub fn get_num_procs() -> usize {
+    let n = NUM_PROCS.with(|procs| procs.get());
+    if n > 0 {
+        return n;
+    }
+    match env::var("WHITEBOX_MAX_PROCS") {
+        Ok(val) => {
+            match val.trim().parse::<usize>() {
+                Ok(n) if n > 0 => n,
+                _ => num_cpus::get(),
+            }
+        }
+        Err(_) => num_cpus::get(),
+    }
+}
+
 fn get_help<'a>(wt: Box<WhiteboxTool + 'a>) -> String {
     let tool_name = wt.get_tool_name();
     let description = wt.get_tool_description();
@@ -8,7 +8,6 @@ License: MIT
 NOTES: This tool should be updated to incorporate the option for an area-slope based threshold.
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -143,7 +142,7 @@ impl WhiteboxTool for ExtractStreams {
 
         let mut output = Raster::initialize_using_file(&output_file, &flow_accum);
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
         let (tx, rx) = mpsc::channel();
         let mut starting_row;
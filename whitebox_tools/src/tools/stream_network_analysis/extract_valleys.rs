@@ -6,7 +6,6 @@ Last Modified: July 12, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::cmp::Ordering::Equal;
 use std::env;
@@ -177,7 +176,7 @@ impl WhiteboxTool for ExtractValleys {
                 output.reinitialize_values(0f64);
                 
                 // This one can be performed conccurently.
-                let num_procs = num_cpus::get() as isize;
+                let num_procs = ::tools::get_num_procs() as isize;
                 let (tx, rx) = mpsc::channel();
                 for tid in 0..num_procs {
                     let input = input.clone();
@@ -259,7 +258,7 @@ impl WhiteboxTool for ExtractValleys {
             "JandR" => {
                 // This one can be performed conccurently.
                 // output.reinitialize_values(0f64);
-                let num_procs = num_cpus::get() as isize;
+                let num_procs = ::tools::get_num_procs() as isize;
                 let (tx, rx) = mpsc::channel();
                 for tid in 0..num_procs {
                     let input = input.clone();
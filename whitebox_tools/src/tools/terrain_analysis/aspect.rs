@@ -6,7 +6,6 @@ Last Modified: July 22, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -144,7 +143,7 @@ impl WhiteboxTool for Aspect {
         
         let mut output = Raster::initialize_using_file(&output_file, &input);
         
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -6,7 +6,6 @@ Last Modified: June 21, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -176,7 +175,7 @@ impl WhiteboxTool for DevFromMeanElev {
 
         let mut binned_data: Array2D<i32> = Array2D::new(rows, columns, bin_nodata32, bin_nodata32)?;
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let row_block_size = rows / num_procs;
         let (tx, rx) = mpsc::channel();
 
@@ -6,7 +6,6 @@ Last Modified: July 12, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -150,7 +149,7 @@ impl WhiteboxTool for ElevRelativeToWatershedMinMax {
         let max_watershed = watersheds.configs.maximum;
         let range_watersheds = max_watershed - min_watershed;
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -8,7 +8,6 @@ License: MIT
 NOTES: The tool should have the option to output a distance raster as well.
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -186,7 +185,7 @@ impl WhiteboxTool for HorizonAngle {
             y_step = 1;
         }
 
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
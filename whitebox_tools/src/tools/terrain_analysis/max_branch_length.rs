@@ -6,7 +6,6 @@ Last Modified: July 9, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -134,7 +133,7 @@ impl WhiteboxTool for MaxBranchLength {
         
         let flow_nodata = -2i8;
         
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
         let (tx, rx) = mpsc::channel();
         for tid in 0..num_procs {
             let input = input.clone();
@@ -6,7 +6,6 @@ Last Modified: July 20, 2017
 License: MIT
 */
 extern crate time;
-extern crate num_cpus;
 
 use std::env;
 use std::path;
@@ -210,7 +209,7 @@ impl WhiteboxTool for MaxElevationDeviation {
         let i2 = Arc::new(integral2); // wrap integral2 in an Arc
         let i_n = Arc::new(integral_n); // wrap integral_n in an Arc
         
-        let num_procs = num_cpus::get() as isize;
+        let num_procs = ::tools::get_num_procs() as isize;
 
         let mut output_mag = Raster::initialize_using_file(&output_mag_file, &input);
         let mut output_scale = Raster::initialize_using_file(&output_scale_file, &input);
@@ -1 +1,34 @@
-from whitebox_tools.whitebox_cli import *
+''' Python interface to whitebox-tools.
+
+The names exported by whitebox_cli (WhiteboxTools, callback, tools and a
+wrapper per tool, e.g. Slope and SlopeCli) are imported on first use, so
+importing the package does not load the tool data, NumPy or xarray.
+'''
+import os
+import sys
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def __getattr__(name):
+    # submodules are imported by the import system, not looked up here
+    if ((name.startswith('__') and name != '__all__') or
+            os.path.exists(os.path.join(_PACKAGE_DIR, name + '.py'))):
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    from whitebox_tools import whitebox_cli
+    try:
+        value = getattr(whitebox_cli, name)
+    except AttributeError:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    from whitebox_tools import whitebox_cli
+    return sorted(set(globals()) | set(whitebox_cli.__all__))
+
+
+if sys.version_info < (3, 7):
+    # no module __getattr__ (PEP 562)
+    from whitebox_tools.whitebox_cli import *
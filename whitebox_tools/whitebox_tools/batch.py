@@ -0,0 +1,276 @@
+''' Batch runs of whitebox-tools jobs from a JSON lines file ("wb batch").
+
+Each line of the jobs file is a JSON object such as
+
+    {"tool": "Slope", "args": {"dem": "DEM.dep", "output": "slope.dep"}, "id": "a"}
+
+where "args" maps parameter names (as in "wb <Tool> --help", without
+dashes) to values, and the optional "id" is copied to the job's result.
+Jobs are checked against the tool registry before any is run, then run
+concurrently.  One JSON result line is written per job, in the order the
+jobs finish.
+
+With a journal file ("wb batch --journal FILE"), the result of each job
+that succeeds is appended to the journal together with the size and
+modification time of its outputs.  Running the same jobs with the same
+journal again, e.g. after the machine running them rebooted, skips the
+jobs in the journal whose outputs are unchanged.  Jobs that were cut
+short have no journal entry, so their partly written outputs are redone,
+as are outputs deleted or changed since the journal entry was written.
+'''
+from __future__ import print_function
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+
+from whitebox_tools.registry import get_tool_spec
+from whitebox_tools.wb import cli_args
+
+
+class BatchJob(object):
+    ''' One line of a jobs file.  error is set if the line is invalid.
+    '''
+    def __init__(self, line_no, tool=None, args=None, job_id=None, error=None):
+        self.line_no = line_no
+        self.tool = tool
+        self.args = args or []
+        self.job_id = job_id
+        self.error = error
+
+
+def parse_job(line_no, line):
+    ''' Parses and validates one jobs file line, returning a BatchJob.
+    '''
+    tool = job_id = None
+    try:
+        job = json.loads(line)
+        if not isinstance(job, dict):
+            raise ValueError('a job must be a JSON object')
+        job_id = job.get('id')
+        tool = job.get('tool')
+        if not tool:
+            raise ValueError('a job needs a "tool"')
+        spec = get_tool_spec(tool)
+        job_args = job.get('args', {})
+        if not isinstance(job_args, dict):
+            raise ValueError('"args" must be a JSON object')
+        kwargs = {}
+        for name, value in job_args.items():
+            name = name.lstrip('-')
+            if name not in spec.by_name:
+                raise ValueError('Parameter {} is not in {}'.format(name, sorted(spec.by_name)))
+            if isinstance(value, (list, tuple)):
+                value = ';'.join(str(v) for v in value)
+            kwargs[name] = value
+        return BatchJob(line_no, tool, cli_args(spec, kwargs), job_id)
+    except ValueError as err:
+        return BatchJob(line_no, tool, job_id=job_id, error=str(err))
+
+
+def load_jobs(lines):
+    ''' Parses the non-blank lines of a jobs file into BatchJobs.
+    '''
+    return [parse_job(line_no, line)
+            for line_no, line in enumerate(lines, 1) if line.strip()]
+
+
+def job_result(job, result=None):
+    ''' Returns the JSON-serializable result record of a job, from its
+    RunResult (None for an invalid job).
+    '''
+    record = {'line': job.line_no, 'tool': job.tool}
+    if job.job_id is not None:
+        record['id'] = job.job_id
+    if result is None:
+        record.update(status='invalid', return_code=None, error=job.error)
+        return record
+    status = {0: 'ok', 2: 'cancelled'}.get(result.return_code, 'failed')
+    if result.timed_out:
+        status = 'timed_out'
+    record.update(status=status,
+                  return_code=result.return_code,
+                  wall_time=result.wall_time,
+                  user_time=result.user_time,
+                  sys_time=result.sys_time,
+                  max_rss=result.max_rss,
+                  compute_time=result.compute_time,
+                  outputs=result.outputs)
+    if status != 'ok':
+        errors = [line for line in result.log if line.lower().startswith('error')]
+        record['error'] = '\n'.join(errors or result.log[-5:])
+    return record
+
+
+def job_key(job):
+    ''' Identifies a job in a journal by its tool and arguments.
+    '''
+    payload = json.dumps([job.tool, sorted(job.args)])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _output_stamps(paths):
+    stamps = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stamps.append([st.st_size, st.st_mtime])
+    return stamps
+
+
+class Journal(object):
+    ''' An append-only file of completed jobs, see the module docstring.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        line = '\n'
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry
+                    except (ValueError, KeyError, TypeError):
+                        # the last line is cut short if the writer died
+                        continue
+        self._file = open(path, 'a')
+        if not line.endswith('\n'):
+            self._file.write('\n')
+
+    def completed(self, job):
+        ''' Returns the journaled result record of job if it completed
+        and its outputs are as it left them, otherwise None.
+        '''
+        entry = self.entries.get(job_key(job))
+        if entry is None:
+            return None
+        record = entry['record']
+        stamps = _output_stamps(record.get('outputs') or [])
+        if stamps is None or stamps != entry['stamps']:
+            return None
+        return record
+
+    def add(self, job, record):
+        ''' Appends the result record of a successful job.
+        '''
+        entry = {'key': job_key(job), 'record': record,
+                 'stamps': _output_stamps(record.get('outputs') or [])}
+        if entry['stamps'] is None:
+            return
+        with self._lock:
+            self.entries[entry['key']] = entry
+            self._file.write(json.dumps(entry, sort_keys=True) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def run_batch(jobs, out, wbt, max_workers=None, timeout=None, journal=None):
+    ''' Runs BatchJobs with at most max_workers (default: number of CPUs)
+    at a time, writing a JSON result line to the file out as each job
+    finishes.  Invalid jobs are reported without running.  Returns the
+    list of result records in job order.
+
+    journal:  a Journal recording the jobs that complete; jobs it already
+              records are skipped, and their records have "resumed": true
+    '''
+    from whitebox_tools.whitebox_base import split_threads
+    if max_workers is None:
+        max_workers = multiprocessing.cpu_count()
+    max_workers = max(1, min(max_workers, len(jobs) or 1))
+    threads = split_threads(max_workers)
+    records = {}
+    lock = threading.Lock()
+
+    def write(job, record):
+        with lock:
+            records[job.line_no] = record
+            out.write(json.dumps(record, sort_keys=True) + '\n')
+            out.flush()
+
+    def quiet(line):
+        pass
+
+    valid = []
+    for job in jobs:
+        if job.error is not None:
+            write(job, job_result(job))
+            continue
+        record = journal.completed(job) if journal is not None else None
+        if record is not None:
+            record = dict(record, line=job.line_no, resumed=True)
+            record.pop('id', None)
+            if job.job_id is not None:
+                record['id'] = job.job_id
+            write(job, record)
+        else:
+            valid.append(job)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(wbt.run_tool, job.tool, job.args, quiet,
+                                   verbose=False, timeout=timeout,
+                                   threads=threads): job
+                   for job in valid}
+        for future in as_completed(futures):
+            job = futures[future]
+            record = job_result(job, future.result())
+            if journal is not None and record['status'] == 'ok':
+                journal.add(job, record)
+            write(job, record)
+    return [records[job.line_no] for job in jobs]
+
+
+def batch_main(argv, wbt=None):
+    ''' Entry point of "wb batch"; returns 0 if every job succeeded.
+    '''
+    parser = argparse.ArgumentParser(prog='wb batch',
+                                     description='Runs the whitebox-tools jobs in a JSON lines file')
+    parser.add_argument('jobs', help='jobs file, one JSON job per line ("-" for stdin)')
+    parser.add_argument('-j', '--max-workers', type=int, default=None,
+                        help='most jobs to run at once (default: number of CPUs)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='file for the JSON result lines ("-" for stdout)')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='seconds after which a job is stopped')
+    parser.add_argument('--journal', default=None,
+                        help='file recording completed jobs; rerunning with it '
+                             'skips them')
+    args = parser.parse_args(argv)
+    if args.jobs == '-':
+        jobs = load_jobs(sys.stdin)
+    else:
+        with open(args.jobs) as f:
+            jobs = load_jobs(f)
+    if wbt is None:
+        from whitebox_tools.whitebox_base import WhiteboxTools
+        wbt = WhiteboxTools()
+    # "Running: ..." lines would be mixed into the result lines on stdout
+    wbt.set_verbose_mode(False)
+    journal = Journal(args.journal) if args.journal else None
+    try:
+        if args.output == '-':
+            records = run_batch(jobs, sys.stdout, wbt, args.max_workers, args.timeout,
+                                journal)
+        else:
+            with open(args.output, 'w') as out:
+                records = run_batch(jobs, out, wbt, args.max_workers, args.timeout,
+                                    journal)
+    finally:
+        if journal is not None:
+            journal.close()
+    return 0 if all(r['status'] == 'ok' for r in records) else 1
@@ -0,0 +1,343 @@
+''' Chaining whitebox-tools runs as a lazy dependency graph.
+
+    with Pipeline() as p:
+        filled = p.add('FillDepressions', dem='DEM.dep')
+        sca = p.add('D8FlowAccumulation', dem=filled, out_type='sca')
+        cells = p.add('D8FlowAccumulation', dem=filled, out_type='cells')
+        streams = p.add('ExtractStreams', flow_accum=sca, threshold=100)
+        streams_arr, = p.run(streams, load=True)
+
+Adding a step only records it.  run() executes the steps the requested
+outputs depend on (here FillDepressions, the "sca" D8FlowAccumulation and
+ExtractStreams, not the "cells" one), starting each as soon as its inputs
+exist and running independent steps in parallel.  Steps pass their
+outputs to each other as file paths in the pipeline's work directory, so
+intermediate rasters are never loaded into xarray; only the outputs
+passed to run() are returned, as paths or (with load=True) DataArrays.
+
+With incremental=True (and a work_dir that persists between runs), each
+step that runs records a manifest of its arguments, the executable's
+version and the state of its input and output files, and later runs skip
+the steps whose manifest still matches, as make does.  check="mtime"
+(the default) compares input sizes and modification times and
+check="hash" their contents.  A step whose input changed reruns and
+rewrites its outputs, so the steps after it rerun too.  DataArray
+inputs are written anew by every process (see SerializedArrays), so
+incremental runs with them need check="hash".
+'''
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+from whitebox_tools.registry import get_tool_spec
+from whitebox_tools.result_cache import file_digest, raster_files
+from whitebox_tools.wb import cli_args
+from whitebox_tools.whitebox_base import (RunResult,
+                                          WhiteboxTools,
+                                          default_callback,
+                                          split_threads)
+
+CHECKS = ('mtime', 'hash')
+
+
+class StepOutput(object):
+    ''' One output parameter of a Step, for use as another step's input.
+    '''
+    def __init__(self, step, name):
+        self.step = step
+        self.name = name
+
+    @property
+    def path(self):
+        return self.step.outputs[self.name]
+
+    def __repr__(self):
+        return 'StepOutput({!r}, {!r})'.format(self.step, self.name)
+
+
+class Step(object):
+    ''' A tool call recorded in a Pipeline.
+
+    Passing a Step as an input passes its first output (see out() for the
+    others).  outputs maps output parameter names to file paths; result
+    is the RunResult once the step has run, and skipped is True if an
+    incremental run found its outputs up to date.
+    '''
+    def __init__(self, pipeline, index, tool, kwargs):
+        self.pipeline = pipeline
+        self.index = index
+        self.tool = tool
+        self.spec = get_tool_spec(tool)
+        self.kwargs = kwargs
+        self.outputs = {}
+        for name in self.spec.outputs:
+            value = kwargs.get(name)
+            if value is None:
+                value = os.path.join(pipeline.work_dir, '{}-{}-{}.dep'.format(index, tool, name))
+            self.outputs[name] = os.path.abspath(value)
+            kwargs[name] = self.outputs[name]
+        self.deps = []
+        for value in kwargs.values():
+            if isinstance(value, StepOutput) and value.step not in self.deps:
+                self.deps.append(value.step)
+        self.result = None
+        self.skipped = False
+
+    def out(self, name=None):
+        ''' Returns the StepOutput of output parameter name (default: the
+        tool's first output).
+        '''
+        if name is None:
+            if not self.spec.outputs:
+                raise ValueError('{} has no output parameter'.format(self.tool))
+            name = self.spec.outputs[0]
+        if name not in self.outputs:
+            raise ValueError('{} is not an output of {} ({})'.format(
+                name, self.tool, ', '.join(self.spec.outputs)))
+        return StepOutput(self, name)
+
+    def __repr__(self):
+        return 'Step({}, {!r})'.format(self.index, self.tool)
+
+
+class Pipeline(object):
+    ''' A lazily evaluated graph of tool calls, see the module docstring.
+
+    wbt:  WhiteboxTools to run the steps with (default: a new one)
+    work_dir:  directory for intermediate outputs (default: a temporary
+               directory, removed by close())
+    max_workers:  most steps to run at once (default: number of CPUs),
+                  each with its share of the CPUs as worker threads
+    incremental:  skip steps whose outputs are up to date (see the module
+                  docstring), with manifests kept in manifest_dir
+                  (default: work_dir/.manifests)
+    check:  how inputs are compared for incremental runs, "mtime" or
+            "hash"
+    '''
+    def __init__(self, wbt=None, work_dir=None, max_workers=None,
+                 callback=default_callback, incremental=False,
+                 manifest_dir=None, check='mtime'):
+        if check not in CHECKS:
+            raise ValueError('check must be one of {} (got {!r})'.format(CHECKS, check))
+        self.wbt = wbt or WhiteboxTools()
+        self._own_work_dir = work_dir is None
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='whitebox-pipeline-')
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.callback = callback
+        self.incremental = incremental
+        self.manifest_dir = manifest_dir or os.path.join(self.work_dir, '.manifests')
+        self.check = check
+        self.steps = []
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._exe_id = None
+
+    def add(self, tool, **kwargs):
+        ''' Records a call of tool with kwargs (parameter names without
+        dashes) and returns its Step.  Values may be file paths, numbers,
+        flags, Steps or StepOutputs of this pipeline, or xarray.DataArrays.
+        Output parameters not given are written to the work directory.
+        Adding the same call twice returns the first Step.
+        '''
+        spec = get_tool_spec(tool)
+        resolved = {}
+        for name, value in kwargs.items():
+            name = name.lstrip('-')
+            if name not in spec.by_name:
+                raise ValueError('Parameter {} is not in {}'.format(name, sorted(spec.by_name)))
+            if isinstance(value, Step):
+                value = value.out()
+            if isinstance(value, StepOutput) and value.step.pipeline is not self:
+                raise ValueError('{!r} belongs to another Pipeline'.format(value))
+            resolved[spec.by_name[name].name] = value
+        key = (tool, tuple(sorted((k, _key_value(v)) for k, v in resolved.items())))
+        with self._lock:
+            if key in self._keys:
+                return self._keys[key]
+            step = Step(self, len(self.steps), tool, resolved)
+            self.steps.append(step)
+            self._keys[key] = step
+        return step
+
+    def _needed(self, targets):
+        needed = set()
+        stack = [t.step for t in targets]
+        while stack:
+            step = stack.pop()
+            if step not in needed:
+                needed.add(step)
+                stack.extend(step.deps)
+        # steps can only depend on earlier steps, so this is a topological order
+        return [s for s in self.steps if s in needed]
+
+    def _run_step(self, step, threads):
+        kwargs = {}
+        acquired = []
+        # DataArray input files -> names for them in manifests
+        aliases = {}
+        try:
+            for name, value in step.kwargs.items():
+                if isinstance(value, StepOutput):
+                    value = value.path
+                elif hasattr(value, 'dims') and hasattr(value, 'values'):
+                    from whitebox_tools.xarray_io import SERIALIZED_ARRAYS
+                    value, _ = SERIALIZED_ARRAYS.acquire(value, temp_dir=self.work_dir)
+                    acquired.append(value)
+                    # the file's name differs between processes
+                    aliases[value] = '{}-{}-{}'.format(step.index, step.tool, name)
+                kwargs[name] = value
+            args = cli_args(step.spec, kwargs)
+            manifest = None
+            if self.incremental and step.outputs:
+                manifest = self._manifest(step, args, kwargs, aliases)
+                if self._up_to_date(step, manifest):
+                    step.skipped = True
+                    return RunResult(0, tool_name=step.tool, args=args)
+            step.skipped = False
+            result = self.wbt.run_tool(step.tool, args, self.callback, threads=threads)
+            if manifest is not None and result == 0:
+                self._write_manifest(step, manifest)
+            return result
+        finally:
+            if acquired:
+                from whitebox_tools.xarray_io import SERIALIZED_ARRAYS
+                for dep in acquired:
+                    SERIALIZED_ARRAYS.release(dep)
+
+    def _stamp(self, path, check):
+        if not os.path.isfile(path):
+            return None
+        if check == 'hash':
+            return [file_digest(f) for f in raster_files(path)]
+        return [[os.path.getsize(f), os.path.getmtime(f)] for f in raster_files(path)]
+
+    def _manifest_file(self, step):
+        key = '|'.join(sorted(step.outputs.values()))
+        return os.path.join(self.manifest_dir,
+                            hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def _manifest(self, step, args, kwargs, aliases=None):
+        ''' Describes what a step's outputs are made from: the tool, its
+        arguments, the executable and the state of its input files, with
+        the files in aliases named by their alias.
+        '''
+        aliases = aliases or {}
+        if self._exe_id is None:
+            self._exe_id = self.wbt._exe_id()
+        inputs = {}
+        for name, value in kwargs.items():
+            param = step.spec.by_name.get(name)
+            if param is not None and param.is_input and value is not None:
+                for path in re.split('[;,]', str(value)):
+                    path = path.strip()
+                    if path:
+                        name = aliases.get(path, os.path.abspath(path))
+                        inputs[name] = self._stamp(os.path.abspath(path), self.check)
+        for path, alias in aliases.items():
+            args = [arg.replace(path, alias) for arg in args]
+        return {'tool': step.tool, 'args': sorted(args), 'exe': self._exe_id,
+                'check': self.check, 'inputs': inputs}
+
+    def _up_to_date(self, step, manifest):
+        try:
+            with open(self._manifest_file(step)) as f:
+                saved = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+        outputs = saved.pop('outputs', {})
+        if saved != json.loads(json.dumps(manifest)):
+            return False
+        # outputs that were deleted or changed since the step ran are redone
+        return bool(outputs) and all(self._stamp(path, 'mtime') == stamp
+                                     for path, stamp in outputs.items())
+
+    def _write_manifest(self, step, manifest):
+        manifest = dict(manifest)
+        manifest['outputs'] = {path: self._stamp(path, 'mtime')
+                               for path in step.outputs.values()}
+        if not os.path.isdir(self.manifest_dir):
+            try:
+                os.makedirs(self.manifest_dir)
+            except OSError:
+                if not os.path.isdir(self.manifest_dir):
+                    raise
+        with open(self._manifest_file(step), 'w') as f:
+            json.dump(manifest, f)
+
+    def run(self, *targets, **kwargs):
+        ''' Runs the steps needed for targets (Steps or StepOutputs; by
+        default every step) that have not already run, and returns a tuple
+        of the targets' output paths, or of DataArrays if load=True
+        (with nodata handled by nodata_mode, see assign_nodata).
+        Raises ValueError if a step fails; steps already started are
+        allowed to finish.
+        '''
+        load = kwargs.pop('load', False)
+        nodata_mode = kwargs.pop('nodata_mode', None)
+        if kwargs:
+            raise TypeError('Unexpected keyword arguments {}'.format(sorted(kwargs)))
+        if targets:
+            outputs = [t.out() if isinstance(t, Step) else t for t in targets]
+        else:
+            outputs = [s.out() for s in self.steps if s.spec.outputs]
+        steps = self._needed(outputs)
+        pending = [s for s in steps if s.result != 0]
+        done = set(s for s in steps if s.result == 0)
+        max_workers = max(1, min(self.max_workers, len(pending) or 1))
+        threads = split_threads(max_workers)
+        failed = None
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+            while pending or running:
+                if failed is None:
+                    for step in list(pending):
+                        if len(running) >= max_workers:
+                            break
+                        if all(d in done for d in step.deps):
+                            pending.remove(step)
+                            running[executor.submit(self._run_step, step, threads)] = step
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    step.result = future.result()
+                    if step.result == 0:
+                        done.add(step)
+                    elif failed is None:
+                        failed = step
+        if failed is not None:
+            raise ValueError('WhiteBox {0} (step {1}) failed with args: {2}'.format(
+                failed.tool, failed.index, failed.kwargs))
+        if not load:
+            return tuple(o.path for o in outputs)
+        from whitebox_tools.xarray_io import assign_nodata, from_dep
+        return tuple(assign_nodata(from_dep(o.path), nodata_mode) for o in outputs)
+
+    def close(self):
+        ''' Removes the work directory if the pipeline created it.
+        '''
+        if self._own_work_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _key_value(value):
+    if isinstance(value, StepOutput):
+        return ('step', value.step.index, value.name)
+    if hasattr(value, 'dims'):
+        return ('array', id(value))
+    if isinstance(value, list):
+        return tuple(value)
+    return value
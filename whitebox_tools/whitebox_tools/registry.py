@@ -0,0 +1,233 @@
+''' A compiled registry of whitebox-tools tool parameter specs.
+
+The registry is built once from data/tool_data.json and data/listtools.txt
+and saved as JSON under WHITEBOX_CACHE_DIR, so later processes load the
+compiled specs without re-parsing the tools' help.  It is rebuilt
+whenever either data file changes.
+Looking up a tool's parameters, outputs or argparse parser is then a
+dict lookup rather than a rescan of the tool's help.
+'''
+from collections import namedtuple
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+
+from whitebox_tools.util import WHITEBOX_CACHE_DIR
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+TOOL_DATA_FILE = os.path.join(DATA_DIR, 'tool_data.json')
+LISTTOOLS_FILE = os.path.join(DATA_DIR, 'listtools.txt')
+# Bump when ParamSpec or ToolSpec change, to ignore older cache files
+REGISTRY_VERSION = 2
+
+INPUT_ARGS = ['input', 'inputs', 'i', 'pour_pts',
+              'd8_pntr', 'dem', 'input1', 'input2', 'input3',
+              'i1', 'i2', 'i3', 'input_x', 'input_y',
+              'streams', 'flow_accum', 'sca',
+              'nir', 'red','blue', 'green', 'pan',
+              'destination', 'base', 'seed_pts',
+              'source','cost', 'slope',
+              'flow_dir', 'comparison', 'linkid',
+              'watersheds']
+OUTPUT_ARGS = ['output', 'outputs', 'o']
+
+# Parameter kinds, see ParamSpec
+KINDS = ('input', 'output', 'flag', 'number', 'list', 'string')
+LIST_RE = re.compile(r'separated by commas|comma-separated|semicolons', re.IGNORECASE)
+NUMBER_RE = re.compile(r'\(default is -?[\d.]+\)|default is -?[\d.]+|'
+                       r'\b(size|threshold|number|factor|multiplier|distance|'
+                       r'radius|sigma|exponent|angle|azimuth|altitude|'
+                       r'resolution|iterations|digits|percent|value|'
+                       r'deviation|weight)\b',
+                       re.IGNORECASE)
+
+
+def _is_output_field(field):
+    is_out = field in OUTPUT_ARGS
+    is_out2 = field.startswith('out_') and field != 'out_type'
+    return is_out or is_out2
+
+
+def _is_input_field(field):
+    return field in INPUT_ARGS
+
+
+def _no_dash(flag):
+    return flag.lstrip('-')
+
+
+def _param_kind(names, description):
+    if ' flag ' in description or ' flag.' in description:
+        return 'flag'
+    if LIST_RE.search(description):
+        return 'list'
+    if any(_is_output_field(n) for n in names):
+        return 'output'
+    if any(_is_input_field(n) for n in names):
+        return 'input'
+    if NUMBER_RE.search(description):
+        return 'number'
+    return 'string'
+
+
+class ParamSpec(namedtuple('ParamSpec', 'name flags description kind '
+                                        'is_input is_output')):
+    ''' One tool parameter.
+
+    name:  the parameter's long name without dashes (the argparse dest)
+    flags:  its command line flags, e.g. ('-i', '--input')
+    kind:  one of KINDS; "list" parameters hold several values separated
+           by commas or semicolons
+    is_input, is_output:  True if the parameter names input or output
+                          files (a "list" parameter may be either)
+    '''
+    __slots__ = ()
+
+
+class ToolSpec(object):
+    ''' The parameters of one tool, indexed for constant-time lookups.
+
+    params:  tuple of ParamSpecs, in tool_data.json order
+    by_name:  dict of every flag name (without dashes) to its ParamSpec
+    inputs, outputs:  long names of the input and output parameters
+    help_text:  the parameters formatted as "flags: description" lines
+    '''
+    def __init__(self, name, description, params):
+        self.name = name
+        self.description = description
+        self.params = tuple(params)
+        self.by_name = {}
+        for param in self.params:
+            for flag in param.flags:
+                self.by_name[_no_dash(flag)] = param
+        self.inputs = tuple(p.name for p in self.params if p.is_input)
+        self.outputs = tuple(p.name for p in self.params if p.is_output)
+        self.help_text = '\n'.join('{}: {}'.format(', '.join(p.flags), p.description)
+                                   for p in sorted(self.params, key=lambda p: p.flags))
+        self._parser = None
+
+    def __repr__(self):
+        return 'ToolSpec({!r}, params={})'.format(
+            self.name, [p.name for p in self.params])
+
+    def parser(self):
+        ''' Returns the tool's argparse.ArgumentParser (built on first use).
+        '''
+        if self._parser is None:
+            parser = argparse.ArgumentParser(description=self.description)
+            for param in self.params:
+                flags = set(param.flags)
+                if '--inputs' in flags:
+                    continue
+                if '--filter' in flags and ('--filterx' in flags or '--filtery' in flags):
+                    continue
+                kw = dict(help=param.description)
+                if param.kind == 'flag':
+                    kw['action'] = 'store_true'
+                parser.add_argument(*param.flags, **kw)
+            self._parser = parser
+        return self._parser
+
+
+def compile_registry(tool_data, listtools):
+    ''' Builds the registry from parsed tool_data.json (tool name to
+    [flags, description] pairs) and listtools (tool name to description).
+    Returns a dict of tool name to ToolSpec.
+    '''
+    registry = {}
+    for tool, params in tool_data.items():
+        specs = []
+        for flags, description in params:
+            names = [_no_dash(f) for f in flags]
+            long_names = [_no_dash(f) for f in flags if f.startswith('--')]
+            specs.append(ParamSpec(name=(long_names or names)[0],
+                                   flags=tuple(flags),
+                                   description=description,
+                                   kind=_param_kind(names, description),
+                                   is_input=any(_is_input_field(n) for n in names),
+                                   is_output=any(_is_output_field(n) for n in names)))
+        registry[tool] = ToolSpec(tool, listtools.get(tool, ''), specs)
+    return registry
+
+
+def _read_listtools(listtools_file):
+    with open(listtools_file) as f:
+        lines = filter(None, (_.strip() for _ in f.read().splitlines()))
+        pairs = (_.split(':') for _ in lines)
+        return {k.strip(): v.strip() for k, v in pairs}
+
+
+def _cache_file(tool_data_file, listtools_file, cache_dir):
+    stamp = []
+    for fname in (tool_data_file, listtools_file):
+        st = os.stat(fname)
+        stamp.append('{}:{}:{}'.format(os.path.abspath(fname), st.st_size, st.st_mtime))
+    stamp.append(str(REGISTRY_VERSION))
+    key = hashlib.sha1('|'.join(stamp).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, 'registry-{}.json'.format(key))
+
+
+def _registry_to_json(registry):
+    return {name: [spec.description, [list(p) for p in spec.params]]
+            for name, spec in registry.items()}
+
+
+def _registry_from_json(data):
+    registry = {}
+    for name, (description, params) in data.items():
+        specs = []
+        for pname, flags, pdescription, kind, is_input, is_output in params:
+            specs.append(ParamSpec(pname, tuple(flags), pdescription, kind,
+                                   is_input, is_output))
+        registry[name] = ToolSpec(name, description, specs)
+    return registry
+
+
+_REGISTRIES = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def load_registry(tool_data_file=TOOL_DATA_FILE, listtools_file=LISTTOOLS_FILE,
+                  cache_dir=WHITEBOX_CACHE_DIR):
+    ''' Returns the registry (a dict of tool name to ToolSpec), loading
+    the compiled copy saved in cache_dir, or compiling and saving it if
+    the data files have changed.  The registry is then kept in memory for
+    the rest of the process.
+    '''
+    key = (tool_data_file, listtools_file, cache_dir)
+    with _REGISTRIES_LOCK:
+        if key in _REGISTRIES:
+            return _REGISTRIES[key]
+        cache_file = _cache_file(tool_data_file, listtools_file, cache_dir)
+        try:
+            with open(cache_file) as f:
+                registry = _registry_from_json(json.load(f))
+        # a missing, unreadable or malformed cache file is rebuilt
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            with open(tool_data_file) as f:
+                tool_data = json.load(f)
+            registry = compile_registry(tool_data, _read_listtools(listtools_file))
+            tmp_file = '{}.{}.tmp'.format(cache_file, os.getpid())
+            try:
+                if not os.path.isdir(cache_dir):
+                    os.makedirs(cache_dir)
+                with open(tmp_file, 'w') as f:
+                    json.dump(_registry_to_json(registry), f)
+                getattr(os, 'replace', os.rename)(tmp_file, cache_file)
+            except (IOError, OSError):
+                pass
+        _REGISTRIES[key] = registry
+        return registry
+
+
+def get_tool_spec(tool):
+    ''' Returns the ToolSpec of a tool, raising ValueError for unknown
+    tools.
+    '''
+    try:
+        return load_registry()[tool]
+    except KeyError:
+        raise ValueError('Unknown whitebox-tools tool: {}'.format(tool))
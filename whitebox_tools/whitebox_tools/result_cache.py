@@ -0,0 +1,297 @@
+''' A content-addressed cache of tool run outputs.
+
+A run's key is a hash of the tool name, its normalized arguments, the
+whitebox-tools executable (version output, size and modification time)
+and the contents of its input files.  Output paths are not part of the
+key: on a hit the cached output files are copied to the paths the run
+asks for, and the tool is not run.  Entries are evicted least recently
+used first once the cache outgrows max_size bytes.
+
+Enable it with WhiteboxTools.set_result_cache, or for every WhiteboxTools
+by setting the WHITEBOX_RESULT_CACHE environment variable to 1.
+'''
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import weakref
+
+from whitebox_tools.util import WHITEBOX_CACHE_DIR
+
+WHITEBOX_RESULT_CACHE = bool(int(os.environ.get('WHITEBOX_RESULT_CACHE', '0')))
+WHITEBOX_RESULT_CACHE_DIR = os.environ.get('WHITEBOX_RESULT_CACHE_DIR',
+                                           os.path.join(WHITEBOX_CACHE_DIR, 'results'))
+# Bytes the cached outputs may take on disk before the least recently
+# used entries are evicted
+WHITEBOX_RESULT_CACHE_SIZE = int(float(os.environ.get('WHITEBOX_RESULT_CACHE_SIZE',
+                                                      2 ** 30)))
+
+# Files that make up a raster together with the named file
+COMPANION_EXTENSIONS = {
+    '.dep': ('.tas',),
+    '.tas': ('.dep',),
+    '.rdc': ('.rst',),
+    '.rst': ('.rdc',),
+    '.sdat': ('.sgrd',),
+    '.sgrd': ('.sdat',),
+    '.flt': ('.hdr',),
+}
+ARG_RE = re.compile(r'^--?(?P<name>[^=]+)(=(?P<value>.*))?$')
+OUTPUT_NAME_RE = re.compile(r'^(o|output|outputs|out_(?!type$)\w+)$')
+HASH_CHUNK = 1 << 20
+
+# (path, size, mtime) -> sha256 hex digest of the file's contents
+_DIGESTS = {}
+_DIGESTS_LOCK = threading.Lock()
+# objects (e.g. WhiteboxTools) with a result cache turned on
+_CACHE_USERS = weakref.WeakSet()
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_size, st.st_mtime)
+
+
+def want_digests(owner, wanted=True):
+    ''' Records whether owner has a result cache turned on, and so needs
+    the digests of the files written for its tool runs.
+    '''
+    with _DIGESTS_LOCK:
+        if wanted:
+            _CACHE_USERS.add(owner)
+        else:
+            _CACHE_USERS.discard(owner)
+
+
+def digests_wanted():
+    ''' Returns True while a result cache is turned on anywhere in the
+    process, i.e. while recording the digests of files written from
+    memory (see record_digest) saves reading them back.
+    '''
+    return len(_CACHE_USERS) > 0
+
+
+def record_digest(path, digest):
+    ''' Records the content digest of a file that was just written, e.g.
+    from the in-memory buffer it was written from, so that it is not read
+    back to be hashed.
+    '''
+    with _DIGESTS_LOCK:
+        _DIGESTS[_stat_key(path)] = digest
+
+
+def file_digest(path):
+    ''' Returns the sha256 hex digest of a file's contents, remembered
+    while the file's size and modification time are unchanged.
+    '''
+    key = _stat_key(path)
+    with _DIGESTS_LOCK:
+        if key in _DIGESTS:
+            return _DIGESTS[key]
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    with _DIGESTS_LOCK:
+        _DIGESTS[key] = digest
+    return digest
+
+
+def raster_files(path):
+    ''' Returns path and the companion files (e.g. the .tas of a .dep)
+    that exist alongside it.
+    '''
+    stem, ext = os.path.splitext(path)
+    files = [path]
+    for companion in COMPANION_EXTENSIONS.get(ext.lower(), ()):
+        for candidate in (stem + companion, stem + companion.upper()):
+            if os.path.exists(candidate):
+                files.append(candidate)
+                break
+    return files
+
+
+def _unquote(value):
+    return value.strip().strip('"').strip("'")
+
+
+def normalize_args(args):
+    ''' Splits tool arguments into (key_args, outputs): key_args is a
+    list of (name, value) pairs with input files replaced by digests of
+    their contents and output paths by their count and extensions (the
+    format the tool writes), and outputs lists the output paths.  --wd
+    and -v are dropped; relative paths are resolved against --wd.
+    '''
+    parsed = []
+    wkdir = ''
+    for arg in args:
+        match = ARG_RE.match(arg)
+        if match is None:
+            parsed.append((arg, None))
+            continue
+        name, value = match.group('name'), match.group('value')
+        if value is not None:
+            value = _unquote(value)
+        if name == 'wd':
+            wkdir = value or ''
+        elif name != 'v':
+            parsed.append((name, value))
+    key_args = []
+    outputs = []
+    for name, value in parsed:
+        if value is None:
+            key_args.append((name, None))
+            continue
+        parts = [_unquote(p) for p in re.split('[;,]', value) if p.strip()]
+        paths = [os.path.join(wkdir, p) for p in parts]
+        if OUTPUT_NAME_RE.match(name):
+            outputs.extend(paths)
+            exts = ';'.join(os.path.splitext(p)[1].lower() for p in paths)
+            key_args.append((name, 'output:{}:{}'.format(len(paths), exts)))
+        elif paths and all(os.path.isfile(p) for p in paths):
+            digests = ['+'.join(file_digest(f) for f in raster_files(p))
+                       for p in paths]
+            key_args.append((name, 'file:' + ';'.join(digests)))
+        else:
+            key_args.append((name, value))
+    return key_args, outputs
+
+
+class ResultCache(object):
+    ''' An on-disk cache of tool outputs, see the module docstring.
+
+    hits and misses count lookups since the cache was created.
+    '''
+    def __init__(self, cache_dir=WHITEBOX_RESULT_CACHE_DIR,
+                 max_size=WHITEBOX_RESULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def stats(self):
+        ''' Returns a dict of the hit and miss counts, and the number and
+        total size in bytes of the cached entries.
+        '''
+        entries = self._entries()
+        return {'hits': self.hits, 'misses': self.misses,
+                'entries': len(entries),
+                'size': sum(size for _, _, size in entries)}
+
+    def key(self, tool_name, args, exe_id):
+        ''' Returns (key, outputs): the run's cache key and its output
+        paths.  exe_id identifies the executable's build.
+        '''
+        key_args, outputs = normalize_args(args)
+        payload = json.dumps([tool_name, key_args, exe_id])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest(), outputs
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key, outputs):
+        ''' Copies a cached run's outputs to the paths in outputs and
+        returns its metadata dict, or returns None on a miss.
+        '''
+        entry_dir = self._entry_dir(key)
+        meta_file = os.path.join(entry_dir, 'meta.json')
+        with self._lock:
+            try:
+                with open(meta_file) as f:
+                    meta = json.load(f)
+                if len(meta['outputs']) != len(outputs):
+                    raise ValueError('output count changed')
+                for out_index, (files, path) in enumerate(zip(meta['outputs'], outputs)):
+                    stem = os.path.splitext(path)[0]
+                    for index, ext in files:
+                        target = path if index == 0 else stem + ext
+                        shutil.copyfile(os.path.join(entry_dir, '{}-{}'.format(out_index, index)),
+                                        target)
+                os.utime(meta_file, None)
+            except (IOError, OSError, ValueError, KeyError):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return meta
+
+    def put(self, key, tool_name, outputs, log):
+        ''' Stores the output files of a successful run (with their
+        companion files) under key, then evicts old entries.
+        '''
+        if not all(os.path.isfile(p) for p in outputs):
+            return
+        entry_dir = self._entry_dir(key)
+        tmp_dir = '{}.{}.{}.tmp'.format(entry_dir, os.getpid(), threading.current_thread().ident)
+        try:
+            os.makedirs(tmp_dir)
+            stored = []
+            for out_index, path in enumerate(outputs):
+                files = []
+                for index, fname in enumerate(raster_files(path)):
+                    shutil.copyfile(fname, os.path.join(tmp_dir, '{}-{}'.format(out_index, index)))
+                    files.append([index, os.path.splitext(fname)[1]])
+                stored.append(files)
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+                json.dump({'tool': tool_name, 'outputs': stored, 'log': list(log),
+                           'created': time.time()}, f)
+            with self._lock:
+                if os.path.exists(entry_dir):
+                    shutil.rmtree(entry_dir, ignore_errors=True)
+                os.rename(tmp_dir, entry_dir)
+        except (IOError, OSError):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            meta_file = os.path.join(entry_dir, 'meta.json')
+            if name.endswith('.tmp') or not os.path.isfile(meta_file):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry_dir, f))
+                           for f in os.listdir(entry_dir))
+                entries.append((os.path.getmtime(meta_file), entry_dir, size))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self):
+        ''' Removes the least recently used entries until the cache fits
+        in max_size bytes.
+        '''
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, _, size in entries)
+            while entries and total > self.max_size:
+                _, entry_dir, size = entries.pop(0)
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+
+    def clear(self):
+        ''' Removes every entry (the hit and miss counts are kept).
+        '''
+        with self._lock:
+            for _, entry_dir, _ in self._entries():
+                shutil.rmtree(entry_dir, ignore_errors=True)
+
+
+_DEFAULT_CACHES = {}
+
+
+def default_result_cache(cache_dir=WHITEBOX_RESULT_CACHE_DIR):
+    ''' Returns the process-wide ResultCache for cache_dir.
+    '''
+    with _DIGESTS_LOCK:
+        if cache_dir not in _DEFAULT_CACHES:
+            _DEFAULT_CACHES[cache_dir] = ResultCache(cache_dir)
+        return _DEFAULT_CACHES[cache_dir]
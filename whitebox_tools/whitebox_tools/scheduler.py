@@ -0,0 +1,259 @@
+''' A resource-aware scheduler for running many whitebox-tools jobs.
+
+Each job's peak memory is estimated from the .dep headers of its input
+rasters, and a job is only started once it fits within the scheduler's
+memory and core budgets.  Jobs run in priority order (highest first) and
+in submission order within a priority; a job that does not fit yet holds
+back the jobs queued behind it, so large jobs are not starved by a stream
+of small ones.
+'''
+from __future__ import print_function
+from concurrent.futures import Future
+import heapq
+import itertools
+import multiprocessing
+import os
+import re
+import threading
+
+from whitebox_tools.registry import _is_input_field, load_registry
+from whitebox_tools.util import read_dep_header
+from whitebox_tools.whitebox_base import (WhiteboxTools,
+                                          default_callback)
+
+# whitebox-tools holds every raster in memory as 64-bit floats,
+# whatever its data type on disk
+BYTES_PER_CELL = 8
+
+# Working buffers (in rasters' worth of memory) that a tool allocates in
+# addition to its input and output rasters
+EXTRA_BUFFERS = {
+    'BreachDepressions': 3,
+    'CostAllocation': 2,
+    'CostDistance': 3,
+    'CostPathway': 2,
+    'D8FlowAccumulation': 1,
+    'DInfFlowAccumulation': 2,
+    'EuclideanAllocation': 3,
+    'EuclideanDistance': 3,
+    'FD8FlowAccumulation': 2,
+    'FillDepressions': 3,
+    'FlowAccumulationFullWorkflow': 4,
+    'Watershed': 1,
+}
+DEFAULT_EXTRA_BUFFERS = 1
+
+ARG_RE = re.compile(r'^--?(?P<name>\w+)=(?P<value>.*)$')
+
+
+def _unquote(value):
+    return value.strip().strip('"').strip("'")
+
+
+def build_cost_table(registry=None):
+    '''Count the raster buffers each tool needs
+
+    Parameters:
+        registry: tool name to ToolSpec (see registry.load_registry,
+                  loaded if not given)
+    Returns:
+        dict of tool name to the number of rasters' worth of
+        memory the tool needs (its raster parameters plus
+        EXTRA_BUFFERS)
+    '''
+    if registry is None:
+        registry = load_registry()
+    costs = {}
+    for tool, spec in registry.items():
+        buffers = sum(1 for p in spec.params if p.is_input or p.is_output)
+        costs[tool] = buffers + EXTRA_BUFFERS.get(tool, DEFAULT_EXTRA_BUFFERS)
+    return costs
+
+
+def _input_paths(args):
+    wkdir = ''
+    for arg in args:
+        match = ARG_RE.match(arg)
+        if match and match.group('name') == 'wd':
+            wkdir = _unquote(match.group('value'))
+    paths = []
+    for arg in args:
+        match = ARG_RE.match(arg)
+        if match and _is_input_field(match.group('name')):
+            for value in re.split('[;,]', _unquote(match.group('value'))):
+                if value.strip():
+                    paths.append(os.path.join(wkdir, _unquote(value)))
+    return paths
+
+
+def _raster_cells(path):
+    if path.endswith('.dep') and os.path.exists(path):
+        attrs = read_dep_header(path)
+        return attrs['Rows'] * attrs['Cols']
+    if os.path.exists(path):
+        # unknown format: assume 32-bit cells on disk
+        return os.path.getsize(path) // 4
+    return 0
+
+
+def estimate_memory(tool_name, args, cost_table=None):
+    '''Estimate a tool run's peak memory use in bytes
+
+    Parameters:
+        tool_name: whitebox-tools tool name
+        args: the tool's command line arguments
+        cost_table: from build_cost_table (built if not given)
+    Returns:
+        rows x cols of the largest input raster x BYTES_PER_CELL
+        x the tool's buffer count (0 if no inputs are found)
+    '''
+    if cost_table is None:
+        cost_table = build_cost_table()
+    paths = _input_paths(args)
+    cells = max([_raster_cells(p) for p in paths] or [0])
+    buffers = cost_table.get(tool_name, DEFAULT_EXTRA_BUFFERS + 2)
+    buffers = max(buffers, len(paths) + DEFAULT_EXTRA_BUFFERS)
+    return cells * BYTES_PER_CELL * buffers
+
+
+def total_memory():
+    '''Physical memory in bytes, or None if it cannot be found'''
+    try:
+        return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class ScheduledJob(object):
+    ''' A job queued on a ToolScheduler.
+    '''
+    def __init__(self, tool_name, args, priority, memory, threads, callback):
+        self.tool_name = tool_name
+        self.args = list(args)
+        self.priority = priority
+        self.memory = memory
+        self.threads = threads
+        self.callback = callback
+        self.future = Future()
+
+
+class ToolScheduler(object):
+    ''' Runs tools concurrently within a memory and core budget.
+
+    max_memory:  bytes the running jobs may use together (default: 80% of
+                 physical memory; None or 0 for no limit)
+    max_cores:  threads the running jobs may use together (default: the
+                number of CPUs)
+    max_workers:  most jobs to run at once (default: max_cores)
+    threads_per_job:  worker threads for each tool (default: the cores
+                      split between max_workers jobs)
+
+    A job too large for the budget on its own still runs, alone.  Use as
+    a context manager, or call shutdown() when done.
+    '''
+    def __init__(self, wbt=None, max_memory=-1, max_cores=None,
+                 max_workers=None, threads_per_job=None, cost_table=None):
+        self.wbt = wbt or WhiteboxTools()
+        if max_memory == -1:
+            max_memory = total_memory()
+            if max_memory:
+                max_memory = int(max_memory * 0.8)
+        self.max_memory = max_memory or None
+        self.max_cores = max_cores or multiprocessing.cpu_count()
+        self.max_workers = max_workers or self.max_cores
+        if threads_per_job is None:
+            threads_per_job = max(1, self.max_cores // self.max_workers)
+        self.threads_per_job = threads_per_job
+        self.cost_table = cost_table or build_cost_table()
+        self.memory_in_use = 0
+        self.cores_in_use = 0
+        self.running = 0
+        self._queue = []
+        self._order = itertools.count()
+        self._workers = []
+        self._shutdown = False
+        self._condition = threading.Condition()
+        self._dispatcher = threading.Thread(target=self._dispatch)
+        self._dispatcher.daemon = True
+        self._dispatcher.start()
+
+    def submit(self, tool_name, args, priority=0,
+               callback=default_callback, memory=None, threads=None):
+        ''' Queues a tool run and returns a concurrent.futures.Future for
+        its RunResult.  memory (bytes) defaults to estimate_memory and
+        threads to threads_per_job.
+        '''
+        if memory is None:
+            memory = estimate_memory(tool_name, args, self.cost_table)
+        threads = min(threads or self.threads_per_job, self.max_cores)
+        job = ScheduledJob(tool_name, args, priority, memory, threads,
+                           callback)
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError('cannot submit after shutdown')
+            heapq.heappush(self._queue, (-priority, next(self._order), job))
+            self._condition.notify_all()
+        return job.future
+
+    def _fits(self, job):
+        if self.running == 0:
+            return True
+        if self.running >= self.max_workers:
+            return False
+        if self.cores_in_use + job.threads > self.max_cores:
+            return False
+        if self.max_memory and self.memory_in_use + job.memory > self.max_memory:
+            return False
+        return True
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not (self._queue and self._fits(self._queue[0][-1])):
+                    if self._shutdown and not self._queue:
+                        return
+                    self._condition.wait()
+                job = heapq.heappop(self._queue)[-1]
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                self.running += 1
+                self.memory_in_use += job.memory
+                self.cores_in_use += job.threads
+                worker = threading.Thread(target=self._run, args=(job,))
+                worker.daemon = True
+                # forget the workers of finished jobs
+                self._workers = [w for w in self._workers if w.is_alive()]
+                self._workers.append(worker)
+            worker.start()
+
+    def _run(self, job):
+        try:
+            result = self.wbt.run_tool(job.tool_name, job.args, job.callback,
+                                       threads=job.threads)
+            job.future.set_result(result)
+        except Exception as err:
+            job.future.set_exception(err)
+        finally:
+            with self._condition:
+                self.running -= 1
+                self.memory_in_use -= job.memory
+                self.cores_in_use -= job.threads
+                self._condition.notify_all()
+
+    def shutdown(self, wait=True):
+        ''' Stops accepting jobs; queued jobs still run.  If wait is True,
+        returns once every job has finished.
+        '''
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            self._dispatcher.join()
+            for worker in list(self._workers):
+                worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown(wait=True)
@@ -0,0 +1,71 @@
+''' Running one tool over many values of a parameter.
+
+    dset = sweep('DevFromMeanElev', dem, filterx=[3, 5, 9, 17, 33],
+                 filtery=11)
+    dset['DevFromMeanElev'].sel(filterx=9)
+
+The input is serialized once and shared by every run.  The runs are
+scheduled by a Pipeline, so at most max_workers run at once, splitting
+the CPUs between them.  The outputs are loaded into an xarray.Dataset
+with one variable named after the tool, stacked along a new dimension
+named after the swept parameter.
+'''
+import shutil
+import tempfile
+
+from whitebox_tools.pipeline import Pipeline
+from whitebox_tools.registry import get_tool_spec
+from whitebox_tools.util import optional_imports, optional_imports_error
+from whitebox_tools.whitebox_base import default_callback
+
+
+def _is_values(value):
+    return isinstance(value, (list, tuple)) or (hasattr(value, 'ndim') and value.ndim == 1)
+
+
+def sweep(tool, input, max_workers=None, wbt=None, callback=default_callback,
+          nodata_mode=None, **params):
+    ''' Runs tool on input (a DataArray or a raster file path) once per
+    value of the one parameter in params given a list of values; the
+    other params are passed to every run.  Returns an xarray.Dataset,
+    see the module docstring, with nodata handled by nodata_mode (see
+    assign_nodata).  Raises ValueError if a run fails.
+    '''
+    np, xr = optional_imports()
+    optional_imports_error(np, xr)
+    from whitebox_tools.xarray_io import SERIALIZED_ARRAYS, select_temp_dir
+    spec = get_tool_spec(tool)
+    if not spec.inputs or not spec.outputs:
+        raise ValueError('{} needs an input and an output parameter to be swept'.format(tool))
+    swept = [name for name, value in params.items() if _is_values(value)]
+    if len(swept) != 1:
+        raise ValueError('Expected one parameter with a list of values (got {})'.format(swept))
+    name = swept[0]
+    values = list(params.pop(name))
+    input_name = spec.inputs[0]
+    # every run's output goes to a work_dir in there too
+    temp_dir = select_temp_dir(n_outputs=len(values) * len(spec.outputs),
+                               **{input_name: input})
+    dep = None
+    if isinstance(input, xr.DataArray):
+        dep, _ = SERIALIZED_ARRAYS.acquire(input, temp_dir=temp_dir)
+        input = dep
+    work_dir = tempfile.mkdtemp(prefix='whitebox-sweep-', dir=temp_dir)
+    try:
+        pipeline = Pipeline(wbt, work_dir=work_dir, max_workers=max_workers,
+                            callback=callback)
+        steps = []
+        for value in values:
+            kwargs = dict(params)
+            kwargs[name] = value
+            kwargs[input_name] = input
+            steps.append(pipeline.add(tool, **kwargs))
+        arrs = pipeline.run(*steps, load=True, nodata_mode=nodata_mode)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if dep is not None:
+            SERIALIZED_ARRAYS.release(dep)
+    param = spec.by_name[name.lstrip('-')].name
+    stacked = xr.concat(arrs, dim=xr.DataArray(values, dims=param, name=param))
+    attrs = dict(tool=tool, swept=param, kwargs=params)
+    return xr.Dataset({tool: stacked}, attrs=attrs)
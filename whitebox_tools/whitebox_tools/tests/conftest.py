@@ -0,0 +1,98 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from whitebox_tools.whitebox_base import WhiteboxTools
+
+FAKE_EXE = '''#!{python}
+import os, shutil, sys, time
+args = sys.argv[1:]
+def get(name):
+    for a in args:
+        if a.startswith('--{{}}='.format(name)):
+            return a.split('=', 1)[1].strip('"')
+tool = get('run')
+if '--listtools' in args:
+    print('All 3 Available Tools:')
+    for name in ('Aspect', 'Fail', 'Slope'):
+        print('{{0}}: Runs {{0}}.'.format(name))
+        print()
+    sys.exit(0)
+if get('toolhelp'):
+    if get('toolhelp') == 'Fail':
+        sys.exit(1)
+    print('{{}} Help'.format(get('toolhelp')))
+    print('Description: A fake tool.')
+    print()
+    print('Input parameters:')
+    print('-i, --dem     Input raster DEM file.')
+    print('-o, --output  Output raster file.')
+    print()
+    print('Example usage:')
+    print('>>./whitebox_tools -r=Slope --dem=DEM.dep -o=output.dep')
+    sys.exit(0)
+if tool is None:
+    print('whitebox-tools v0.1.1')
+    sys.exit(0)
+print('Welcome to {{}}'.format(tool))
+sys.stdout.flush()
+if tool == 'Hang':
+    import signal
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    time.sleep(60)
+for i in range(0, 101, 25):
+    print('Progress: {{}}%'.format(i))
+    sys.stdout.flush()
+    time.sleep(float(os.environ.get('FAKE_WB_SLEEP', '0')))
+if tool == 'Fail':
+    print('Error: tool failed')
+    sys.exit(1)
+output = get('output')
+if output:
+    wd = get('wd') or ''
+    source = os.path.join(wd, get('input') or get('dem') or get('flow_accum') or '')
+    data = open(source).read() if os.path.isfile(source) else ''
+    with open(os.path.join(wd, output), 'w') as f:
+        f.write('{{}}({{}})'.format(tool, data))
+    if source.endswith('.dep') and os.path.isfile(source[:-4] + '.tas'):
+        # a raster: copy it, so that the output can be loaded
+        shutil.copy(source, os.path.join(wd, output))
+        shutil.copy(source[:-4] + '.tas', os.path.join(wd, output)[:-4] + '.tas')
+print('Threads: {{}}'.format(os.environ.get('WHITEBOX_MAX_PROCS', 'all')))
+print('Elapsed Time (excluding I/O): 0.5s')
+'''
+
+
+def pytest_addoption(parser):
+    parser.addoption('--run-slow', action='store_true',
+                     help='run the tests marked slow (e.g. benchmarks)')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: slow test, run with --run-slow')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--run-slow'):
+        return
+    skip = pytest.mark.skip(reason='slow, run with --run-slow')
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def wbt(tmpdir):
+    if sys.platform == 'win32':
+        pytest.skip('The fake whitebox_tools executable is a POSIX script')
+    exe = os.path.join(str(tmpdir), 'whitebox_tools')
+    with open(exe, 'w') as f:
+        f.write(FAKE_EXE.format(python=sys.executable))
+    os.chmod(exe, os.stat(exe).st_mode | stat.S_IEXEC)
+    wbt = WhiteboxTools(exe)
+    wbt.set_verbose_mode(False)
+    wbt.set_progress_rate(None)
+    wbt.set_cache_dir(os.path.join(str(tmpdir), 'cache'))
+    return wbt
@@ -0,0 +1,327 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from whitebox_tools.whitebox_base import (ElapsedTimeEvent,
+                                          ErrorEvent,
+                                          MetadataCache,
+                                          OutputParser,
+                                          ProgressEvent,
+                                          RunResult,
+                                          metadata_cache,
+                                          output_paths,
+                                          parse_output_line,
+                                          parse_tool_help,
+                                          parse_tool_list,
+                                          split_threads)
+
+
+def test_run_tool(wbt):
+    lines = []
+    assert wbt.run_tool('Slope', [], lines.append, verbose=False) == 0
+    assert lines[0] == 'Welcome to Slope'
+    assert 'Progress: 100%' in lines
+
+
+def test_run_result(wbt, tmpdir):
+    wbt.set_working_dir(str(tmpdir))
+    result = wbt.run_tool('Slope', ['--dem=DEM.dep', '--output="slope.dep"',
+                                    '--out_type=sca'],
+                          lambda line: None, verbose=False)
+    assert isinstance(result, RunResult)
+    assert result == 0 and not result
+    assert result.tool_name == 'Slope'
+    assert result.outputs == [os.path.join(str(tmpdir), 'slope.dep')]
+    assert result.compute_time == 0.5
+    assert result.log[0] == 'Welcome to Slope'
+    assert result.wall_time > 0
+    if hasattr(os, 'wait4'):
+        assert result.max_rss > 0
+        assert result.user_time >= 0 and result.sys_time >= 0
+    failed = wbt.run_tool('Fail', [], lambda line: None, verbose=False)
+    assert failed == 1 and failed.return_code == 1
+    assert failed.compute_time is None
+
+
+def test_timeout_escalates_to_kill(wbt):
+    start = time.time()
+    run = wbt.start_tool('Hang', [], lambda line: None, verbose=False,
+                         timeout=0.3)
+    run.kill_after = 0.2
+    result = run.wait()
+    assert result == 2 and result.timed_out
+    assert result.log == ['Welcome to Hang']
+    assert time.time() - start < 10
+    assert run.done() and run.wait() is result
+
+
+def test_cancel_silent_tool(wbt):
+    run = wbt.start_tool('Hang', [], lambda line: None, verbose=False)
+    run.kill_after = 0.2
+    threading.Timer(0.2, run.cancel).start()
+    result = run.wait()
+    assert result == 2 and not result.timed_out
+    assert result.wall_time < 10
+
+
+def test_timeout_without_wait(wbt):
+    run = wbt.start_tool('Hang', [], lambda line: None, verbose=False,
+                         timeout=0.2)
+    run.kill_after = 0.2
+    deadline = time.time() + 10
+    while run.proc.returncode is None and time.time() < deadline:
+        time.sleep(0.05)
+    assert run.proc.returncode is not None
+    result = run.wait()
+    assert result == 2 and result.timed_out
+
+
+def test_cancel_op_stops_every_run(wbt):
+    runs = [wbt.start_tool('Hang', [], lambda line: None, verbose=False)
+            for _ in range(3)]
+    for run in runs:
+        run.kill_after = 0.2
+    wbt.cancel_op = True
+    assert not wbt.cancel_op
+    assert [run.wait() for run in runs] == [2, 2, 2]
+    # with nothing running, the next tool started is stopped
+    wbt.cancel_op = True
+    run = wbt.start_tool('Hang', [], lambda line: None, verbose=False)
+    run.kill_after = 0.2
+    assert run.wait() == 2 and not wbt.cancel_op
+    assert wbt.run_tool('Slope', [], lambda line: None, verbose=False) == 0
+
+
+def test_thread_budget(wbt, monkeypatch):
+    monkeypatch.delenv('WHITEBOX_MAX_PROCS', raising=False)
+    result = wbt.run_tool('Slope', [], lambda line: None, verbose=False)
+    assert 'Threads: all' in result.log
+    result = wbt.run_tool('Slope', [], lambda line: None, verbose=False,
+                          threads=3)
+    assert 'Threads: 3' in result.log
+    results = wbt.run_tools([('Slope', []), ('Aspect', [])], max_workers=2,
+                            callback=lambda line: None, verbose=False)
+    expected = 'Threads: {}'.format(split_threads(2))
+    assert all(expected in result.log for result in results)
+    assert split_threads(4, cpu_count=16) == 4
+    assert split_threads(32, cpu_count=16) == 1
+
+
+def test_output_paths():
+    args = ['--wd="/data"', '-o=a.dep', '--out_accum=/abs/b.dep',
+            '--out_type=cells', '--outputs="c.dep;d.dep"', '--input=x.dep']
+    assert output_paths(args) == ['/data/a.dep', '/abs/b.dep',
+                                  '/data/c.dep', '/data/d.dep']
+
+
+def test_run_tools_keeps_job_order(wbt):
+    outputs = {}
+    jobs = []
+    for tool in ('Slope', 'Fail', 'Aspect'):
+        outputs[tool] = []
+        jobs.append((tool, [], outputs[tool].append))
+    ret = wbt.run_tools(jobs, max_workers=3, verbose=False)
+    assert ret == [0, 1, 0]
+    for tool, lines in outputs.items():
+        assert lines[0] == 'Welcome to {}'.format(tool)
+
+
+def test_run_tools_shared_callback(wbt):
+    lines = []
+    ret = wbt.run_tools([('Slope', []), ('Aspect', [])],
+                        callback=lines.append, verbose=False)
+    assert ret == [0, 0]
+    assert lines.count('Progress: 100%') == 2
+    assert wbt.run_tools([]) == []
+
+
+def test_parse_output_line():
+    event = parse_output_line('Progress (loop 1 of 2): 45%\n')
+    assert isinstance(event, ProgressEvent)
+    assert event == 'Progress (loop 1 of 2): 45%'
+    assert (event.label, event.percent) == ('Progress (loop 1 of 2)', 45)
+    assert event.prefix == 'Progress (loop 1 of 2):'
+    event = parse_output_line('Elapsed Time (excluding I/O): 1.25S')
+    assert isinstance(event, ElapsedTimeEvent)
+    assert (event.elapsed, event.elapsed_text, event.units) == (1.25, '1.25', 'S')
+    assert isinstance(parse_output_line('Error: bad input'), ErrorEvent)
+    assert parse_output_line('Reading data...').kind == 'message'
+
+
+def test_cli_callback_output(capsys):
+    from whitebox_tools.whitebox_cli import callback
+    callback.prev_line_progress = False
+    for line in ('Progress: 0%', 'Progress: 50%', 'Finalizing 75%',
+                 'Elapsed Time (excluding I/O): 1.20S'):
+        callback(parse_output_line(line))
+    assert capsys.readouterr().out == ('Progress: 0%\nProgress: 50%\rFinalizing 75%\r'
+                                       'Elapsed time: 1.20s\n')
+
+
+def test_output_parser_coalesces_progress():
+    parser = OutputParser(max_rate=1e-3)
+    lines = ['Reading data...'] + ['Progress: {}%'.format(i) for i in range(101)]
+    lines += ['Saving data...', 'Progress: 5%', 'Progress: 6%']
+    events = [parser.parse(line) for line in lines]
+    events = [e for e in events if e is not None]
+    assert events == ['Reading data...', 'Progress: 0%', 'Progress: 100%',
+                      'Saving data...', 'Progress: 5%']
+    parser = OutputParser(max_rate=None)
+    assert all(parser.parse(line) is not None for line in lines)
+
+
+def test_run_tool_coalesces_progress(wbt):
+    wbt.set_progress_rate(1e-3)
+    lines = []
+    assert wbt.run_tool('Slope', [], lines.append, verbose=False) == 0
+    assert [e.percent for e in lines if e.kind == 'progress'] == [0, 100]
+
+
+def test_run_tool_async(wbt):
+    asyncio = pytest.importorskip('asyncio')
+
+    async def main():
+        run = wbt.run_tool_async('Slope', [], verbose=False)
+        events = [event async for event in run]
+        ret = await run
+        failed = await wbt.run_tool_async('Fail', [], verbose=False)
+        both = await asyncio.gather(wbt.run_tool_async('Slope', []),
+                                    wbt.run_tool_async('Aspect', []))
+        return events, ret, failed, both
+
+    async def hang():
+        run = wbt.run_tool_async('Hang', [], timeout=0.2)
+        run.kill_after = 0.2
+        return await run
+
+    events, ret, failed, both = asyncio.run(main())
+    timed_out = asyncio.run(hang())
+    assert timed_out == 2 and timed_out.timed_out
+    assert ret == 0
+    assert failed == 1
+    assert both == [0, 0]
+    progress = [e.percent for e in events if e.kind == 'progress']
+    assert progress == [0, 25, 50, 75, 100]
+    assert events[-1].kind == 'elapsed_time'
+
+
+def test_run_tool_async_cancel(wbt):
+    asyncio = pytest.importorskip('asyncio')
+
+    async def cancel_before_start():
+        run = wbt.run_tool_async('Slope', [])
+        run.cancel()
+        return await run
+
+    async def timeout_while_not_iterating():
+        run = wbt.run_tool_async('Hang', [], timeout=0.2)
+        run.kill_after = 0.2
+        await run.__anext__()
+        await asyncio.sleep(2)
+        exited = run._proc.returncode is not None
+        return exited, await run
+
+    async def cancel_op():
+        runs = [wbt.run_tool_async('Hang', []) for _ in range(2)]
+        for run in runs:
+            run.kill_after = 0.2
+            await run.__anext__()
+        threading.Timer(0.1, setattr, (wbt, 'cancel_op', True)).start()
+        return await asyncio.gather(*runs)
+
+    not_started = asyncio.run(cancel_before_start())
+    assert not_started == 2 and not_started.log == []
+    exited, timed_out = asyncio.run(timeout_while_not_iterating())
+    assert exited and timed_out == 2 and timed_out.timed_out
+    assert asyncio.run(cancel_op()) == [2, 2]
+    assert not wbt.cancel_op and not wbt._runs
+
+
+FAKE_LIBRARY = r'''
+#include <stdio.h>
+#include <stddef.h>
+typedef int (*output_callback)(const char*);
+static output_callback callback = 0;
+void set_output_callback(output_callback cb) { callback = cb; }
+int run_tool(const char* name, const char** args, size_t length, size_t max_procs) {
+    char line[256];
+    int i;
+    snprintf(line, sizeof line, "Welcome to %s", name);
+    if (callback) callback(line);
+    snprintf(line, sizeof line, "Threads: %d", (int)max_procs);
+    if (callback) callback(line);
+    for (i = 0; i <= 100; i += 50) {
+        snprintf(line, sizeof line, "Progress: %d%%", i);
+        if (callback && callback(line)) return 2;
+    }
+    return length == 0;
+}
+'''
+
+
+def test_library_backend(wbt, tmpdir):
+    from whitebox_tools.whitebox_base import LIBRARY_NAME
+    src = os.path.join(str(tmpdir), 'lib.c')
+    with open(src, 'w') as f:
+        f.write(FAKE_LIBRARY)
+    lib = os.path.join(wbt.exe_path, LIBRARY_NAME)
+    try:
+        subprocess.check_call(['cc', '-shared', '-fPIC', '-o', lib, src])
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip('A C compiler is needed to build the fake library')
+    wbt.set_backend('library')
+    assert wbt.library is not None
+    events = []
+    assert wbt.run_tool('Negate', ['--input=x'], events.append, verbose=False,
+                        threads=3) == 0
+    assert events[:2] == ['Welcome to Negate', 'Threads: 3']
+    assert [e.percent for e in events[2:]] == [0, 50, 100]
+    # tools with a timeout run with the executable, which can be stopped
+    with pytest.warns(RuntimeWarning):
+        lines = []
+        assert wbt.run_tool('Slope', [], lines.append, verbose=False, timeout=30) == 0
+    assert lines[0] == 'Welcome to Slope'
+
+
+def test_library_backend_needs_library(wbt):
+    with pytest.raises(ValueError):
+        wbt.set_backend('library')
+    assert wbt.backend == 'process' and wbt.library is None
+    with pytest.raises(ValueError):
+        wbt.set_backend('threads')
+
+
+def test_metadata_cache(wbt, tmpdir):
+    version = wbt.version()
+    assert version == ['whitebox-tools v0.1.1\n']
+    cache_files = os.listdir(os.path.join(str(tmpdir), 'cache'))
+    assert len(cache_files) == 1
+    # served from the cache (in memory and on disk) once cached
+    cache = metadata_cache(wbt.exe_name, wbt.cache_dir)
+    cache.entries['version'] = ['cached\n']
+    assert wbt.version() == ['cached\n']
+    assert MetadataCache(wbt.exe_name, wbt.cache_dir).get('version') == version
+    # a changed executable invalidates the cache
+    with open(wbt.exe_name, 'a') as f:
+        f.write('\n')
+    assert wbt.version() == version
+    # failed runs are not cached
+    assert wbt.tool_help('Fail', silent=True) == []
+    assert cache.get('toolhelp:Fail') is None
+
+
+def test_refresh_metadata(wbt):
+    tool_help = wbt.refresh_metadata(max_workers=3)
+    assert sorted(tool_help) == ['Aspect', 'Fail', 'Slope']
+    assert tool_help['Fail'] is None
+    assert parse_tool_help(tool_help['Slope']) == [
+        [['-i', '--dem'], 'Input raster DEM file'],
+        [['--wd'], 'Working directory'],
+        [['-o', '--output'], 'Output raster file']]
+    assert wbt.tool_help('Aspect', silent=True) == tool_help['Aspect']
+    assert parse_tool_list(wbt.list_tools(silent=True)) == {
+        'Aspect': 'Runs Aspect.', 'Fail': 'Runs Fail.', 'Slope': 'Runs Slope.'}
@@ -0,0 +1,296 @@
+import gc
+import os
+import shutil
+import time
+
+import pytest
+np = pytest.importorskip('numpy')
+xr = pytest.importorskip('xarray')
+
+from whitebox_tools import xarray_io
+from whitebox_tools.xarray_io import (from_dep,
+                                      select_temp_dir,
+                                      xarray_whitebox_io,
+                                      WHITEBOX_TEMP_DIR)
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata')
+DEM = os.path.join(TESTDATA, 'DEM.dep')
+
+
+@pytest.fixture
+def memory_dir(tmpdir, monkeypatch):
+    memory_dir = os.path.join(str(tmpdir), 'memory')
+    monkeypatch.setattr(xarray_io, 'WHITEBOX_MEMORY_DIR', memory_dir)
+    return memory_dir
+
+
+def test_select_temp_dir(memory_dir):
+    dem = from_dep(DEM)
+    assert select_temp_dir(dem=dem, output='out.dep') == memory_dir
+    assert os.path.isdir(memory_dir)
+    assert select_temp_dir(dem=DEM, output='out.dep') == WHITEBOX_TEMP_DIR
+    assert select_temp_dir(input=dem, comparison=DEM) == WHITEBOX_TEMP_DIR
+    assert select_temp_dir(output='out.dep') == WHITEBOX_TEMP_DIR
+
+
+def test_memory_dir_is_private(tmpdir, monkeypatch):
+    root = str(tmpdir.join('shm'))
+    os.mkdir(root)
+    monkeypatch.setattr(xarray_io, 'WHITEBOX_MEMORY_DIR', None)
+    monkeypatch.setattr(xarray_io, 'MEMORY_ROOT', root)
+    monkeypatch.setattr(xarray_io, '_private_memory_dir', None)
+    path = xarray_io.memory_dir()
+    assert os.path.dirname(path) == root
+    assert os.stat(path).st_mode & 0o777 == 0o700
+    assert xarray_io.memory_dir() == path
+    # a shared directory others can write to is not used
+    shared = str(tmpdir.join('shared'))
+    os.mkdir(shared)
+    os.chmod(shared, 0o777)
+    monkeypatch.setattr(xarray_io, 'WHITEBOX_MEMORY_DIR', shared)
+    assert xarray_io.memory_dir() is None
+    assert select_temp_dir(dem=from_dep(DEM)) == WHITEBOX_TEMP_DIR
+
+
+def test_select_temp_dir_checks_free_space(memory_dir, monkeypatch):
+    dem = from_dep(DEM)
+    usage = type('usage', (), {'free': dem.size * 4})
+    monkeypatch.setattr(xarray_io.shutil, 'disk_usage', lambda path: usage)
+    assert select_temp_dir(dem=dem, output='out.dep') == WHITEBOX_TEMP_DIR
+    usage.free = dem.size * 100
+    assert select_temp_dir(dem=dem, output='out.dep') == memory_dir
+    # e.g. the outputs of a sweep's runs
+    assert select_temp_dir(dem=dem, n_outputs=20) == WHITEBOX_TEMP_DIR
+
+
+def test_in_memory_io_cleans_up_failed_runs(memory_dir):
+    dem = from_dep(DEM)
+    out = os.path.join(select_temp_dir(dem=dem), 'out.dep')
+    delayed_load_later, kwargs = xarray_whitebox_io(dem=dem, output=out,
+                                                    temp_dir=memory_dir)
+    # a tool that fails after writing part of its output
+    open(out, 'w').close()
+    open(out[:-4] + '.tas', 'w').close()
+    assert delayed_load_later(1) == 1
+    assert not os.path.exists(out) and not os.path.exists(out[:-4] + '.tas')
+
+
+def test_in_memory_io_cleans_up(memory_dir):
+    dem = from_dep(DEM)
+    out = os.path.join(select_temp_dir(dem=dem), 'out.dep')
+    delayed_load_later, kwargs = xarray_whitebox_io(dem=dem, output=out,
+                                                    temp_dir=memory_dir)
+    assert os.path.dirname(kwargs['dem']) == memory_dir
+    # stand in for the tool: copy the input raster to the output
+    shutil.copy(kwargs['dem'], out)
+    shutil.copy(kwargs['dem'][:-4] + '.tas', out[:-4] + '.tas')
+    arr = delayed_load_later(0)
+    assert isinstance(arr, xr.DataArray)
+    assert arr.shape == dem.shape
+    # the input stays serialized while dem is alive
+    assert sorted(os.listdir(memory_dir)) == [os.path.basename(kwargs['dem']),
+                                              os.path.basename(kwargs['dem'])[:-4] + '.tas']
+    del dem
+    gc.collect()
+    assert os.listdir(memory_dir) == []
+
+
+def test_serialized_arrays_are_reused(tmpdir):
+    temp_dir = str(tmpdir)
+    cache = xarray_io.SerializedArrays()
+    dem = from_dep(DEM)
+    dep, tas = cache.acquire(dem, temp_dir=temp_dir)
+    mtime = os.path.getmtime(tas)
+    os.utime(tas, (mtime - 10, mtime - 10))
+    # a second run with the same array reuses its files
+    assert cache.acquire(dem, temp_dir=temp_dir) == (dep, tas)
+    assert os.path.getmtime(tas) == mtime - 10
+    # an equal array shares them, a changed one gets its own, however
+    # few of its values changed
+    assert cache.acquire(dem.rename('view'), temp_dir=temp_dir) == (dep, tas)
+    copy = dem.copy(deep=True)
+    assert cache.acquire(copy, temp_dir=temp_dir) == (dep, tas)
+    copy.values[copy.shape[0] // 2 + 1, copy.shape[1] // 3 + 1] += 1
+    dep2, tas2 = cache.acquire(copy, temp_dir=temp_dir)
+    assert dep2 != dep and np.array_equal(from_dep(dep2).values, copy.values)
+    for fname in (dep, dep, dep, dep, dep2):
+        cache.release(fname)
+    gc.collect()
+    assert len(os.listdir(temp_dir)) == 4
+    del dem
+    gc.collect()
+    assert len(os.listdir(temp_dir)) == 2
+    del copy
+    gc.collect()
+    assert os.listdir(temp_dir) == []
+
+
+def test_digests_only_with_result_cache(wbt, tmpdir):
+    from whitebox_tools import result_cache
+    dem = from_dep(DEM)
+    strided = dem[:, ::2]
+    _, tas = xarray_io.data_array_to_dep(strided, tag='a', temp_dir=str(tmpdir))
+    assert result_cache._stat_key(tas) not in result_cache._DIGESTS
+    wbt.set_result_cache(result_cache.ResultCache(str(tmpdir.join('results'))))
+    _, tas = xarray_io.data_array_to_dep(strided, tag='b', temp_dir=str(tmpdir))
+    digest = result_cache._DIGESTS[result_cache._stat_key(tas)]
+    del result_cache._DIGESTS[result_cache._stat_key(tas)]
+    assert result_cache.file_digest(tas) == digest
+    wbt.set_result_cache(None)
+    assert not result_cache.digests_wanted()
+
+
+@pytest.mark.parametrize('dtype', ['i8', 'u8'])
+def test_large_integers_are_exact(tmpdir, dtype):
+    dem = from_dep(DEM)
+    vals = np.zeros(dem.shape, dtype=dtype)
+    vals[0, 0] = 2 ** 53
+    dep, _ = xarray_io.data_array_to_dep(dem.copy(data=vals), fname=str(tmpdir.join('a')))
+    assert from_dep(dep).values[0, 0] == 2 ** 53
+    # 2**53 + 1 would be written as 2**53
+    vals[0, 0] += 1
+    with pytest.raises(ValueError):
+        xarray_io.data_array_to_dep(dem.copy(data=vals), fname=str(tmpdir.join('b')))
+
+
+@pytest.mark.parametrize('typ_str, dtype', [('float', 'f4'), ('integer', 'i2')])
+def test_to_tas(tmpdir, monkeypatch, typ_str, dtype):
+    vals = np.arange(60, dtype='>f8').reshape(6, 10)
+    fname = str(tmpdir.join('a.tas'))
+    expected = vals.astype('<' + dtype).tobytes()
+    xarray_io.to_tas(vals.astype('<' + dtype), typ_str, fname)
+    assert open(fname, 'rb').read() == expected
+    # converted and non-contiguous arrays are written a few rows at a time
+    monkeypatch.setattr(xarray_io, 'TAS_CHUNK_BYTES', 50)
+    xarray_io.to_tas(vals, typ_str, fname)
+    assert open(fname, 'rb').read() == expected
+    xarray_io.to_tas(np.asfortranarray(vals), typ_str, fname)
+    assert open(fname, 'rb').read() == expected
+
+
+@pytest.mark.slow
+def test_to_tas_benchmark(tmpdir):
+    vals = np.random.random((4000, 4000)).astype('<f4')
+    fname = str(tmpdir.join('bench.tas'))
+    start = time.time()
+    with open(fname, 'wb') as f:
+        f.write(vals.tobytes())
+    raw = time.time() - start
+    start = time.time()
+    xarray_io.to_tas(vals, 'float', fname)
+    elapsed = time.time() - start
+    mb = vals.nbytes / 1e6
+    print('to_tas: {:.0f} MB/s, raw write: {:.0f} MB/s'.format(mb / elapsed, mb / raw))
+    # at disk bandwidth: no slower than writing the bytes directly, with
+    # slack for timing noise
+    assert elapsed < 2 * raw + 0.05
+
+
+def test_from_dep_mmap(tmpdir, monkeypatch):
+    eager = from_dep(DEM)
+    arr = from_dep(DEM, mmap=True)
+    assert isinstance(arr.data, np.memmap) and arr.data.mode == 'c'
+    np.testing.assert_array_equal(arr.values, eager.values)
+    # copy-on-write: changing the values leaves the file alone
+    arr.values[0, 0] = -1
+    assert from_dep(DEM).values[0, 0] == eager.values[0, 0]
+    assert from_dep(DEM, mmap='r').data.mode == 'r'
+    # large tool outputs are mapped
+    monkeypatch.setattr(xarray_io, 'WHITEBOX_MMAP_BYTES', 0)
+    out = str(tmpdir.join('out.dep'))
+    delayed_load_later, kwargs = xarray_whitebox_io(dem=DEM, output=out, nodata_mode='keep')
+    shutil.copy(DEM, out)
+    shutil.copy(DEM[:-4] + '.tas', out[:-4] + '.tas')
+    assert isinstance(delayed_load_later(0).data, np.memmap)
+
+
+def test_mapped_outputs_stay_lazy(tmpdir, monkeypatch):
+    dem = from_dep(DEM)
+    vals = dem.values.astype('i2')
+    vals[::7, ::5] = -32768
+    out = str(tmpdir.join('out'))
+    xarray_io.data_array_to_dep(dem.copy(data=vals), fname=out)
+    monkeypatch.setattr(xarray_io, 'WHITEBOX_MMAP_BYTES', 0)
+    delayed_load_later, kwargs = xarray_whitebox_io(dem=DEM, output=out + '.dep')
+    arr = delayed_load_later(0)
+    # the default "nan" mode converts only what is indexed
+    assert not arr.variable._in_memory
+    data = arr.variable._data
+    while not hasattr(data, 'vals'):
+        data = data.array
+    assert isinstance(data.vals, np.memmap)
+    expected = vals.astype('f4')
+    expected[vals == -32768] = np.nan
+    np.testing.assert_array_equal(arr[:8, :6].values, expected[:8, :6])
+    assert not arr.variable._in_memory
+    assert arr.dtype == np.float32
+    np.testing.assert_array_equal(arr.values, expected)
+
+
+def test_to_tas_bands(tmpdir, monkeypatch):
+    vals = np.arange(60, dtype='f8').reshape(6, 10)
+    dtype = np.dtype('<f4')
+    monkeypatch.setattr(xarray_io, 'TAS_CHUNK_BYTES', 80)
+    bands = list(xarray_io._tas_bands(vals, dtype))
+    assert [b.shape for b in bands] == [(2, 10)] * 3
+    assert all(b.dtype == dtype and b.flags.c_contiguous for b in bands)
+
+
+def test_dask_io(tmpdir):
+    da = pytest.importorskip('dask.array')
+    dem = from_dep(DEM, chunks=(100, 150))
+    assert isinstance(dem.data, da.Array) and dem.data.chunksize == (100, 150)
+    np.testing.assert_array_equal(dem.values, from_dep(DEM).values)
+    # written a row of chunks at a time without computing the whole array
+    plus1 = dem + 1
+    plus1.attrs.update(dem.attrs)
+    dep, tas = xarray_io.data_array_to_dep(plus1, fname=str(tmpdir.join('plus1')))
+    np.testing.assert_array_equal(from_dep(dep).values, from_dep(DEM).values + 1)
+    assert xarray_io.select_temp_dir(dem=dem) == WHITEBOX_TEMP_DIR
+    nodata = xarray_io.assign_nodata(from_dep(DEM, chunks=100))
+    assert isinstance(nodata.data, da.Array)
+    np.testing.assert_array_equal(nodata.values,
+                                  xarray_io.assign_nodata(from_dep(DEM)).values)
+
+
+def test_nodata_modes(monkeypatch):
+    vals = np.array([[1, -32768, 3], [-32768, 5, 6]], dtype='i2')
+    arr = lambda: xr.DataArray(vals.copy(), dims=('y', 'x'), attrs={'Nodata': '-32768.0'})
+    kept = xarray_io.assign_nodata(arr(), mode='keep')
+    assert kept.dtype == np.int16
+    mask = xarray_io.nodata_mask(kept)
+    assert mask.tolist() == [[False, True, False], [True, False, False]]
+    assert np.packbits(mask, axis=-1).tolist() == xarray_io.nodata_mask(kept, packed=True).tolist()
+    view = xarray_io.masked(kept)
+    assert view.sum() == 15 and np.shares_memory(view.data, kept.values)
+    # NaN needs no more than float32 for int16, done a row at a time
+    monkeypatch.setattr(xarray_io, 'TAS_CHUNK_BYTES', 1)
+    nan = xarray_io.assign_nodata(arr(), mode='nan')
+    assert nan.dtype == np.float32
+    assert np.isnan(nan.values).tolist() == mask.tolist()
+    wide = xr.DataArray(vals.astype('i4'), dims=('y', 'x'), attrs={'Nodata': '-32768.0'})
+    assert xarray_io.assign_nodata(wide).dtype == np.float64
+    with pytest.raises(ValueError):
+        xarray_io.assign_nodata(arr(), mode='zero')
+
+
+@pytest.mark.parametrize('dtype, dep_type, disk_dtype', [
+    ('u1', 'byte', 'u1'), ('i2', 'integer', 'i2'), ('i4', 'i32', 'i4'),
+    ('u2', 'i32', 'i4'), ('u4', 'double', 'f8'), ('i8', 'double', 'f8'),
+    ('f4', 'float', 'f4'), ('f8', 'double', 'f8')])
+def test_dep_dtypes(tmpdir, dtype, dep_type, disk_dtype):
+    dem = from_dep(DEM)
+    vals = (np.arange(dem.size) % 200).reshape(dem.shape).astype(dtype)
+    if dtype == 'f8':
+        vals += 1e-9
+    arr = dem.copy(data=vals)
+    val, typ_str, dep_text = xarray_io._serialize(arr)
+    assert typ_str == dep_type and 'Data Type:  {}'.format(dep_type) in dep_text
+    if dtype == disk_dtype:
+        # written straight from the array's buffer
+        assert np.shares_memory(val, arr.values)
+    dep, tas = xarray_io.data_array_to_dep(arr, fname=str(tmpdir.join('arr')))
+    assert os.path.getsize(tas) == vals.size * np.dtype(disk_dtype).itemsize
+    loaded = from_dep(dep)
+    assert loaded.dtype == np.dtype(disk_dtype)
+    np.testing.assert_array_equal(loaded.values, vals)
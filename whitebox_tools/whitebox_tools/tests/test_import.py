@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Seconds "import whitebox_tools" may take in a fresh interpreter
+IMPORT_BUDGET = 0.05
+
+IMPORT_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import whitebox_tools
+elapsed = time.perf_counter() - start
+loaded = sorted(m for m in ('numpy', 'xarray', 'whitebox_tools.whitebox_cli',
+                            'whitebox_tools.xarray_io') if m in sys.modules)
+whitebox_tools.WhiteboxTools
+print(json.dumps({'elapsed': elapsed, 'loaded': loaded,
+                  'numpy_after_access': 'numpy' in sys.modules}))
+'''
+
+
+def run_script(script):
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    out = subprocess.check_output([sys.executable, '-c', script],
+                                  cwd=package_root)
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def test_import_is_lazy():
+    run = run_script(IMPORT_SCRIPT)
+    assert run['loaded'] == []
+    assert not run['numpy_after_access']
+
+
+@pytest.mark.slow
+def test_import_time():
+    # best of a few runs, to ignore a cold disk cache
+    runs = [run_script(IMPORT_SCRIPT) for _ in range(3)]
+    assert min(run['elapsed'] for run in runs) < IMPORT_BUDGET
+
+
+def test_scheduler_import_is_light():
+    run = run_script('import json, sys\n'
+                     'import whitebox_tools.scheduler\n'
+                     'print(json.dumps({"loaded": sorted(m for m in ("numpy", "xarray") '
+                     'if m in sys.modules)}))')
+    assert run['loaded'] == []
+
+
+def test_tool_wrappers_on_demand():
+    import whitebox_tools
+    from whitebox_tools import whitebox_cli
+    assert 'Slope' in whitebox_cli.tools
+    assert 'zfactor' in whitebox_tools.Slope.__doc__
+    assert whitebox_tools.SlopeCli.args == ('Slope',)
+    namespace = {}
+    exec('from whitebox_tools import *', namespace)
+    assert 'SlopeCli' in namespace and 'WhiteboxTools' in namespace
+    with pytest.raises(AttributeError):
+        whitebox_tools.NotATool
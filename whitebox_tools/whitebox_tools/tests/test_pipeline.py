@@ -0,0 +1,126 @@
+import os
+
+import pytest
+
+from whitebox_tools.pipeline import Pipeline
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_pipeline_runs_only_needed_steps(wbt, tmpdir):
+    dem = tmpdir.join('dem.dep')
+    dem.write('dem')
+    ran = []
+    with Pipeline(wbt, max_workers=3,
+                  callback=lambda line: ran.append(line[len('Welcome to '):])
+                  if line.startswith('Welcome') else None) as p:
+        filled = p.add('FillDepressions', dem=str(dem))
+        sca = p.add('D8FlowAccumulation', dem=filled, out_type='sca')
+        cells = p.add('D8FlowAccumulation', dem=filled, out_type='cells')
+        ca = p.add('D8FlowAccumulation', dem=filled, out_type='ca')
+        streams = p.add('ExtractStreams', flow_accum=sca, threshold=100,
+                        output=str(tmpdir.join('streams.dep')))
+        assert p.add('D8FlowAccumulation', dem=filled, out_type='sca') is sca
+        assert ran == []
+        path, = p.run(streams)
+        assert path == str(tmpdir.join('streams.dep'))
+        assert read(path) == 'ExtractStreams(D8FlowAccumulation(FillDepressions(dem)))'
+        assert sorted(ran) == ['D8FlowAccumulation', 'ExtractStreams', 'FillDepressions']
+        # finished steps are not rerun
+        cells_path, ca_path = p.run(cells, ca)
+        assert ran.count('FillDepressions') == 1
+        assert ran.count('D8FlowAccumulation') == 3
+        assert os.path.dirname(cells_path) == p.work_dir
+        assert cells.result == 0 and cells.result.tool_name == 'D8FlowAccumulation'
+        work_dir = p.work_dir
+    assert not os.path.exists(work_dir)
+
+
+def test_pipeline_errors(wbt, tmpdir):
+    with Pipeline(wbt) as p:
+        with pytest.raises(ValueError):
+            p.add('Slope', dem='dem.dep')
+        slope = p.add('Slope', input=str(tmpdir.join('missing.dep')))
+        with pytest.raises(ValueError):
+            slope.out('out_accum')
+        with Pipeline(wbt) as other:
+            with pytest.raises(ValueError):
+                other.add('Aspect', dem=slope)
+
+
+def test_pipeline_loads_data_arrays(wbt, tmpdir):
+    pytest.importorskip('xarray')
+    from whitebox_tools.xarray_io import from_dep
+    testdata = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata')
+    dem = from_dep(os.path.join(testdata, 'DEM.dep'))
+    with Pipeline(wbt) as p:
+        # DataArray inputs are written to the work directory once
+        copy = p.add('Slope', input=dem)
+        again = p.add('Aspect', dem=dem)
+        arr, _ = p.run(copy, again, load=True)
+        assert len([f for f in os.listdir(p.work_dir)
+                    if f.startswith('xarray-') and f.endswith('.tas')]) == 1
+        assert arr.shape == dem.shape
+
+
+def test_pipeline_incremental_data_arrays(wbt, tmpdir):
+    pytest.importorskip('xarray')
+    from whitebox_tools.xarray_io import from_dep
+    testdata = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata')
+    work_dir = str(tmpdir)
+
+    def run():
+        dem = from_dep(os.path.join(testdata, 'DEM.dep'))
+        p = Pipeline(wbt, work_dir=work_dir, incremental=True, check='hash')
+        slope = p.add('Slope', input=dem, output=os.path.join(work_dir, 'slope.dep'))
+        p.run()
+        return slope
+
+    assert not run().skipped
+    # a new DataArray with the same contents is written to a new file,
+    # but the manifest names it by its step and parameter
+    assert run().skipped
+
+
+def test_pipeline_incremental(wbt, tmpdir):
+    dem = tmpdir.join('dem.dep')
+    dem.write('dem')
+    work_dir = str(tmpdir.join('work'))
+    os.mkdir(work_dir)
+
+    def build(threshold=100):
+        p = Pipeline(wbt, work_dir=work_dir, incremental=True)
+        filled = p.add('FillDepressions', dem=str(dem))
+        slope = p.add('Slope', input=filled)
+        streams = p.add('ExtractStreams', flow_accum=filled, threshold=threshold)
+        return p, filled, slope, streams
+
+    p, filled, slope, streams = build()
+    p.run()
+    assert not any(s.skipped for s in (filled, slope, streams))
+    # nothing changed: every step is skipped
+    p, filled, slope, streams = build()
+    p.run()
+    assert all(s.skipped for s in (filled, slope, streams))
+    assert read(slope.outputs['output']) == 'Slope(FillDepressions(dem))'
+    # a changed parameter reruns only its step
+    p, filled, slope, streams = build(threshold=50)
+    p.run()
+    assert filled.skipped and slope.skipped and not streams.skipped
+    # a changed input reruns everything after it
+    dem.write('dem2')
+    os.utime(str(dem), (1, 1))
+    p, filled, slope, streams = build(threshold=50)
+    p.run()
+    assert not any(s.skipped for s in (filled, slope, streams))
+    assert read(slope.outputs['output']) == 'Slope(FillDepressions(dem2))'
+    # a deleted output is remade
+    os.remove(slope.outputs['output'])
+    p, filled, slope, streams = build(threshold=50)
+    p.run()
+    assert filled.skipped and not slope.skipped and streams.skipped
+    with pytest.raises(ValueError):
+        Pipeline(wbt, check='size')
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from whitebox_tools import registry
+from whitebox_tools.registry import get_tool_spec, load_registry
+
+
+def test_tool_spec():
+    spec = get_tool_spec('D8FlowAccumulation')
+    assert spec.outputs == ('output',)
+    assert spec.inputs == ('dem',)
+    kinds = {p.name: p.kind for p in spec.params}
+    assert kinds == {'dem': 'input', 'wd': 'string', 'out_type': 'string',
+                     'output': 'output', 'log': 'flag', 'clip': 'flag'}
+    assert spec.by_name['o'] is spec.by_name['output']
+    assert get_tool_spec('Slope').by_name['zfactor'].kind == 'number'
+    inputs = get_tool_spec('PercentLessThan').by_name['inputs']
+    assert inputs.kind == 'list' and inputs.is_input
+    with pytest.raises(ValueError):
+        get_tool_spec('NotATool')
+
+
+def test_parser_is_built_once():
+    spec = get_tool_spec('D8FlowAccumulation')
+    parser = spec.parser()
+    assert spec.parser() is parser
+    args = parser.parse_args(['--dem', 'DEM.dep', '-o', 'out.dep', '--log'])
+    assert (args.dem, args.output, args.log, args.clip) == ('DEM.dep', 'out.dep', True, False)
+
+
+def test_registry_is_cached(tmpdir, monkeypatch):
+    cache_dir = str(tmpdir)
+    compiled = load_registry(cache_dir=cache_dir)
+    assert load_registry(cache_dir=cache_dir) is compiled
+    cache_file, = os.listdir(cache_dir)
+    assert cache_file.endswith('.json')
+    # a new process loads the saved registry instead of compiling
+    monkeypatch.setattr(registry, '_REGISTRIES', {})
+
+    def fail(*args):
+        raise AssertionError('registry was recompiled')
+
+    monkeypatch.setattr(registry, 'compile_registry', fail)
+    loaded = load_registry(cache_dir=cache_dir)
+    assert loaded is not compiled
+    assert loaded['Slope'].help_text == compiled['Slope'].help_text
+    assert loaded['Slope'].parser().description == compiled['Slope'].description
+    assert loaded['Slope'].params == compiled['Slope'].params
+    # a corrupt cache file is rebuilt
+    monkeypatch.undo()
+    monkeypatch.setattr(registry, '_REGISTRIES', {})
+    with open(os.path.join(cache_dir, cache_file), 'w') as f:
+        f.write('{"Slope": 1')
+    assert load_registry(cache_dir=cache_dir)['Slope'].params == compiled['Slope'].params
+
+
+def test_validate_run_rejects_unknown_params():
+    from whitebox_tools.whitebox_cli import _fmt_help, validate_run
+    with pytest.raises(ValueError):
+        validate_run('Slope', dem='DEM.dep')
+    help_text, ok_params = _fmt_help('Slope')
+    assert '--zfactor: Optional multiplier' in help_text
+    assert {'i', 'input', 'o', 'output', 'wd', 'zfactor'} == ok_params
@@ -0,0 +1,89 @@
+from whitebox_tools.result_cache import ResultCache, normalize_args
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_normalize_args(tmpdir):
+    write(str(tmpdir.join('dem.dep')), 'header')
+    write(str(tmpdir.join('dem.tas')), 'data')
+    key_args, outputs = normalize_args(['--wd="{}"'.format(tmpdir), '--dem=dem.dep',
+                                        '--output="out.dep"', '--zfactor=2', '--log', '-v'])
+    assert outputs == [str(tmpdir.join('out.dep'))]
+    names = [name for name, _ in key_args]
+    assert names == ['dem', 'output', 'zfactor', 'log']
+    # the input is keyed on the .dep and .tas contents, not its path
+    assert key_args[0][1].startswith('file:') and '+' in key_args[0][1]
+    assert key_args[1:] == [('output', 'output:1:.dep'), ('zfactor', '2'), ('log', None)]
+
+
+def test_run_tool_cache(wbt, tmpdir, monkeypatch):
+    runs = []
+    run_tool = wbt._run_tool
+
+    def counting_run_tool(*args):
+        runs.append(args[0])
+        return run_tool(*args)
+
+    monkeypatch.setattr(wbt, '_run_tool', counting_run_tool)
+    cache = ResultCache(str(tmpdir.join('results')))
+    wbt.set_result_cache(cache)
+    wbt.set_working_dir(str(tmpdir))
+    write(str(tmpdir.join('dem.dep')), 'dem 1')
+    lines = []
+    first = wbt.run_tool('Slope', ['--input=dem.dep', '--output=a.dep'],
+                         lines.append, verbose=False)
+    assert first == 0 and not first.cached
+    second = wbt.run_tool('Slope', ['--input=dem.dep', '--output=b.dep'],
+                          lines.append, verbose=False)
+    assert second == 0 and second.cached
+    assert runs == ['Slope']
+    assert read(str(tmpdir.join('b.dep'))) == 'Slope(dem 1)'
+    assert second.log == first.log
+    assert lines.count('Welcome to Slope') == 2
+    assert (cache.hits, cache.misses) == (1, 1)
+    # new input contents or arguments are a miss
+    write(str(tmpdir.join('dem.dep')), 'dem 2')
+    wbt.run_tool('Slope', ['--input=dem.dep', '--output=b.dep'], lines.append)
+    wbt.run_tool('Slope', ['--input=dem.dep', '--output=b.dep', '--zfactor=2'],
+                 lines.append)
+    assert read(str(tmpdir.join('b.dep'))) == 'Slope(dem 2)'
+    assert runs == ['Slope'] * 3
+    # an output in another format is a miss
+    tif = wbt.run_tool('Slope', ['--input=dem.dep', '--output=b.tif', '--zfactor=2'],
+                       lines.append)
+    assert not tif.cached and runs == ['Slope'] * 4
+    assert read(str(tmpdir.join('b.tif'))) == 'Slope(dem 2)'
+    # failed runs are not cached
+    wbt.run_tool('Fail', ['--input=dem.dep'], lines.append)
+    wbt.run_tool('Fail', ['--input=dem.dep'], lines.append)
+    assert runs.count('Fail') == 2
+    assert cache.stats()['entries'] == 4
+
+
+def test_lru_eviction(wbt, tmpdir):
+    cache = ResultCache(str(tmpdir.join('results')), max_size=1500)
+    wbt.set_result_cache(cache)
+    wbt.set_working_dir(str(tmpdir))
+    for name in ('a', 'b', 'c'):
+        write(str(tmpdir.join(name + '.dep')), name * 400)
+        assert not wbt.run_tool('Slope', ['--input={}.dep'.format(name),
+                                          '--output=out.dep'],
+                                lambda line: None).cached
+        # b is used again, so a is the least recently used entry
+        if name == 'b':
+            assert wbt.run_tool('Slope', ['--input=b.dep', '--output=out.dep'],
+                                lambda line: None).cached
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['size'] <= 1500
+    assert wbt.run_tool('Slope', ['--input=b.dep', '--output=out.dep'],
+                        lambda line: None).cached
+    assert not wbt.run_tool('Slope', ['--input=a.dep', '--output=out.dep'],
+                            lambda line: None).cached
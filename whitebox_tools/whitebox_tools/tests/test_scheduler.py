@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+
+from whitebox_tools.scheduler import (ToolScheduler,
+                                      build_cost_table,
+                                      estimate_memory)
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata')
+
+
+def test_cost_table():
+    costs = build_cost_table()
+    # --input and --output plus one working buffer
+    assert costs['Slope'] == 3
+    assert costs['FillDepressions'] > costs['Slope']
+
+
+def test_estimate_memory():
+    args = ['--wd="{}"'.format(TESTDATA), '--dem=DEM.dep', '--output=out.dep']
+    cells = 188 * 237
+    assert estimate_memory('Slope', args) == cells * 8 * 3
+    assert estimate_memory('Slope', ['--dem=missing.dep']) == 0
+
+
+def test_priorities_and_memory_budget(wbt, monkeypatch):
+    monkeypatch.setenv('FAKE_WB_SLEEP', '0.05')
+    started = []
+    lock = threading.Lock()
+
+    def make_callback(name):
+        def callback(line):
+            if line.startswith('Welcome'):
+                with lock:
+                    started.append(name)
+        return callback
+
+    with ToolScheduler(wbt, max_memory=100, max_cores=4) as scheduler:
+        assert scheduler.threads_per_job == 1
+        first = scheduler.submit('Slope', [], memory=80,
+                                 callback=make_callback('first'))
+        while not started:
+            time.sleep(0.01)
+        low = scheduler.submit('Slope', [], memory=80,
+                               callback=make_callback('low'))
+        high = scheduler.submit('Slope', [], memory=80, priority=10,
+                                callback=make_callback('high'))
+    assert [f.result() for f in (first, low, high)] == [0, 0, 0]
+    # each job needs most of the memory budget, so they run one at a time
+    assert started == ['first', 'high', 'low']
+    assert scheduler.memory_in_use == 0 and scheduler.running == 0
+
+
+def test_finished_workers_are_forgotten(wbt):
+    with ToolScheduler(wbt, max_memory=None, max_cores=2) as scheduler:
+        for _ in range(10):
+            assert scheduler.submit('Slope', [], callback=lambda line: None).result() == 0
+        assert len(scheduler._workers) <= 2
@@ -0,0 +1,45 @@
+import gc
+import os
+
+import pytest
+np = pytest.importorskip('numpy')
+xr = pytest.importorskip('xarray')
+
+from whitebox_tools import xarray_io
+from whitebox_tools.sweep import sweep
+from whitebox_tools.xarray_io import from_dep
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata')
+DEM = os.path.join(TESTDATA, 'DEM.dep')
+
+
+def test_sweep(wbt, monkeypatch):
+    writes = []
+    write = xarray_io._write_dep_tas
+    monkeypatch.setattr(xarray_io, '_write_dep_tas',
+                        lambda *args: writes.append(args[3]) or write(*args))
+    dem = from_dep(DEM)
+    dset = sweep('Hillshade', dem, max_workers=3, wbt=wbt,
+                 azimuth=[0, 90, 180, 270], altitude=30)
+    assert len(writes) == 1
+    arr = dset['Hillshade']
+    assert arr.dims == ('azimuth', 'y', 'x')
+    assert list(arr.azimuth.values) == [0, 90, 180, 270]
+    assert arr.shape == (4,) + dem.shape
+    assert dset.attrs['swept'] == 'azimuth' and dset.attrs['kwargs'] == {'altitude': 30}
+    # the serialized input is kept for reuse while dem is alive
+    assert os.path.exists(writes[0])
+    del dem
+    gc.collect()
+    assert not os.path.exists(writes[0])
+    with pytest.raises(ValueError):
+        sweep('Hillshade', DEM, wbt=wbt, azimuth=[0, 90], altitude=[30, 45])
+
+
+def test_sweep_sizes_temp_dir_for_every_output(wbt, monkeypatch):
+    calls = []
+    select_temp_dir = xarray_io.select_temp_dir
+    monkeypatch.setattr(xarray_io, 'select_temp_dir',
+                        lambda **kwargs: calls.append(kwargs) or select_temp_dir(**kwargs))
+    sweep('Hillshade', from_dep(DEM), wbt=wbt, azimuth=[0, 90, 180], altitude=30)
+    assert calls[0]['n_outputs'] == 3
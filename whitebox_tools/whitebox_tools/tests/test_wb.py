@@ -0,0 +1,117 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from whitebox_tools.registry import get_tool_spec
+from whitebox_tools.wb import cli_args, main, prog_tool_name
+
+
+def test_prog_tool_name():
+    assert prog_tool_name('/usr/bin/wb-Slope') == 'Slope'
+    assert prog_tool_name('C:\\Scripts\\wb-Slope-script.py'.replace('\\', os.sep)) == 'Slope'
+    assert prog_tool_name('wb-Slope.exe') == 'Slope'
+    assert prog_tool_name('/usr/bin/wb') is None
+
+
+def test_cli_args(tmpdir):
+    spec = get_tool_spec('D8FlowAccumulation')
+    with tmpdir.as_cwd():
+        args = cli_args(spec, {'dem': 'DEM.dep', 'output': 'out.dep',
+                               'out_type': 'sca', 'log': True, 'clip': False,
+                               'wd': None})
+    assert args == ['--dem="{}"'.format(os.path.join(str(tmpdir), 'DEM.dep')),
+                    '--output="{}"'.format(os.path.join(str(tmpdir), 'out.dep')),
+                    '--out_type="sca"', '--log']
+
+
+def test_main(wbt, capsys, tmpdir):
+    with tmpdir.as_cwd():
+        assert main(['wb', 'Slope', '-i', 'DEM.dep', '--zfactor', '2'], wbt=wbt) == 0
+        assert main(['/bin/wb-Aspect', '--dem', 'DEM.dep'], wbt=wbt) == 0
+    out = capsys.readouterr().out
+    assert 'Welcome to Slope' in out and 'Welcome to Aspect' in out
+    assert main(['wb', 'NotATool'], wbt=wbt) == 2
+    assert main(['wb', '--list']) == 0
+    assert 'Slope: ' in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        main(['wb', 'Slope', '--not-a-param=1'], wbt=wbt)
+
+
+def test_dispatcher_does_not_import_numpy():
+    script = ('import sys\n'
+              'from whitebox_tools import wb, whitebox_base, whitebox_cli\n'
+              'wb.main(["wb", "--list"])\n'
+              'print("numpy" in sys.modules or "xarray" in sys.modules)\n')
+    package_root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    out = subprocess.check_output([sys.executable, '-c', script],
+                                  cwd=package_root)
+    assert json.loads(out.decode().strip().splitlines()[-1].lower()) is False
+
+
+def test_batch(wbt, tmpdir):
+    jobs = [{'tool': 'Slope', 'args': {'input': 'DEM.dep', 'output': 'slope.dep',
+                                       'zfactor': 2}, 'id': 'slope'},
+            {'tool': 'Aspect', 'args': {'--dem': 'DEM.dep', 'output': 'aspect.dep'}},
+            {'tool': 'NotATool', 'args': {}},
+            {'tool': 'Slope', 'args': {'dem': 'DEM.dep'}}]
+    jobs_file = tmpdir.join('jobs.jsonl')
+    jobs_file.write('\n'.join(json.dumps(job) for job in jobs) + '\n\nnot json\n')
+    results_file = tmpdir.join('results.jsonl')
+    with tmpdir.as_cwd():
+        ret = main(['wb', 'batch', str(jobs_file), '-j', '2',
+                    '-o', str(results_file)], wbt=wbt)
+    assert ret == 1
+    records = {r['line']: r for r in map(json.loads, results_file.readlines())}
+    assert sorted(records) == [1, 2, 3, 4, 6]
+    assert records[1]['status'] == 'ok' and records[1]['id'] == 'slope'
+    assert records[1]['outputs'] == [str(tmpdir.join('slope.dep'))]
+    assert records[1]['compute_time'] == 0.5 and records[1]['wall_time'] > 0
+    assert records[2]['status'] == 'ok' and records[2]['tool'] == 'Aspect'
+    assert all(records[n]['status'] == 'invalid' for n in (3, 4, 6))
+    assert 'Parameter dem' in records[4]['error']
+    assert records[3]['tool'] == 'NotATool' and records[4]['tool'] == 'Slope'
+
+
+def test_batch_stdout_is_json(wbt, tmpdir, capsys):
+    wbt.set_verbose_mode(True)
+    jobs_file = tmpdir.join('jobs.jsonl')
+    jobs_file.write(json.dumps({'tool': 'Slope', 'args': {'input': 'DEM.dep'}, 'id': 'a'}) + '\n')
+    with tmpdir.as_cwd():
+        assert main(['wb', 'batch', str(jobs_file)], wbt=wbt) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)['id'] for line in lines] == ['a']
+
+
+def test_batch_journal(wbt, tmpdir):
+    jobs = [{'tool': 'Slope', 'args': {'input': 'DEM.dep', 'output': 'slope.dep'}},
+            {'tool': 'Aspect', 'args': {'dem': 'DEM.dep', 'output': 'aspect.dep'}, 'id': 'a'}]
+    jobs_file = tmpdir.join('jobs.jsonl')
+    jobs_file.write('\n'.join(json.dumps(job) for job in jobs) + '\n')
+    journal = tmpdir.join('journal.jsonl')
+    results_file = tmpdir.join('results.jsonl')
+
+    def run():
+        with tmpdir.as_cwd():
+            assert main(['wb', 'batch', str(jobs_file), '-o', str(results_file),
+                         '--journal', str(journal)], wbt=wbt) == 0
+        return {r['line']: r for r in map(json.loads, results_file.readlines())}
+
+    records = run()
+    assert not any(r.get('resumed') for r in records.values())
+    assert len(journal.readlines()) == 2
+    # completed jobs are skipped
+    records = run()
+    assert all(r['resumed'] for r in records.values())
+    assert records[2]['id'] == 'a' and records[2]['status'] == 'ok'
+    # a changed output and a job whose journal line was cut short are redone
+    tmpdir.join('slope.dep').write('partial')
+    lines = journal.readlines()
+    journal.write(lines[0] + lines[1][:20])
+    records = run()
+    assert not records[1].get('resumed') and not records[2].get('resumed')
+    assert tmpdir.join('slope.dep').read().startswith('Slope(')
+    assert run()[1]['resumed']
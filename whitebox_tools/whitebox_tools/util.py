@@ -1,8 +1,71 @@
 
 from __future__ import print_function
 
+import os
 import sys
 
+# Directory for the caches of tool metadata (help, version and tool list
+# output of each executable, and the compiled tool registry)
+WHITEBOX_CACHE_DIR = os.environ.get('WHITEBOX_CACHE_DIR',
+                                    os.path.join(os.path.expanduser('~'),
+                                                 '.whitebox_tools_cache'))
+
+FLOAT_DEP_FIELDS = ['Min', 'Max',
+                    'North', 'South', 'East', 'West',
+                    'Display Min', 'Display Max']
+INT_DEP_FIELDS = ['Cols', 'Rows', 'Stacks']
+UPPER_STR_FIELDS = ['Data Type', 'Byte Order']
+
+
+def fix_path(path):
+    '''Handle commas and semicolons in paths for >1 input file'''
+    if ';' in path:
+        paths = path.split(';')
+    else:
+        paths = path.split(', ')
+    paths = [os.path.abspath(os.path.join(os.curdir, path))
+             for path in paths]
+    if len(paths) == 1:
+        return paths[0]
+    return ', '.join(paths)
+
+
+def read_dep_header(fname):
+    '''Load just the .dep file's metadata, not the .tas'''
+    with open(fname) as f:
+        content = f.read()
+    attrs = {}
+    for line in content.splitlines():
+        parts = line.strip().split(':')
+        key, value = parts[0], ':'.join(parts[1:]).strip()
+        key = key.strip().title()
+        if key in INT_DEP_FIELDS:
+            value = int(value)
+        elif key in FLOAT_DEP_FIELDS:
+            value = float(value)
+        elif key not in UPPER_STR_FIELDS:
+            value = value.upper()
+        if key == 'Metadata Entry':
+            if not key in attrs:
+                attrs[key] = value
+            else:
+                attrs[key] += '\n' + value
+        else:
+            attrs[key] = value
+    return attrs
+
+
+def optional_imports():
+    ''' Imports NumPy and xarray, which are only needed for the xarray
+    interface, returning None for either that is not installed.
+    '''
+    try:
+        import numpy as np
+        import xarray as xr
+    except ImportError:
+        np = xr = None
+    return np, xr
+
 
 def optional_imports_error(np, xr):
     if np is None:
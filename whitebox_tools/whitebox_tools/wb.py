@@ -0,0 +1,103 @@
+''' The "wb" command line dispatcher for whitebox-tools.
+
+    wb Slope --dem=DEM.dep --output=slope.dep
+    wb batch jobs.jsonl
+    wb --list
+
+The wb-<Tool> console scripts (e.g. wb-Slope) are aliases of wb whose
+tool is taken from the script name.  Tools are run on file paths only, so
+NumPy and xarray are never imported; the parser comes from the compiled
+tool registry (see registry.py).
+'''
+from __future__ import print_function
+import os
+import sys
+
+from whitebox_tools.registry import get_tool_spec, load_registry
+from whitebox_tools.util import fix_path
+
+USAGE = '''usage: wb <Tool> [tool arguments]
+       wb <Tool> --help
+       wb batch jobs.jsonl [-j MAX_WORKERS] [-o RESULTS] [--journal FILE]
+       wb --list
+
+Runs a whitebox-tools tool.  Each tool is also installed as wb-<Tool>.'''
+
+
+def prog_tool_name(prog):
+    ''' Returns the tool named by a wb-<Tool> script path, or None for
+    the wb script itself.
+    '''
+    name = os.path.basename(prog)
+    for suffix in ('.exe', '-script.py', '.py'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    if name.startswith('wb-'):
+        return name[len('wb-'):]
+    return None
+
+
+def cli_args(spec, kwargs):
+    ''' Formats parsed arguments (parameter name to value) as whitebox-tools
+    command line arguments, making input and output paths absolute.
+    '''
+    args = []
+    for name, value in kwargs.items():
+        if value is None or value is False:
+            continue
+        if value is True:
+            args.append('--{}'.format(name))
+            continue
+        param = spec.by_name.get(name)
+        if name == 'wd' or (param is not None and (param.is_input or param.is_output)):
+            value = fix_path(str(value))
+        try:
+            float(value)
+            args.append('--{}={}'.format(name, value))
+        except (TypeError, ValueError):
+            args.append('--{}="{}"'.format(name, value))
+    return args
+
+
+def run_cli(tool, argv, wbt=None):
+    ''' Parses argv with the tool's parser and runs the tool (with wbt, a
+    WhiteboxTools, if given), returning its return code.
+    '''
+    try:
+        spec = get_tool_spec(tool)
+    except ValueError as err:
+        print('{}\n\n{}'.format(err, USAGE), file=sys.stderr)
+        return 2
+    parser = spec.parser()
+    parser.prog = 'wb {}'.format(tool)
+    kwargs = vars(parser.parse_args(argv))
+    from whitebox_tools.whitebox_base import WhiteboxTools
+    from whitebox_tools.whitebox_cli import callback
+    wbt = wbt or WhiteboxTools()
+    return int(wbt.run_tool(tool, cli_args(spec, kwargs), callback))
+
+
+def main(argv=None, wbt=None):
+    ''' Entry point of wb and the wb-<Tool> aliases.
+    '''
+    if argv is None:
+        argv = sys.argv
+    args = list(argv[1:])
+    tool = prog_tool_name(argv[0])
+    if tool is None:
+        if not args or args[0] in ('-h', '--help'):
+            print(USAGE)
+            return 0
+        if args[0] in ('-l', '--list'):
+            for name, spec in sorted(load_registry().items()):
+                print('{}: {}'.format(name, spec.description))
+            return 0
+        if args[0] == 'batch':
+            from whitebox_tools.batch import batch_main
+            return batch_main(args[1:], wbt=wbt)
+        tool = args.pop(0)
+    return run_cli(tool, args, wbt=wbt)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+''' asyncio support for running whitebox-tools (Python 3.5+ only).
+
+Use WhiteboxTools.run_tool_async rather than importing this module
+directly, e.g.:
+
+    run = wbt.run_tool_async('Slope', ['--dem=DEM.dep', '--output=slope.dep'])
+    async for event in run:
+        if event.kind == 'progress':
+            print(event.label, event.percent)
+    ret = await run
+'''
+import asyncio
+from asyncio.subprocess import PIPE, STDOUT
+import pipes
+import sys
+import threading
+import time
+
+from whitebox_tools.whitebox_base import (ErrorEvent,
+                                          OutputParser,
+                                          RunResult,
+                                          WHITEBOX_KILL_AFTER,
+                                          WHITEBOX_VERBOSE,
+                                          tool_env)
+
+
+class AsyncToolRun(object):
+    ''' A tool run driven by the asyncio event loop.
+
+    Iterating with "async for" starts the tool (if needed) and yields a
+    ToolEvent per output line (progress is coalesced according to the
+    WhiteboxTools progress_rate, see OutputParser).  Awaiting the run consumes any remaining
+    output and returns a RunResult, as WhiteboxTools.run_tool does (CPU
+    time and peak memory are not measured for asyncio runs).  The tool is
+    cancelled if it runs longer than timeout seconds, whether or not it
+    is being iterated over, and by the WhiteboxTools cancel_op flag.
+    '''
+    def __init__(self, wbt, tool_name, args, callback=None,
+                 verbose=WHITEBOX_VERBOSE, timeout=None,
+                 kill_after=WHITEBOX_KILL_AFTER, threads=None):
+        self.wbt = wbt
+        self.tool_name = tool_name
+        self.args = wbt._tool_args(tool_name, args, verbose=verbose)
+        self.cwd = wbt.exe_path
+        self.verbose = wbt.verbose or verbose
+        self.callback = callback
+        self.timeout = timeout
+        self.kill_after = kill_after
+        self.threads = threads
+        self.parser = OutputParser(wbt.progress_rate)
+        self.lines = []
+        self.return_code = None
+        self._proc = None
+        self._loop = None
+        self._loop_thread = None
+        self._timer = None
+        self._cancelled = False
+        self._timed_out = False
+        self._start_time = None
+
+    async def _start(self):
+        if self._proc is not None or self.return_code is not None:
+            return
+        self._start_time = time.time()
+        self._loop = asyncio.get_event_loop()
+        self._loop_thread = threading.current_thread()
+        # may cancel the run at once, if cancel_op is already set
+        self.wbt._add_run(self.cancel)
+        if self._cancelled:
+            self._finish(2)
+            return
+        if self.verbose:
+            pretty_print = ' '.join(pipes.quote(arg) for arg in self.args)
+            print('Running: {}'.format(pretty_print))
+        try:
+            self._proc = await asyncio.create_subprocess_exec(
+                *self.args, stdout=PIPE, stderr=STDOUT, cwd=self.cwd,
+                env=tool_env(self.threads))
+        except (OSError, ValueError) as err:
+            self.lines.append(str(err))
+            self._finish(1)
+            self._emit(ErrorEvent(str(err)))
+            return
+        if self._cancelled:
+            # cancelled while the process was being spawned
+            self._stop()
+        elif self.timeout is not None:
+            self._timer = self._loop.call_later(self.timeout, self._time_out)
+
+    def _time_out(self):
+        self._timed_out = True
+        self.cancel()
+
+    def _finish(self, ret_code):
+        if self._timer is not None:
+            self._timer.cancel()
+        self.wbt._remove_run(self.cancel)
+        self.return_code = self._result(ret_code)
+
+    def _result(self, ret_code):
+        result = RunResult(ret_code, tool_name=self.tool_name, args=self.args,
+                           log=self.lines,
+                           wall_time=time.time() - self._start_time)
+        result.timed_out = self._timed_out
+        return result
+
+    def _emit(self, event):
+        if self.callback is not None:
+            self.callback(event)
+        return event
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self._start()
+        if self._proc is None:
+            raise StopAsyncIteration
+        while True:
+            line = await self._proc.stdout.readline()
+            if not line:
+                if self.return_code is None:
+                    ret_code = await self._proc.wait()
+                    self._finish(2 if self._cancelled else ret_code)
+                raise StopAsyncIteration
+            line = line.decode(sys.getdefaultencoding(), 'replace')
+            self.lines.append(line)
+            event = self.parser.parse(line)
+            if event is not None:
+                return self._emit(event)
+
+    async def wait(self):
+        ''' Runs the tool to completion and returns its RunResult.
+        '''
+        async for _ in self:
+            pass
+        return self.return_code
+
+    def __await__(self):
+        return self.wait().__await__()
+
+    def cancel(self):
+        ''' Sends the tool SIGTERM, and SIGKILL if it is still running
+        kill_after seconds later; awaiting the run then returns 2.  A
+        run cancelled before it started never starts.  Safe to call
+        from any thread.
+        '''
+        if self.return_code is not None or self._cancelled:
+            return
+        self._cancelled = True
+        if self._proc is None:
+            return
+        if threading.current_thread() is self._loop_thread:
+            self._stop()
+        else:
+            self._loop.call_soon_threadsafe(self._stop)
+
+    def _stop(self):
+        if self._proc.returncode is None:
+            self._proc.terminate()
+            self._loop.call_later(self.kill_after, self._kill)
+
+    def _kill(self):
+        if self._proc.returncode is None:
+            self._proc.kill()
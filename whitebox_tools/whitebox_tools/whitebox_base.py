@@ -3,14 +3,40 @@
 See whitebox_example.py for an example of how to use it.
 '''
 from __future__ import print_function
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import CFUNCTYPE, POINTER, c_char_p, c_int, c_size_t, cdll
+import hashlib
+import json
+import multiprocessing
 import os
 from os import path
 import pipes
+import re
 import sys
 from sys import platform
 from subprocess import CalledProcessError, Popen, PIPE, STDOUT
+import threading
+import time
+import warnings
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from whitebox_tools.result_cache import (WHITEBOX_RESULT_CACHE,
+                                         default_result_cache,
+                                         want_digests)
+from whitebox_tools.util import WHITEBOX_CACHE_DIR
 
 WHITEBOX_VERBOSE = bool(int(os.environ.get('WHITEBOX_VERBOSE', '1')))
+# Maximum progress updates per second sent to callbacks (0 sends every one)
+WHITEBOX_PROGRESS_RATE = float(os.environ.get('WHITEBOX_PROGRESS_RATE', '10'))
+# Seconds a cancelled tool gets to exit after SIGTERM before it is killed
+WHITEBOX_KILL_AFTER = float(os.environ.get('WHITEBOX_KILL_AFTER', '5'))
+# Seconds between checks for cancellation and timeouts of running tools
+POLL_INTERVAL = 0.05
+# Environment variable limiting the worker threads each tool spawns
+MAX_PROCS_ENV_VAR = 'WHITEBOX_MAX_PROCS'
 
 BUILD_PATH_PARTS = ('share', 'whitebox_tools',
                     'release', 'whitebox_tools',)
@@ -34,12 +60,533 @@ if EXE_PATH is None or WHITEBOX_TOOLS_BUILD:
                 EXE_PATH = pg
 
 
+BACKENDS = ('process', 'library')
+if platform == 'darwin':
+    LIBRARY_NAME = 'libwhitebox_tools.dylib'
+elif platform == 'win32':
+    LIBRARY_NAME = 'whitebox_tools.dll'
+else:
+    LIBRARY_NAME = 'libwhitebox_tools.so'
+
+# Signature of the output callback registered with the shared library's
+# set_output_callback: called with each line of tool output, it returns
+# nonzero to ask the running tool to stop.
+OUTPUT_CALLBACK = CFUNCTYPE(c_int, c_char_p)
+
+# The shared library keeps one output callback for the whole process,
+# so in-process runs are serialized.
+_LIBRARY_LOCK = threading.Lock()
+
+PROGRESS_RE = re.compile(r'^(?P<prefix>(?P<label>.*?):?)\s*(?P<percent>\d+)%$')
+ELAPSED_TIME_RE = re.compile(r'^elapsed time[^:]*:\s*(?P<elapsed>[\d.]+)\s*(?P<units>.*)$',
+                             re.IGNORECASE)
+
+
+class ToolEvent(str):
+    ''' A line of tool output.  Events are strings, so callbacks written
+    for plain output lines keep working; the subclasses below carry the
+    values parsed from the line.
+    '''
+    kind = 'message'
+
+
+class MessageEvent(ToolEvent):
+    ''' Any output line that is not progress, an error or a timing.
+    '''
+
+
+class ProgressEvent(ToolEvent):
+    ''' A "<label>: <percent>%" progress line.  prefix is the text
+    before the percentage as the tool wrote it (the label and colon).
+    '''
+    kind = 'progress'
+    label = ''
+    prefix = ''
+    percent = 0
+
+
+class ErrorEvent(ToolEvent):
+    ''' An output line reporting an error.
+    '''
+    kind = 'error'
+
+
+class ElapsedTimeEvent(ToolEvent):
+    ''' An "Elapsed Time (excluding I/O): ..." line.  elapsed_text is
+    the number as the tool wrote it.
+    '''
+    kind = 'elapsed_time'
+    elapsed = 0.
+    elapsed_text = ''
+    units = ''
+
+
+def parse_output_line(line):
+    ''' Parses a line of tool output into a ToolEvent.
+    '''
+    line = line.strip()
+    match = PROGRESS_RE.match(line)
+    if match:
+        event = ProgressEvent(line)
+        event.label = match.group('label').strip()
+        event.prefix = match.group('prefix').strip()
+        event.percent = int(match.group('percent'))
+        return event
+    if 'error' in line.lower():
+        return ErrorEvent(line)
+    match = ELAPSED_TIME_RE.match(line)
+    if match:
+        event = ElapsedTimeEvent(line)
+        event.elapsed = float(match.group('elapsed'))
+        event.elapsed_text = match.group('elapsed')
+        event.units = match.group('units').strip()
+        return event
+    return MessageEvent(line)
+
+
+class OutputParser(object):
+    ''' Parses the output of one tool run into ToolEvents, coalescing
+    progress events so that at most max_rate of them per second are
+    reported.  The first and the 100% update of each progress label, and
+    the first progress update after any other output, are always reported.
+    '''
+    def __init__(self, max_rate=WHITEBOX_PROGRESS_RATE):
+        self.interval = 1. / max_rate if max_rate else 0.
+        self._label = None
+        self._reported = 0.
+
+    def parse(self, line):
+        ''' Returns the ToolEvent for line, or None if it is a progress
+        update that is coalesced away.
+        '''
+        event = parse_output_line(line)
+        if event.kind != 'progress':
+            self._label = None
+            return event
+        if not self.interval:
+            return event
+        now = time.time()
+        if (event.label == self._label and event.percent < 100 and
+                now - self._reported < self.interval):
+            return None
+        self._label = event.label
+        self._reported = now
+        return event
+
+
+OUTPUT_ARG_RE = re.compile(r'^--?(o|output|outputs|out_(?!type=)\w+)=(?P<value>.*)$')
+TIME_UNITS = {'': 1., 's': 1., 'ms': 1e-3, 'm': 60., 'min': 60., 'h': 3600.}
+
+
+def _unquote(value):
+    return value.strip().strip('"').strip("'")
+
+
+def output_paths(args):
+    ''' Returns the output file paths named in a tool's command line
+    arguments, made absolute with respect to its --wd argument.
+    '''
+    wkdir = ''
+    for arg in args:
+        if arg.startswith('--wd='):
+            wkdir = _unquote(arg[len('--wd='):])
+    paths = []
+    for arg in args:
+        match = OUTPUT_ARG_RE.match(arg)
+        if match:
+            for value in re.split('[;,]', _unquote(match.group('value'))):
+                if value.strip():
+                    paths.append(os.path.join(wkdir, _unquote(value)))
+    return paths
+
+
+def _poll(proc):
+    ''' Reaps proc if it has exited, without blocking.  Returns its return
+    code and resource usage (None where os.wait4 is not available), or
+    None if it is still running.
+    '''
+    if proc.returncode is not None:
+        return proc.returncode, None
+    if not hasattr(os, 'wait4'):
+        if proc.poll() is None:
+            return None
+        return proc.returncode, None
+    try:
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+    except OSError:
+        return proc.wait(), None
+    if pid == 0:
+        return None
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    return proc.returncode, rusage
+
+
+def _read_output(stream, lines):
+    for line in iter(stream.readline, ''):
+        lines.put(line)
+    stream.close()
+    lines.put(None)
+
+
+class RunResult(int):
+    ''' The result of running a tool.  A RunResult is the tool's return
+    code (see WhiteboxTools.run_tool), so it can be compared and tested
+    like one, with these additional attributes:
+
+        return_code:  the return code as a plain int
+        tool_name:  the tool that was run
+        wall_time:  seconds from starting the tool until it exited
+        user_time, sys_time:  CPU seconds used by the tool process
+        max_rss:  peak resident set size of the tool process in bytes
+        compute_time:  the tool's reported "Elapsed Time (excluding I/O)"
+                       in seconds
+        timed_out:  True if the tool was stopped because it ran past its
+                    timeout (the return code is then 2)
+        cached:  True if the outputs came from the result cache and the
+                 tool was not run
+        outputs:  output file paths given in the tool's arguments
+        log:  the tool's output lines
+
+    Values that could not be measured are None.
+    '''
+    def __new__(cls, return_code, tool_name=None, args=(), log=(),
+                wall_time=None, rusage=None):
+        result = int.__new__(cls, return_code or 0)
+        result.return_code = int(result)
+        result.tool_name = tool_name
+        result.outputs = output_paths(args)
+        result.log = [line.rstrip('\n') for line in log]
+        result.wall_time = wall_time
+        result.user_time = result.sys_time = result.max_rss = None
+        if rusage is not None:
+            result.user_time = rusage.ru_utime
+            result.sys_time = rusage.ru_stime
+            # ru_maxrss is in kilobytes except on macOS
+            result.max_rss = rusage.ru_maxrss * (1 if platform == 'darwin' else 1024)
+        result.timed_out = False
+        result.cached = False
+        result.compute_time = None
+        for line in reversed(result.log):
+            match = ELAPSED_TIME_RE.match(line.strip())
+            if match and 'excluding' in line.lower():
+                units = match.group('units').strip().lower()
+                if units in TIME_UNITS:
+                    result.compute_time = float(match.group('elapsed')) * TIME_UNITS[units]
+                break
+        return result
+
+    def __repr__(self):
+        return 'RunResult({}, tool_name={!r}, wall_time={})'.format(
+            self.return_code, self.tool_name, self.wall_time)
+
+
+def load_library(lib_dir):
+    ''' Loads the whitebox-tools shared library from lib_dir.
+    Returns None if the library is missing or does not export run_tool.
+    The library's run_tool takes the tool name, its arguments, their
+    count and the tool's worker thread limit (0 for the default).
+    '''
+    lib_path = os.path.join(lib_dir, LIBRARY_NAME)
+    if not os.path.exists(lib_path):
+        return None
+    try:
+        lib = cdll.LoadLibrary(lib_path)
+        lib.run_tool.restype = c_int
+        lib.run_tool.argtypes = [c_char_p, POINTER(c_char_p), c_size_t, c_size_t]
+    except (OSError, AttributeError):
+        return None
+    if hasattr(lib, 'set_output_callback'):
+        lib.set_output_callback.restype = None
+        lib.set_output_callback.argtypes = [OUTPUT_CALLBACK]
+    return lib
+
+
+def tool_env(threads=None):
+    ''' Returns the environment for a tool process limited to threads
+    worker threads (None for the current environment, where tools use
+    every CPU unless WHITEBOX_MAX_PROCS is already set).
+    '''
+    if threads is None:
+        return None
+    env = os.environ.copy()
+    env[MAX_PROCS_ENV_VAR] = str(max(1, int(threads)))
+    return env
+
+
+def split_threads(max_workers, cpu_count=None):
+    ''' Returns how many threads each of max_workers concurrent tools may
+    use so that together they do not oversubscribe the CPUs.
+    '''
+    if cpu_count is None:
+        cpu_count = multiprocessing.cpu_count()
+    return max(1, cpu_count // max(1, max_workers))
+
+
 def default_callback(value):
     ''' A simple default callback that outputs using the print function.
     '''
     print(value)
 
 
+TOOL_HELP_PARAM_RE = re.compile(r'^(?P<flags>-[\w-]*(?:,\s*-[\w-]*)*)\s+(?P<description>.*)$')
+
+
+def parse_tool_list(lines):
+    ''' Parses the output of --listtools into a dict of tool name to
+    description.
+    '''
+    tool_list = {}
+    for line in lines:
+        name, sep, description = line.strip().partition(':')
+        if sep and name and ' ' not in name.strip():
+            tool_list[name.strip()] = description.strip()
+    return tool_list
+
+
+def parse_tool_help(lines):
+    ''' Parses the "Input parameters" section of --toolhelp output into
+    a list of [flags, description] pairs, as in tool_data.json.
+    '''
+    params = []
+    in_params = False
+    for line in lines:
+        line = line.strip()
+        if line.startswith('Input parameters'):
+            in_params = True
+            continue
+        if not in_params:
+            continue
+        if line.startswith(('Example usage', 'No example')):
+            break
+        match = TOOL_HELP_PARAM_RE.match(line)
+        if match:
+            flags = [f.strip() for f in match.group('flags').split(',')]
+            params.append([flags, match.group('description').strip().rstrip('.')])
+    if params and not any('--wd' in flags for flags, _ in params):
+        params.insert(1, [['--wd'], 'Working directory'])
+    return params
+
+
+class MetadataCache(object):
+    ''' The help, license, version, tool list and tool help output of one
+    whitebox-tools executable, saved as JSON under cache_dir.
+
+    Entries are kept while the executable's path, size and modification
+    time are unchanged, and are dropped (in memory and on disk) as soon
+    as any of them changes.  Use metadata_cache() to share one instance
+    per executable within a process.
+    '''
+    def __init__(self, exe_name, cache_dir=WHITEBOX_CACHE_DIR):
+        self.exe_name = os.path.abspath(exe_name)
+        key = hashlib.sha1(self.exe_name.encode('utf-8')).hexdigest()
+        self.cache_file = os.path.join(cache_dir, key + '.json')
+        self.entries = {}
+        self._stamp = None
+        self._lock = threading.RLock()
+        self._load()
+
+    def _exe_stamp(self):
+        try:
+            st = os.stat(self.exe_name)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime]
+
+    def _load(self):
+        self._stamp = self._exe_stamp()
+        try:
+            with open(self.cache_file) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if (data.get('exe') == self.exe_name and
+                data.get('stamp') == self._stamp):
+            self.entries = data.get('entries', {})
+
+    def _check_stale(self):
+        if self._exe_stamp() != self._stamp:
+            self.entries = {}
+            self._stamp = self._exe_stamp()
+
+    def get(self, key):
+        ''' Returns the cached output lines for key, or None.
+        '''
+        with self._lock:
+            self._check_stale()
+            return self.entries.get(key)
+
+    def set(self, key, lines, save=True):
+        ''' Caches output lines under key and, if save, writes the cache
+        file.
+        '''
+        with self._lock:
+            self._check_stale()
+            self.entries[key] = list(lines)
+            if save:
+                self.save()
+
+    def clear(self):
+        ''' Drops every entry.
+        '''
+        with self._lock:
+            self.entries = {}
+            self.save()
+
+    def save(self):
+        ''' Writes the cache file (errors are ignored: the cache is then
+        only kept in memory).
+        '''
+        with self._lock:
+            data = {'exe': self.exe_name, 'stamp': self._stamp,
+                    'entries': self.entries}
+            tmp_file = '{}.{}.tmp'.format(self.cache_file, os.getpid())
+            try:
+                if not os.path.isdir(os.path.dirname(self.cache_file)):
+                    os.makedirs(os.path.dirname(self.cache_file))
+                with open(tmp_file, 'w') as f:
+                    json.dump(data, f)
+                getattr(os, 'replace', os.rename)(tmp_file, self.cache_file)
+            except (IOError, OSError):
+                pass
+
+
+_METADATA_CACHES = {}
+_METADATA_CACHES_LOCK = threading.Lock()
+
+
+def metadata_cache(exe_name, cache_dir=WHITEBOX_CACHE_DIR):
+    ''' Returns the process-wide MetadataCache of an executable.
+    '''
+    key = (os.path.abspath(exe_name), cache_dir)
+    with _METADATA_CACHES_LOCK:
+        if key not in _METADATA_CACHES:
+            _METADATA_CACHES[key] = MetadataCache(exe_name, cache_dir)
+        return _METADATA_CACHES[key]
+
+
+class ToolRun(object):
+    ''' A handle on one running tool, returned by WhiteboxTools.start_tool.
+
+    The tool's output is read on a background thread and wait() passes it
+    to the callback on the calling thread.  A watcher thread stops the tool
+    on cancel(), on the timeout or when the WhiteboxTools cancel_op flag is
+    set, whether or not anyone is waiting, so a tool can be stopped even
+    while it prints nothing.  A stopped tool is sent SIGTERM and, if it is
+    still running kill_after seconds later, SIGKILL.
+    '''
+    def __init__(self, wbt, args, tool_name=None,
+                 callback=default_callback, silent=False,
+                 timeout=None, kill_after=WHITEBOX_KILL_AFTER,
+                 verbose=False, threads=None):
+        self.wbt = wbt
+        self.args = args
+        self.tool_name = tool_name
+        self.callback = callback
+        self.silent = silent
+        self.timeout = timeout
+        self.kill_after = kill_after
+        self.lines = []
+        self.result = None
+        self._cancelled = threading.Event()
+        self._timed_out = False
+        self._terminated_at = None
+        self._killed = False
+        self._status = None
+        self._exited = threading.Event()
+        if verbose or wbt.verbose:
+            pretty_print = ' '.join(pipes.quote(arg) for arg in args)
+            print('Running: {}'.format(pretty_print))
+        self.start_time = time.time()
+        self.proc = Popen(args, shell=False, stdout=PIPE,
+                          stderr=STDOUT, bufsize=1,
+                          universal_newlines=True,
+                          cwd=wbt.exe_path,
+                          env=tool_env(threads))
+        self._output = queue.Queue()
+        self._reader = threading.Thread(target=_read_output,
+                                        args=(self.proc.stdout, self._output))
+        self._reader.daemon = True
+        self._reader.start()
+        wbt._add_run(self.cancel)
+        self._watcher = threading.Thread(target=self._watch)
+        self._watcher.daemon = True
+        self._watcher.start()
+
+    def cancel(self):
+        ''' Asks the tool to stop; wait() then returns 2.  Safe to call
+        from any thread.
+        '''
+        self._cancelled.set()
+
+    def done(self):
+        ''' Returns True once wait() has collected the tool's result.
+        '''
+        return self.result is not None
+
+    def _stop_if_requested(self):
+        if (self.timeout is not None and not self._cancelled.is_set() and
+                time.time() - self.start_time > self.timeout):
+            self._timed_out = True
+            self._cancelled.set()
+        if not self._cancelled.is_set() or self.proc.returncode is not None:
+            return
+        if self._terminated_at is None:
+            self._terminated_at = time.time()
+            self.proc.terminate()
+        elif (not self._killed and
+              time.time() - self._terminated_at > self.kill_after):
+            self._killed = True
+            self.proc.kill()
+
+    def _watch(self):
+        status = None
+        while status is None:
+            self._stop_if_requested()
+            status = _poll(self.proc)
+            if status is None:
+                time.sleep(POLL_INTERVAL)
+        self._status = status + (time.time(),)
+        self.wbt._remove_run(self.cancel)
+        self._exited.set()
+
+    def wait(self):
+        ''' Waits for the tool to exit, sending its output to the callback,
+        and returns its RunResult.
+        '''
+        if self.result is not None:
+            return self.result
+        parser = OutputParser(self.wbt.progress_rate)
+        while True:
+            try:
+                line = self._output.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                # the tool has exited but something it started may still
+                # hold its output open
+                if self._exited.is_set():
+                    break
+                continue
+            if line is None:
+                break
+            self.lines.append(line)
+            if not self.silent and not self._cancelled.is_set():
+                event = parser.parse(line)
+                if event is not None:
+                    self.callback(event)
+                    sys.stdout.flush()
+        self._exited.wait()
+        exit_code, rusage, end_time = self._status
+        ret_code = 2 if self._cancelled.is_set() else exit_code
+        self.result = RunResult(ret_code, tool_name=self.tool_name,
+                                args=self.args, log=self.lines,
+                                wall_time=end_time - self.start_time,
+                                rusage=rusage)
+        self.result.timed_out = self._timed_out
+        return self.result
+
+
 class WhiteboxTools(object):
     ''' An object for interfacing with the whitebox - tools executable.
     '''
@@ -47,11 +594,46 @@ class WhiteboxTools(object):
     # wd = ""
     # verbose = True
 
-    def __init__(self, exe_path=None):
+    def __init__(self, exe_path=None, backend='process'):
         self.set_whitebox_dir(exe_path)
         self.wkdir = ""
         self.verbose = WHITEBOX_VERBOSE
+        self._runs = set()
+        self._runs_lock = threading.Lock()
         self.cancel_op = False
+        self.progress_rate = WHITEBOX_PROGRESS_RATE
+        self.cache_dir = WHITEBOX_CACHE_DIR
+        self.result_cache = None
+        if WHITEBOX_RESULT_CACHE:
+            self.set_result_cache(True)
+        self.set_backend(backend)
+
+    @property
+    def cancel_op(self):
+        ''' Setting cancel_op to True stops every tool this object is
+        running, or the next one started if none is running.
+        '''
+        return self._cancel_op
+
+    @cancel_op.setter
+    def cancel_op(self, value):
+        with self._runs_lock:
+            if value and self._runs:
+                for cancel in list(self._runs):
+                    cancel()
+                value = False
+            self._cancel_op = bool(value)
+
+    def _add_run(self, cancel):
+        with self._runs_lock:
+            self._runs.add(cancel)
+            if self._cancel_op:
+                self._cancel_op = False
+                cancel()
+
+    def _remove_run(self, cancel):
+        with self._runs_lock:
+            self._runs.discard(cancel)
 
     def set_whitebox_dir(self, exe_path=None):
         ''' Sets the directory to the whitebox - tools executable file.
@@ -69,6 +651,25 @@ class WhiteboxTools(object):
         self.exe_path = os.path.dirname(os.path.abspath(exe_path))
         self.exe_name = exe_path
 
+    def set_backend(self, backend='process'):
+        ''' Sets how tools are run: "process" runs the whitebox - tools
+        executable for each tool, "library" calls the whitebox - tools shared
+        library (LIBRARY_NAME, built from src/rename_to_lib.rs) in-process.
+        Raises ValueError if the shared library cannot be loaded from the
+        executable's directory.
+        '''
+        if backend not in BACKENDS:
+            raise ValueError('backend must be one of {} (got {!r})'.format(BACKENDS, backend))
+        library = None
+        if backend == 'library':
+            library = load_library(self.exe_path)
+            if library is None:
+                raise ValueError('Could not load the whitebox-tools shared library {} '
+                                 'for the "library" backend'.format(
+                                     os.path.join(self.exe_path, LIBRARY_NAME)))
+        self.backend = backend
+        self.library = library
+
     def set_working_dir(self, path_str):
         ''' Sets the working directory.
         '''
@@ -79,72 +680,277 @@ class WhiteboxTools(object):
         '''
         self.verbose = val
 
+    def set_progress_rate(self, max_rate=WHITEBOX_PROGRESS_RATE):
+        ''' Sets the maximum number of progress updates per second sent to
+        callbacks (0 or None sends every update).
+        '''
+        self.progress_rate = max_rate
+
+    def set_cache_dir(self, cache_dir=WHITEBOX_CACHE_DIR):
+        ''' Sets the directory where help, version and tool list output is
+        cached (see MetadataCache).
+        '''
+        self.cache_dir = cache_dir
+
+    def set_result_cache(self, cache=True):
+        ''' Turns on caching of tool outputs (see result_cache.py): cache
+        is True for the shared cache in WHITEBOX_RESULT_CACHE_DIR, or a
+        ResultCache.  None or False turns caching off.
+        '''
+        if cache is True:
+            cache = default_result_cache()
+        self.result_cache = cache or None
+        want_digests(self, self.result_cache is not None)
+
+    def _exe_id(self):
+        ''' Identifies the executable's build, for result cache keys.
+        '''
+        st = os.stat(self.exe_name)
+        version = self._metadata('version', '--version', silent=True)
+        return [''.join(version), st.st_size, st.st_mtime]
+
     def _run_process(self, args, **kwargs):
-        callback = kwargs.get('callback', default_callback)
-        if kwargs.get('verbose') or self.verbose:
-            pretty_print = ' '.join(pipes.quote(arg) for arg in args)
-            print('Running: {}'.format(pretty_print))
-        proc = Popen(args, shell=False, stdout=PIPE,
-                         stderr=STDOUT, bufsize=1,
-                         universal_newlines=True,
-                         cwd=self.exe_path)
+        run = ToolRun(self, args,
+                      tool_name=kwargs.get('tool_name'),
+                      callback=kwargs.get('callback', default_callback),
+                      silent=kwargs.get('silent'),
+                      timeout=kwargs.get('timeout'),
+                      verbose=kwargs.get('verbose'))
+        return run.wait(), run.lines
+
+    def _run_library(self, tool_name, args, callback=default_callback,
+                     threads=None):
+        ''' Runs a tool with the shared library on a worker thread, passing
+        the output it sends to the registered C callback on to callback.
+        '''
         lines = []
-        silent = kwargs.get('silent')
-        ret_code = 0
+        output = queue.Queue()
+        cancelled = threading.Event()
+
+        def on_output(line):
+            output.put(line.decode('utf-8', 'replace'))
+            return int(cancelled.is_set())
+
+        c_callback = OUTPUT_CALLBACK(on_output)
+        c_args = (c_char_p * len(args))(*(a.encode('utf-8') for a in args))
+        result = []
+
+        def worker():
+            try:
+                with _LIBRARY_LOCK:
+                    set_callback = getattr(self.library, 'set_output_callback', None)
+                    if set_callback is not None:
+                        set_callback(c_callback)
+                    # the limit is passed per call: changing os.environ
+                    # would race with the environments of process runs
+                    max_procs = 0 if threads is None else max(1, int(threads))
+                    try:
+                        result.append(self.library.run_tool(
+                            tool_name.encode('utf-8'), c_args, len(args), max_procs))
+                    finally:
+                        if set_callback is not None:
+                            set_callback(OUTPUT_CALLBACK())
+            except (OSError, ValueError) as err:
+                output.put(str(err))
+            finally:
+                output.put(None)
+
+        start = time.time()
+        self._add_run(cancelled.set)
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+        parser = OutputParser(self.progress_rate)
         while True:
-            line = proc.stdout.readline()
-            sys.stdout.flush()
-            if line != '':
-                if not self.cancel_op and not silent:
-                    callback(line.strip())
-                else:
-                    self.cancel_op = False
-                    proc.terminate()
-                    ret_code = 2
-            else:
+            line = output.get()
+            if line is None:
                 break
             lines.append(line)
-        ret_code = ret_code or proc.poll()
-        return ret_code, lines
+            event = parser.parse(line)
+            if event is not None:
+                callback(event)
+        thread.join()
+        self._remove_run(cancelled.set)
+        ret_code = result[0] if result else 1
+        if cancelled.is_set():
+            ret_code = 2
+        result = RunResult(ret_code, tool_name=tool_name, args=args,
+                           log=lines, wall_time=time.time() - start)
+        return result, lines
+
+    def _tool_args(self, tool_name, args, verbose=WHITEBOX_VERBOSE):
+        ''' Builds the command line that runs tool_name with args.
+        '''
+        args2 = []
+        args2.append(self.exe_name)
+        args2.append("--run=\"{}\"".format(tool_name))
+
+        if not any(a.startswith('--wd=') for a in set(args2 + list(args))):
+            wkdir = self.wkdir or os.path.abspath(os.curdir)
+            args2.append("--wd=\"{}\"".format(wkdir))
+
+        for arg in args:
+            args2.append(arg)
+
+        # args_str = args_str[:-1]
+        # a.append("--args=\"{}\"".format(args_str))
+
+        if self.verbose or verbose:
+            args2.append("-v")
+        return args2
+
+    def start_tool(self, tool_name, args,
+                   callback=default_callback,
+                   verbose=WHITEBOX_VERBOSE,
+                   timeout=None,
+                   threads=None):
+        ''' Starts a tool with the executable and returns its ToolRun.
+        Call wait() on it for the RunResult, or cancel() to stop the tool.
+        If timeout (seconds) is given, the tool is stopped once it has run
+        that long.  If threads is given, the tool spawns at most that many
+        worker threads.
+        '''
+        args2 = self._tool_args(tool_name, args, verbose=verbose)
+        return ToolRun(self, args2, tool_name=tool_name, callback=callback,
+                       timeout=timeout, threads=threads)
 
     def run_tool(self, tool_name, args,
                  callback=default_callback,
-                 verbose=WHITEBOX_VERBOSE):
+                 verbose=WHITEBOX_VERBOSE,
+                 timeout=None,
+                 threads=None):
         ''' Runs a tool and specifies tool arguments.
         Returns 0 if completes without error.
         Returns 1 if error encountered (details are sent to callback).
-        Returns 2 if process is cancelled by user.
+        Returns 2 if process is cancelled by user or runs longer than
+        timeout seconds.
+        The tool spawns at most threads worker threads (default: one per
+        CPU, or WHITEBOX_MAX_PROCS if set).
+        The return value is a RunResult, which also holds the run's
+        timings, resource usage, output paths and output lines.
+        If a result cache is set (see set_result_cache) and holds the
+        outputs of the same run, they are copied to the output paths and
+        the cached output lines are sent to callback instead of running
+        the tool.
         '''
+        cache = self.result_cache
+        if cache is None:
+            return self._run_tool(tool_name, args, callback, verbose,
+                                  timeout, threads)
+        start = time.time()
+        args2 = self._tool_args(tool_name, args, verbose=False)[2:]
         try:
-            args2 = []
-            args2.append(self.exe_name)
-            args2.append("--run=\"{}\"".format(tool_name))
+            key, outputs = cache.key(tool_name, args2, self._exe_id())
+        except (IOError, OSError):
+            return self._run_tool(tool_name, args, callback, verbose,
+                                  timeout, threads)
+        meta = cache.get(key, outputs)
+        if meta is not None:
+            parser = OutputParser(self.progress_rate)
+            for line in meta['log']:
+                event = parser.parse(line)
+                if event is not None:
+                    callback(event)
+            result = RunResult(0, tool_name=tool_name, args=args2,
+                               log=meta['log'], wall_time=time.time() - start)
+            result.cached = True
+            return result
+        result = self._run_tool(tool_name, args, callback, verbose,
+                                timeout, threads)
+        if result == 0:
+            cache.put(key, tool_name, outputs, result.log)
+        return result
 
-            if not any(a.startswith('--wd=') for a in set(args2 + list(args))):
-                wkdir = self.wkdir or os.path.abspath(os.curdir)
-                args2.append("--wd=\"{}\"".format(wkdir))
+    def _run_tool(self, tool_name, args, callback, verbose, timeout, threads):
+        try:
+            if self.library is not None:
+                if timeout is None:
+                    args2 = self._tool_args(tool_name, args, verbose=verbose)
+                    return self._run_library(tool_name, args2[2:], callback=callback,
+                                             threads=threads)[0]
+                warnings.warn('A tool in the library cannot be stopped after a timeout: '
+                              'running {} with the executable instead'.format(tool_name),
+                              RuntimeWarning)
+            run = self.start_tool(tool_name, args, callback=callback,
+                                  verbose=verbose, timeout=timeout,
+                                  threads=threads)
+            return run.wait()
+        except (OSError, ValueError, CalledProcessError) as err:
+            callback(str(err))
+            return RunResult(1, tool_name=tool_name, log=[str(err)])
 
-            for arg in args:
-                args2.append(arg)
+    def run_tools(self, jobs, max_workers=None,
+                  callback=default_callback,
+                  verbose=WHITEBOX_VERBOSE,
+                  timeout=None,
+                  threads=None):
+        ''' Runs several independent tools concurrently.
+        jobs is a sequence of (tool_name, args) or (tool_name, args, callback)
+        tuples; jobs without their own callback send output to callback.
+        At most max_workers tools (default: number of CPUs) run at a time,
+        and each is stopped if it runs longer than timeout seconds.
+        Each tool spawns at most threads worker threads; by default the
+        CPUs are split evenly between the max_workers concurrent tools.
+        Returns a list of RunResults (see run_tool), one per job, in the
+        order the jobs were given.
+        '''
+        jobs = [tuple(job) for job in jobs]
+        if not jobs:
+            return []
+        if max_workers is None:
+            max_workers = multiprocessing.cpu_count()
+        max_workers = max(1, min(max_workers, len(jobs)))
+        if threads is None:
+            threads = split_threads(max_workers)
 
-            # args_str = args_str[:-1]
-            # a.append("--args=\"{}\"".format(args_str))
+        def run_job(job):
+            tool_name, args = job[:2]
+            job_callback = job[2] if len(job) > 2 else callback
+            return self.run_tool(tool_name, args, job_callback,
+                                 verbose=verbose, timeout=timeout,
+                                 threads=threads)
 
-            if self.verbose or verbose:
-                args2.append("-v")
-            return self._run_process(args2, callback=callback, silent=False)[0] or 0
-        except (OSError, ValueError, CalledProcessError) as err:
-            callback(str(err))
-            return 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run_job, jobs))
+
+    def run_tool_async(self, tool_name, args, callback=None,
+                       verbose=WHITEBOX_VERBOSE, timeout=None,
+                       threads=None):
+        ''' Runs a tool on the running asyncio event loop (Python 3.5+).
+        Returns an AsyncToolRun: await it for the return code (see
+        run_tool), or iterate over it with "async for" to receive each
+        line of output as a ToolEvent while the tool runs.  Its cancel()
+        stops the tool, as does running longer than timeout seconds.  The
+        tool spawns at most threads worker threads.
+        '''
+        from whitebox_tools.whitebox_async import AsyncToolRun
+        return AsyncToolRun(self, tool_name, args, callback=callback,
+                            verbose=verbose, timeout=timeout,
+                            threads=threads)
+
+    def _metadata(self, key, option, silent=False):
+        ''' Returns the output lines of running the executable with
+        option, from the metadata cache when it has them.  The output of a
+        successful run is cached.  Unless silent, the lines are also sent
+        to default_callback.
+        '''
+        cache = metadata_cache(self.exe_name, self.cache_dir)
+        lines = cache.get(key)
+        if lines is None:
+            result, lines = self._run_process([self.exe_name, option],
+                                              silent=True)
+            if result == 0:
+                cache.set(key, lines)
+        if not silent:
+            for line in lines:
+                default_callback(line.rstrip('\n'))
+        return lines
 
     def help(self):
         ''' Retrieve the help description for whitebox - tools.
         '''
         try:
-            args = []
-            args.append(self.exe_name)
-            args.append("-h")
-            return self._run_process(args)[1]
+            return self._metadata('help', '-h')
         except (OSError, ValueError, CalledProcessError) as err:
             return err
 
@@ -152,10 +958,7 @@ class WhiteboxTools(object):
         ''' Retrieves the license information for whitebox - tools.
         '''
         try:
-            args = []
-            args.append(self.exe_name)
-            args.append("--license")
-            return self._run_process(args)[1]
+            return self._metadata('license', '--license')
         except (OSError, ValueError, CalledProcessError) as err:
             return err
 
@@ -163,11 +966,7 @@ class WhiteboxTools(object):
         ''' Retrieves the version information for whitebox - tools.
         '''
         try:
-            args = []
-            args.append(self.exe_name)
-            args.append("--version")
-
-            return self._run_process(args)[1]
+            return self._metadata('version', '--version')
         except (OSError, ValueError, CalledProcessError) as err:
             return err
 
@@ -175,23 +974,50 @@ class WhiteboxTools(object):
         ''' Retrieve the help description for a specific tool.
         '''
         try:
-            args = []
-            args.append(self.exe_name)
-            args.append("--toolhelp={}".format(tool_name))
-            return self._run_process(args, silent=silent)[1]
+            return self._metadata('toolhelp:{}'.format(tool_name),
+                                  '--toolhelp={}'.format(tool_name),
+                                  silent=silent)
         except (OSError, ValueError, CalledProcessError) as err:
             return err
 
-    def list_tools(self):
+    def list_tools(self, silent=False):
         ''' Lists all available tools in whitebox - tools.
         '''
         try:
-            args = []
-            args.append(self.exe_name)
-            args.append("--listtools")
-
-            proc = Popen(args, shell=False, stdout=PIPE,
-                         stderr=STDOUT, bufsize=1, universal_newlines=True)
-            return self._run_process(args)[1]
+            return self._metadata('listtools', '--listtools', silent=silent)
         except (OSError, ValueError, CalledProcessError) as err:
             return err
+
+    def refresh_metadata(self, force=False, max_workers=None):
+        ''' Fills the metadata cache with the tool list and the help of
+        every tool, running up to max_workers (default: number of CPUs)
+        executables at a time for the entries that are missing.  If force,
+        the cache is cleared first.  Returns a dict of tool name to its
+        help lines.
+        '''
+        cache = metadata_cache(self.exe_name, self.cache_dir)
+        if force:
+            cache.clear()
+        tool_list = self.list_tools(silent=True)
+        if isinstance(tool_list, Exception):
+            raise tool_list
+        tool_names = sorted(parse_tool_list(tool_list))
+        missing = [name for name in tool_names
+                   if cache.get('toolhelp:{}'.format(name)) is None]
+
+        def fetch(tool_name):
+            return self._run_process([self.exe_name,
+                                      '--toolhelp={}'.format(tool_name)],
+                                     silent=True)
+
+        if missing:
+            max_workers = max_workers or multiprocessing.cpu_count()
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for name, (result, lines) in zip(missing,
+                                                 executor.map(fetch, missing)):
+                    if result == 0:
+                        cache.set('toolhelp:{}'.format(name), lines,
+                                  save=False)
+            cache.save()
+        return {name: cache.get('toolhelp:{}'.format(name))
+                for name in tool_names}
@@ -7,20 +7,13 @@ import re
 import string
 import sys
 
-from whitebox_tools.util import optional_imports_error
-try:
-    import numpy as np
-    import xarray as xr
-except:
-    np = xr = None
-
-
-from whitebox_tools.whitebox_base import WhiteboxTools, WHITEBOX_VERBOSE
-from whitebox_tools.xarray_io import (xarray_whitebox_io,
-                                      fix_path,
-                                      WHITEBOX_TEMP_DIR,
-                                      _is_input_field,
-                                      _is_output_field)
+from whitebox_tools.util import optional_imports, optional_imports_error
+from whitebox_tools.whitebox_base import (WhiteboxTools,
+                                          ToolEvent,
+                                          WHITEBOX_VERBOSE,
+                                          parse_output_line,
+                                          parse_tool_help)
+from whitebox_tools.registry import get_tool_spec
 
 try:
     unicode
@@ -36,11 +29,25 @@ listtools_file = os.path.join(
         os.path.dirname(os.path.abspath(__file__)),
         'data',
         'listtools.txt')
-with open(listtools_file) as f:
-    listtools = filter(None, (_.strip() for _ in f.read().splitlines()))
-    listtools = (_.split(':') for _ in listtools)
-    listtools = {k.strip(): v.strip() for k, v in listtools}
-    tools = sorted(listtools)
+
+# listtools, tools, HELP and the tool wrappers are created on first use
+# (see __getattr__ below) so that importing the package stays cheap
+_LOADED = {}
+
+
+def _listtools():
+    if 'listtools' not in _LOADED:
+        with open(listtools_file) as f:
+            listtools = filter(None, (_.strip() for _ in f.read().splitlines()))
+            listtools = (_.split(':') for _ in listtools)
+            _LOADED['listtools'] = {k.strip(): v.strip() for k, v in listtools}
+    return _LOADED['listtools']
+
+
+def _help():
+    if 'HELP' not in _LOADED:
+        _LOADED['HELP'] = get_all_help()
+    return _LOADED['HELP']
 
 
 # These are imported when doing * (more are available via CLI, e.g. wb-Max)
@@ -234,29 +241,24 @@ def callback(out_str, silent=False):
     try:
         if not hasattr(callback, 'prev_line_progress'):
             callback.prev_line_progress = False
-        if "%" in out_str:
-            str_array = out_str.split(" ")
-            label = out_str.replace(str_array[len(str_array) - 1], "").strip()
-            progress = int(
-                str_array[len(str_array) - 1].replace("%", "").strip())
+        if not isinstance(out_str, ToolEvent):
+            out_str = parse_output_line(out_str)
+        if out_str.kind == 'progress':
             if callback.prev_line_progress:
                 if not silent:
-                    print('{0} {1}%'.format(label, progress), end="\r")
+                    print('{0} {1}%'.format(out_str.prefix, out_str.percent), end="\r")
             else:
                 callback.prev_line_progress = True
                 if not silent:
                     print(out_str)
-        elif "error" in out_str.lower():
+        elif out_str.kind == 'error':
             if not silent:
                 print("ERROR: {}".format(out_str))
             callback.prev_line_progress = False
-        elif "elapsed time (excluding i/o):" in out_str.lower():
-            elapsed_time = ''.join(
-                ele for ele in out_str if ele.isdigit() or ele == '.')
-            units = out_str.lower().replace("elapsed time (excluding i/o):",
-                                            "").replace(elapsed_time, "").strip()
+        elif out_str.kind == 'elapsed_time':
             if not silent:
-                print("Elapsed time: {0}{1}".format(elapsed_time, units))
+                print("Elapsed time: {0}{1}".format(out_str.elapsed_text,
+                                                    out_str.units.lower()))
             callback.prev_line_progress = False
         else:
             if callback.prev_line_progress:
@@ -275,37 +277,28 @@ def convert_help_extract_params(tool, wbt,
                                 silent=False,
                                 verbose=False):
 
-    tool = tool.strip()
-    args = {tuple(k): v for k, v in HELP[tool]}
-    help_tool = listtools[tool]
+    spec = get_tool_spec(tool.strip())
     if not to_parser:
-        return args
-    parser = argparse.ArgumentParser(description=help_tool)
-    for k, v in args.items():
-        if '--inputs' in k:
-            continue
-        if '--filter' in k and ('--filterx' in k or '--filtery' in k):
-            continue
-        kw = dict(help=v)
-        if ' flag ' in v or ' flag.' in v:
-            kw['action'] = 'store_true'
-        parser.add_argument(*k, **kw)
-    return parser
+        return {p.flags: p.description for p in spec.params}
+    return spec.parser()
 
 
 def to_rust(tool, args):
     '''Convert arguments to formats expected by Rust'''
+    np, xr = optional_imports()
     optional_imports_error(np, xr)
+    from whitebox_tools.xarray_io import (xarray_whitebox_io,
+                                          fix_path,
+                                          select_temp_dir)
+    spec = get_tool_spec(tool)
     s = []
-    outputs = (ki for k, v in HELP[tool] for ki in k)
-    outputs = filter(lambda k: k.startswith('--'), outputs)
-    outputs = tuple(_no_dash(k) for k in outputs
-                    if _is_output_field(_no_dash(k)))
-    for output in outputs:
+    temp_dir = select_temp_dir(**vars(args))
+    for output in spec.outputs:
         tok = ''.join(np.random.choice(tuple(string.ascii_letters)) for _ in range(7))
-        fname = os.path.join(WHITEBOX_TEMP_DIR, '{}-{}.dep'.format(output, tok))
+        fname = os.path.join(temp_dir, '{}-{}.dep'.format(output, tok))
         vars(args)[output] = fix_path(fname)
-    delayed_load_later, kwargs = xarray_whitebox_io(**vars(args))
+    delayed_load_later, kwargs = xarray_whitebox_io(temp_dir=temp_dir,
+                                                    **vars(args))
     for k, v in kwargs.items():
         if isinstance(v, bool):
             s.append('--{}'.format(k))
@@ -315,7 +308,8 @@ def to_rust(tool, args):
                 float(v)
                 fmt = '--{}={}'
             except:
-                if k == 'wd' or _is_input_field(k) or _is_output_field(k):
+                param = spec.by_name.get(k)
+                if k == 'wd' or (param is not None and (param.is_input or param.is_output)):
                     if isinstance(v, (unicode, str)) and v != os.path.abspath(v):
                         v = os.path.join(os.path.abspath(os.curdir), v)
                         setattr(args, k, v)
@@ -331,10 +325,17 @@ def to_rust(tool, args):
 def call_whitebox_cli(tool, args=None,
                       callback_func=None, silent=False,
                       return_xarr=True,
-                      verbose=WHITEBOX_VERBOSE):
+                      verbose=WHITEBOX_VERBOSE,
+                      cache=None):
+    ''' Runs tool with args (parsed from the command line if not given).
+    cache turns the result cache (see result_cache.py) on (True or a
+    ResultCache) or off (False); by default WHITEBOX_RESULT_CACHE decides.
+    '''
     if callback_func is None:
         callback_func = partial(callback, silent=silent)
     wbt = WhiteboxTools()
+    if cache is not None:
+        wbt.set_result_cache(cache)
     if not args:
         parser = convert_help_extract_params(tool, wbt,
                                              silent=True,
@@ -342,26 +343,30 @@ def call_whitebox_cli(tool, args=None,
         args = parser.parse_args()
     args, delayed_load_later = to_rust(tool, args)
     ret_val = wbt.run_tool(tool, args, callback_func, verbose=verbose)
+    arr_or_dset = delayed_load_later(ret_val)
     if ret_val:
         raise ValueError('WhiteBox {0} (wb-{0}) failed with args: {1}'.format(tool, args))
-    arr_or_dset = delayed_load_later(ret_val)
     if return_xarr:
+        if hasattr(arr_or_dset, 'attrs'):
+            arr_or_dset.attrs['run_result'] = ret_val
         return arr_or_dset
     return ret_val
 
 
 def call_whitebox_func(tool, **kwargs):
     callback_func = kwargs.pop('callback_func', None)
+    cache = kwargs.pop('cache', None)
     if not callback_func:
         callback_func = partial(callback, silent=True)
     args = argparse.Namespace(**kwargs)
-    return call_whitebox_cli(tool, args=args, callback_func=callback_func)
+    return call_whitebox_cli(tool, args=args, callback_func=callback_func,
+                             cache=cache)
 
 
 def get_all_parsers():
     parsers = {}
     wbt = WhiteboxTools()
-    for tool in tools:
+    for tool in sorted(_listtools()):
         parsers[tool] = convert_help_extract_params(tool, wbt, silent=True)
     return parsers
 
@@ -369,21 +374,15 @@ def get_all_parsers():
 def get_all_help(out=TOOL_DATA_FILE, refresh=REFRESH_WHITEBOX_HELP):
     if not refresh:
         return json.load(open(TOOL_DATA_FILE))
-    tool_data = {}
     wbt = WhiteboxTools()
-    for tool in tools:
-        args = convert_help_extract_params(tool, wbt,
-                                           to_parser=False,
-                                           silent=True)
-        args = [[list(k), v] for k, v in args.items()]
-        tool_data[tool] = args
+    tool_help = wbt.refresh_metadata()
+    tool_data = {tool: parse_tool_help(lines or [])
+                 for tool, lines in tool_help.items()}
     with open(out, 'w') as f:
         f.write(json.dumps(tool_data, indent=2))
     return tool_data
 
 
-HELP = get_all_help()
-
 def _no_dash(p):
     if p[:2] == '--':
         return p[2:]
@@ -394,36 +393,60 @@ def _no_dash(p):
 
 
 def _fmt_help(tool):
-    hlp = {tuple(k): v for k, v in HELP[tool]}
-    ok_params = set()
-    for k in hlp:
-        for ki in k:
-            ok_params.add(_no_dash(ki))
-    hlp = '\n'.join('{}: {}'.format(', '.join(k), v) for k,v in sorted(hlp.items()))
-    return hlp, ok_params
+    spec = get_tool_spec(tool)
+    return spec.help_text, set(spec.by_name)
 
 
 def validate_run(tool, **kwargs):
-    _, ok_params = _fmt_help(tool)
+    by_name = get_tool_spec(tool).by_name
     for k in kwargs:
-        if not k in ok_params:
-            raise ValueError('Parameter {} is not in {}'.format(k, ok_params))
+        if not k in by_name and k not in ('cache', 'nodata_mode'):
+            raise ValueError('Parameter {} is not in {}'.format(k, sorted(by_name)))
     tool = partial(call_whitebox_func, tool, callback_func=partial(callback, silent=False))
     return tool(**kwargs)
 
 
-for tool in tools:
-    globals()[tool + 'Cli'] = partial(call_whitebox_cli, tool, return_xarr=False)
-
+def _make_wrapper(tool):
     class Wrapped(object):
         _tool = tool
         __doc__ = _fmt_help(tool)[0]
         def __call__(self, **kw):
             return validate_run(self._tool, **kw)
 
-    globals()[tool] = Wrapped()
+    return Wrapped()
+
+
+def __getattr__(name):
+    ''' Creates listtools, tools, HELP, tool_names, __all__ and the tool
+    wrappers (e.g. Slope and SlopeCli) on first use.
+    '''
+    if name == 'listtools':
+        value = _listtools()
+    elif name == 'tools':
+        value = sorted(_listtools())
+    elif name == 'HELP':
+        value = _help()
+    elif name == 'tool_names':
+        value = [t + 'Cli' for t in sorted(_listtools())] + PYTHON_WHITEBOX
+    elif name == '__all__':
+        value = ['callback', 'tools',
+                 'WhiteboxTools', 'get_all_help'] + __getattr__('tool_names')
+    elif name.endswith('Cli') and name[:-3] in _listtools():
+        value = partial(call_whitebox_cli, name[:-3], return_xarr=False)
+    elif name in _listtools():
+        value = _make_wrapper(name)
+    else:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__getattr__('__all__')) |
+                  {'listtools', 'HELP', 'tool_names'})
 
 
-tool_names = [t + 'Cli' for t in tools] + PYTHON_WHITEBOX
-__all__ = ['callback', 'tools',
-           'WhiteboxTools', 'get_all_help'] + tool_names
+if sys.version_info < (3, 7):
+    # no module __getattr__ (PEP 562): create everything up front
+    for _name in __getattr__('__all__') + ['listtools', 'HELP']:
+        __getattr__(_name)
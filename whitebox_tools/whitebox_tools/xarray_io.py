@@ -1,10 +1,25 @@
 
+import atexit
+import hashlib
 import os
 import shutil
 import string
-import struct
-
-from whitebox_tools.util import optional_imports_error
+import sys
+import tempfile
+import threading
+import weakref
+
+from whitebox_tools.registry import (INPUT_ARGS,
+                                     OUTPUT_ARGS,
+                                     _is_input_field,
+                                     _is_output_field)
+from whitebox_tools.result_cache import digests_wanted, record_digest
+from whitebox_tools.util import (FLOAT_DEP_FIELDS,
+                                 INT_DEP_FIELDS,
+                                 UPPER_STR_FIELDS,
+                                 fix_path,
+                                 optional_imports_error,
+                                 read_dep_header as _from_dep)
 try:
     import numpy as np
     import xarray as xr
@@ -13,22 +28,41 @@ except:
 
 
 
-INPUT_ARGS = ['input', 'inputs', 'i', 'pour_pts',
-              'd8_pntr', 'dem', 'input1', 'input2', 'input3',
-              'i1', 'i2', 'i3', 'input_x', 'input_y',
-              'streams', 'flow_accum', 'sca',
-              'nir', 'red','blue', 'green', 'pan',
-              'destination', 'base', 'seed_pts',
-              'source','cost', 'slope',
-              'flow_dir', 'comparison', 'linkid',
-              'watersheds']
-OUTPUT_ARGS = ['output', 'outputs', 'o']
-
 WHITEBOX_TEMP_DIR = os.environ.get('WHITEBOX_TEMP_DIR')
-DTYPES = {'float': 'f4',
-          'integer': 'i2'}
+# RAM-backed (tmpfs) directory for tool runs whose inputs are all in
+# memory.  If it is not set, each process makes a private directory in
+# MEMORY_ROOT, see memory_dir
+WHITEBOX_MEMORY_DIR = os.environ.get('WHITEBOX_MEMORY_DIR')
+MEMORY_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') else None
+# "nan" replaces the nodata values of loaded rasters with NaN and
+# "keep" leaves them (and integer dtypes) as they are, see assign_nodata
+NODATA_MODES = ('nan', 'keep')
+WHITEBOX_NODATA_MODE = os.environ.get('WHITEBOX_NODATA_MODE', 'nan')
+# Tool outputs of at least this many bytes are memory-mapped, not read
+WHITEBOX_MMAP_BYTES = int(float(os.environ.get('WHITEBOX_MMAP_BYTES', 2 ** 26)))
+# .dep Data Types and their numpy dtypes, as read and written by
+# src/raster/whitebox_raster.rs
+DTYPES = {'byte': 'u1',
+          'integer': 'i2',
+          'i32': 'i4',
+          'float': 'f4',
+          'double': 'f8'}
+# numpy dtypes (kind and size) to the .dep Data Type holding them
+# exactly: BYTE is read as unsigned, and there are no unsigned or
+# 64 bit integer types, so those go to the next wider type.  DOUBLE
+# only holds integers up to MAX_EXACT_INT exactly: 64 bit integer
+# arrays with larger values are rejected, see _exact_doubles
+NUMPY_DEP_TYPES = {'b1': 'byte', 'u1': 'byte',
+                   'i1': 'integer', 'i2': 'integer',
+                   'u2': 'i32', 'i4': 'i32',
+                   'u4': 'double', 'i8': 'double', 'u8': 'double',
+                   'f2': 'float', 'f4': 'float',
+                   'f8': 'double'}
+MAX_EXACT_INT = 2 ** 53
 ENDIAN = {'LITTLE_ENDIAN': '<',
           'BIG_ENDIAN': '>',}
+# Bytes of converted values to_tas writes at a time
+TAS_CHUNK_BYTES = 1 << 24
 
 OK_DATA_SCALES = ['continuous', 'categorical', 'Boolean', 'rgb']
 
@@ -40,11 +74,6 @@ OPTIONAL_DEP_FIELDS = ['display_min', 'display_max',
 REQUIRED_DEP_FIELDS = ['max', 'min', 'north', 'south', 'east', 'west',
                        'cols', 'rows', 'dtype', 'z_units', 'xy_units',
                        'data_scale']
-FLOAT_DEP_FIELDS = ['Min', 'Max',
-                    'North', 'South', 'East', 'West',
-                    'Display Min', 'Display Max']
-INT_DEP_FIELDS = ['Cols', 'Rows', 'Stacks']
-UPPER_STR_FIELDS = ['Data Type', 'Byte Order']
 
 if not WHITEBOX_TEMP_DIR:
     WHITEBOX_TEMP_DIR = os.path.expanduser('~/.whitebox_tools_tempdir')
@@ -83,16 +112,6 @@ Byte Order: {byte_order}
 DEP_KEYS = [x.split(':')[0].strip() for x in DEP_TEMPLATE.splitlines()
             if ':' in x]
 
-def _is_output_field(field):
-    is_out = field in OUTPUT_ARGS
-    is_out2 = field.startswith('out_') and field != 'out_type'
-    return is_out or is_out2
-
-
-def _is_input_field(field):
-    return field in INPUT_ARGS
-
-
 def not_2d_error():
     raise NotImplementedError('Only 2-D rasters are supported by xarray wrapper currently')
 
@@ -101,29 +120,140 @@ def _lower_key(k):
     return '_'.join(k.lower().split())
 
 
-def _assign_nodata(arr):
-    attrs = arr.attrs
-    no_data = [v for k, v in attrs.items()
+def _is_dask(vals):
+    '''True for dask arrays (without importing dask)'''
+    return hasattr(vals, 'dask') and hasattr(vals, 'chunks')
+
+
+def _nodata_value(arr):
+    no_data = [v for k, v in arr.attrs.items()
                if k.lower() == 'nodata']
-    if not no_data:
+    if not no_data or no_data[0] in ('', None):
+        return None
+    return np.float64(no_data[0])
+
+
+def _nan_dtype(dtype):
+    '''The float dtype that holds every value of dtype and NaN:
+    float32 for floats and integers of up to 16 bits'''
+    if dtype.kind == 'f' or (dtype.kind in 'iub' and dtype.itemsize <= 2):
+        return np.dtype(np.float32) if dtype.itemsize <= 4 else dtype
+    return np.dtype(np.float64)
+
+
+if xr is not None:
+    from xarray.backends import BackendArray
+    from xarray.core import indexing
+
+    class _NodataAsNan(BackendArray):
+        '''A numpy.memmap read with its nodata cells as NaN, converting
+        only the parts that are indexed, so that pages never used are
+        never read'''
+        def __init__(self, vals, no_data, dtype):
+            self.vals = vals
+            self.no_data = no_data
+            self.shape = vals.shape
+            self.dtype = dtype
+
+        def __getitem__(self, key):
+            return indexing.explicit_indexing_adapter(
+                key, self.shape, indexing.IndexingSupport.BASIC, self._getitem)
+
+        def _getitem(self, key):
+            vals = np.array(self.vals[key], dtype=self.dtype)
+            vals[vals == self.no_data] = np.nan
+            return vals
+
+
+def _assign_nodata(arr, mode=None):
+    mode = mode or WHITEBOX_NODATA_MODE
+    if mode not in NODATA_MODES:
+        raise ValueError('nodata mode must be one of {} (got {!r})'.format(NODATA_MODES, mode))
+    no_data = _nodata_value(arr)
+    if no_data is None or mode == 'keep':
+        return arr
+    dtype = _nan_dtype(arr.dtype)
+    if _is_dask(arr.data):
+        import dask.array as da
+        data = arr.data.astype(dtype)
+        arr.data = da.where(data == no_data, np.nan, data)
         return arr
-    no_data = np.float64(no_data[0])
-    if 'int' in arr.dtype.name:
-        arr.values = arr.values.astype(np.float64)
-    arr.values[arr.values == no_data] = np.NaN
+    if isinstance(arr.variable._data, np.memmap):
+        # read lazily, as xarray's file backends do: converting the
+        # values now would read the whole file into memory
+        arr.variable.data = indexing.MemoryCachedArray(indexing.LazilyIndexedArray(
+            _NodataAsNan(arr.variable._data, no_data, dtype)))
+        return arr
+    vals = arr.values
+    if vals.dtype != dtype:
+        arr.values = vals = vals.astype(dtype)
+    # a band of rows at a time, so the mask stays small
+    r = vals.shape[0]
+    rows = max(1, TAS_CHUNK_BYTES // max(1, vals[:1].nbytes))
+    for start in range(0, r, rows):
+        band = vals[start:start + rows]
+        band[band == no_data] = np.nan
     return arr
 
 
-def assign_nodata(dset_or_arr):
+def assign_nodata(dset_or_arr, mode=None):
+    '''Replace the nodata value (the "Nodata" attr) with NaN
+
+    Parameters:
+        dset_or_arr: DataArray or Dataset, changed in place
+        mode: "nan" to replace nodata with NaN, converting integer
+              rasters to float32 (float64 for integers wider than
+              16 bits), or "keep" to leave the values and dtype
+              as they are; see nodata_mask.  Defaults to
+              WHITEBOX_NODATA_MODE.  The values of memory-mapped
+              arrays (see from_dep) are converted lazily, as they
+              are indexed or loaded
+    Returns:
+        dset_or_arr
+    '''
     optional_imports_error(np, xr)
     if isinstance(dset_or_arr, xr.Dataset):
         for k, v in dset_or_arr.data_vars.items():
-            _assign_nodata(v)
+            _assign_nodata(v, mode)
     else:
-        _assign_nodata(dset_or_arr)
+        _assign_nodata(dset_or_arr, mode)
     return dset_or_arr
 
 
+def nodata_mask(arr, packed=False):
+    '''Mask of an array's nodata cells, for arrays loaded with the
+    "keep" nodata mode
+
+    Parameters:
+        arr: DataArray with a "Nodata" attr
+        packed: If True return the mask bit-packed along the last
+                axis (numpy.packbits), an eighth of the size
+    Returns:
+        boolean numpy (or dask, computed lazily) array.  Without a
+        nodata value, the NaN cells of float arrays are masked
+    '''
+    no_data = _nodata_value(arr)
+    data = arr.data
+    if no_data is None:
+        mask = data != data if data.dtype.kind == 'f' else np.zeros(data.shape, bool)
+    else:
+        mask = data == no_data
+    if packed:
+        if _is_dask(mask):
+            # packing needs whole rows: bits of a byte span chunks
+            mask = mask.rechunk({mask.ndim - 1: -1})
+            chunks = mask.chunks[:-1] + (((mask.shape[-1] + 7) // 8,),)
+            return mask.map_blocks(np.packbits, axis=-1, dtype=np.uint8, chunks=chunks)
+        return np.packbits(mask, axis=-1)
+    return mask
+
+
+def masked(arr):
+    '''The values of arr as a numpy.ma.MaskedArray sharing its buffer,
+    with nodata cells masked'''
+    return np.ma.MaskedArray(arr.values, mask=np.asarray(nodata_mask(arr)), copy=False)
+
+
 class MissingDepMetadata(ValueError):
     pass
 
@@ -156,80 +286,72 @@ def case_insensitive_attrs(attrs, typ):
     return lower
 
 
-def fix_path(path):
-    '''Handle commas and semicolons in paths for >1 input file'''
-    if ';' in path:
-        paths = path.split(';')
-    else:
-        paths = path.split(', ')
-    paths = [os.path.abspath(os.path.join(os.curdir, path))
-             for path in paths]
-    if len(paths) == 1:
-        return paths[0]
-    return ', '.join(paths)
-
-
 def to_tas(vals, typ_str, fname):
     '''Dump array to .tas file
     Parameters:
         vals: numpy array, typicall 2D
-        typ_str: "integer" or "float"
+        typ_str: a .dep Data Type, e.g. "integer" or "float"
         fname: output path
     Returns:
         None
     '''
     if vals.ndim != 2:
         not_2d_error()
+    dtype = np.dtype(ENDIAN['LITTLE_ENDIAN'] + DTYPES[typ_str.lower()])
+    with open(fname, 'wb') as f:
+        for band in _tas_bands(vals, dtype):
+            band.tofile(f)
+
+
+def _tas_bands(vals, dtype):
+    '''Yields the rows of a 2D numpy or dask array as contiguous
+    numpy arrays of dtype, in bands of at most TAS_CHUNK_BYTES'''
+    if isinstance(vals, np.ndarray) and vals.dtype == dtype and vals.flags.c_contiguous:
+        # the array's buffer is the file's contents: write it as is
+        yield vals
+        return
     r, c = vals.shape
-    if typ_str == 'integer':
-        abbrev = 'h'
+    rows = max(1, TAS_CHUNK_BYTES // max(1, c * dtype.itemsize))
+    if _is_dask(vals):
+        # bands within a row of chunks, so each chunk is computed once
+        # (or once per band, if one row of chunks is too large)
+        bounds = np.cumsum((0,) + tuple(vals.chunks[0]))
     else:
-        abbrev = 'f'
-    with open(fname, 'wb') as f:
-        for i in range(r):
-            f.write(struct.pack(abbrev * c, *vals[i, :]))
-
-
-def _from_dep(fname):
-    '''Load just the .dep file's metadata, not the .tas'''
-    with open(fname) as f:
-        content = f.read()
-    attrs = {}
-    for line in content.splitlines():
-        parts = line.strip().split(':')
-        key, value = parts[0], ':'.join(parts[1:]).strip()
-        key = key.strip().title()
-        if key in INT_DEP_FIELDS:
-            value = int(value)
-        elif key in FLOAT_DEP_FIELDS:
-            value = float(value)
-        elif key not in UPPER_STR_FIELDS:
-            value = value.upper()
-        if key == 'Metadata Entry':
-            if not key in attrs:
-                attrs[key] = value
-            else:
-                attrs[key] += '\n' + value
-        else:
-            attrs[key] = value
-    return attrs
+        bounds = (0, r)
+    for chunk_start, chunk_stop in zip(bounds[:-1], bounds[1:]):
+        for start in range(chunk_start, chunk_stop, rows):
+            stop = min(start + rows, chunk_stop)
+            yield np.ascontiguousarray(vals[start:stop], dtype=dtype)
 
 
 def _get_dtype(dtype_str):
-    '''map numpy type to .dep Data Type'''
-    if 'float' in dtype_str.lower():
-        return ('float', DTYPES['float'])
-    else:
-        return ('integer', DTYPES['integer'])
+    '''map numpy type name or .dep Data Type to
+    (.dep Data Type, numpy dtype without byte order)'''
+    name = (dtype_str or '').strip().lower()
+    if name in DTYPES:
+        return (name, DTYPES[name])
+    try:
+        dtype = np.dtype(name)
+    except TypeError:
+        raise ValueError('Unsupported .dep Data Type {!r} (expected one of {})'.format(
+            dtype_str, sorted(DTYPES)))
+    typ_str = NUMPY_DEP_TYPES.get('{}{}'.format(dtype.kind, dtype.itemsize), 'double')
+    return (typ_str, DTYPES[typ_str])
 
 
-def from_dep(dep, tas=None):
+def from_dep(dep, tas=None, mmap=False, chunks=None):
     optional_imports_error(np, xr)
     '''Load a .dep file and corresponding .tas file
 
     Parameters:
        dep:  Path to a .dep file
        tas:  Optional path to .tas file or guessed from .dep
+       mmap: If True (or "c"), back the values by a copy-on-write
+             numpy.memmap of the .tas, read from disk as they are
+             used; "r" maps it read-only
+       chunks: If given, return a dask-backed DataArray with these
+               chunks (see dask.array.from_array), read from the
+               .tas block by block as it is computed
     Returns:
        arr:  xarray.DataArray
 
@@ -242,11 +364,20 @@ def from_dep(dep, tas=None):
         raise ValueError('Expected .tas file at {} (guessed from {})'.format(tas, dep))
     attrs = _from_dep(dep)
     _, dtype = _get_dtype(attrs.get('Data Type'))
-    byte_order = attrs.get('byte_order')
+    byte_order = attrs.get('Byte Order', '').upper()
     if byte_order in ENDIAN:
         dtype = ENDIAN[byte_order] + dtype
-    val = np.fromfile(tas, dtype=dtype)
-    val.resize(attrs['Rows'], attrs['Cols'])
+    if chunks is not None:
+        import dask.array as da
+        val = da.from_array(np.memmap(tas, dtype=dtype, mode='r',
+                                      shape=(attrs['Rows'], attrs['Cols'])),
+                            chunks=chunks)
+    elif mmap:
+        val = np.memmap(tas, dtype=dtype, shape=(attrs['Rows'], attrs['Cols']),
+                        mode='c' if mmap is True else mmap)
+    else:
+        val = np.fromfile(tas, dtype=dtype)
+        val.resize(attrs['Rows'], attrs['Cols'])
     attrs['filename'] = [dep, tas]
     dims = ('y', 'x')
     y = np.linspace(attrs['South'], attrs['North'], attrs['Rows'] + 1)[:-1]
@@ -255,20 +386,27 @@ def from_dep(dep, tas=None):
     return xr.DataArray(val, coords=coords, dims=dims, attrs=attrs)
 
 
-def data_array_to_dep(arr, fname=None, tag=None, **dep_kwargs):
-    '''Dump a DataArray to fname or a tag (for temp dir)
+def _exact_doubles(vals):
+    '''Returns 64 bit integer values as little endian doubles, raising
+    ValueError if any is too large for a double to hold exactly'''
+    if vals.size and (vals.min() < -MAX_EXACT_INT or vals.max() > MAX_EXACT_INT):
+        raise ValueError('{} values beyond +/-2**53 cannot be written exactly to a '
+                         '.dep file (its widest type is DOUBLE)'.format(vals.dtype))
+    return vals.astype('<f8')
 
-    Parameters:
-        arr: DataArray with the attrs composed of .dep
-             fields
-        fname: File name
-        tag: shorthand tag for use with temp dir
-    Returns:
-        (dep_file_name, tas_file_name) tuple
-    '''
-    val = arr.values
+
+def _serialize(arr, **dep_kwargs):
+    '''Returns (val, typ_str, dep_text): the little endian values of
+    a DataArray (still a dask array if it was one), "integer" or
+    "float", and its .dep header'''
+    val = arr.data if _is_dask(arr.data) else arr.values
     typ_str, dtype = _get_dtype(val.dtype.name)
-    val = val.astype('<' + dtype)
+    if val.dtype.kind in 'iu' and val.dtype.itemsize == 8:
+        val = (val.map_blocks(_exact_doubles, dtype='<f8') if _is_dask(val)
+               else _exact_doubles(val))
+    else:
+        # no copy if the values are already in the .tas dtype
+        val = val.astype('<' + dtype, copy=False)
     try:
         attrs = case_insensitive_attrs(arr.attrs, typ_str)
     except MissingDepMetadata:
@@ -277,34 +415,262 @@ def data_array_to_dep(arr, fname=None, tag=None, **dep_kwargs):
     attrs['byte_order'] = 'LITTLE_ENDIAN'
     if val.ndim != 2 or attrs.get('stacks') > 1:
         not_2d_error()
+    metadata_entry = attrs.get('metadata_entry', '')
+    attrs['metadata_entry'] = ''.join('\nMetadata Entry: {}'.format(m)
+                                      for m in metadata_entry.splitlines())
+    return val, typ_str, DEP_TEMPLATE.format(**attrs)
+
+
+def _write_dep_tas(val, typ_str, dep_text, dep, tas, tas_digest=None):
+    with open(dep, 'w') as f:
+        f.write(dep_text)
+    to_tas(val, typ_str, tas)
+    if tas_digest is None:
+        if _is_dask(val) or not digests_wanted():
+            # hashing would compute a dask array a second time, and
+            # without a result cache nothing needs the digest: the
+            # result cache hashes the file if it needs to after all
+            return
+        # the .tas holds exactly these bytes: hash them from memory
+        # rather than reading the file back for the result cache key
+        tas_digest = _content_digest(val)
+    record_digest(tas, tas_digest)
+
+
+def data_array_to_dep(arr, fname=None, tag=None, temp_dir=None, **dep_kwargs):
+    '''Dump a DataArray to fname or a tag (for temp dir)
+
+    Parameters:
+        arr: DataArray with the attrs composed of .dep
+             fields
+        fname: File name
+        tag: shorthand tag for use with temp dir
+        temp_dir: directory for tag (default WHITEBOX_TEMP_DIR)
+    Returns:
+        (dep_file_name, tas_file_name) tuple
+    '''
+    val, typ_str, dep_text = _serialize(arr, **dep_kwargs)
     if not fname:
         tag = str(tag)
-        fname = os.path.join(WHITEBOX_TEMP_DIR, tag)
+        fname = os.path.join(temp_dir or WHITEBOX_TEMP_DIR, tag)
     dep, tas = fname + '.dep', fname + '.tas'
-    with open(dep, 'w') as f:
-        metadata_entry = attrs.get('metadata_entry', '')
-        at = attrs.copy()
-        at['metadata_entry'] = ''.join('\nMetadata Entry: {}'.format(m)
-                                       for m in metadata_entry.splitlines())
-        f.write(DEP_TEMPLATE.format(**at))
-    to_tas(val, typ_str, tas)
+    _write_dep_tas(val, typ_str, dep_text, dep, tas)
     return dep, tas
 
 
+def _content_digest(val):
+    '''sha256 hex digest of the .tas bytes of a numpy array, hashed a
+    band of rows at a time rather than copied whole'''
+    sha = hashlib.sha256()
+    for band in _tas_bands(val, val.dtype):
+        sha.update(band)
+    return sha.hexdigest()
+
+
+class SerializedArrays(object):
+    '''The .dep/.tas files DataArray tool inputs were written to,
+    reused while the DataArray is alive and unchanged
+
+    The files are named by a digest of their contents, so arrays with
+    new values (in place or not) or attrs get new files, and equal
+    arrays share them.  Hashing reads the array once, which is cheaper
+    than writing it again.  They are reference counted:
+    each live DataArray that was written to them and each tool run
+    using them holds a reference, and they are removed when the last
+    one is released.
+    '''
+    def __init__(self):
+        self._refs = {}
+        self._arrays = {}
+        # an RLock as a DataArray's finalizer may run (and release)
+        # whenever the garbage collector does, lock held or not
+        self._lock = threading.RLock()
+
+    def acquire(self, arr, temp_dir=None, **dep_kwargs):
+        '''Returns the (dep, tas) files of arr in temp_dir (default
+        WHITEBOX_TEMP_DIR), writing them unless they are up to date.
+        Call release(dep) once the tool run using them is done.'''
+        val, typ_str, dep_text = _serialize(arr, **dep_kwargs)
+        if _is_dask(val):
+            # a dask array's name is a token of the graph computing it
+            tas_digest = None
+            fingerprint = 'dask:' + val.name
+        else:
+            tas_digest = fingerprint = _content_digest(val)
+        key = hashlib.sha256((fingerprint + dep_text).encode('utf-8')).hexdigest()
+        stem = os.path.join(temp_dir or WHITEBOX_TEMP_DIR,
+                            'xarray-{}-{}'.format(os.getpid(), key[:24]))
+        dep, tas = stem + '.dep', stem + '.tas'
+        with self._lock:
+            if not (stem in self._refs and os.path.exists(dep) and os.path.exists(tas)):
+                _write_dep_tas(val, typ_str, dep_text, dep, tas, tas_digest)
+                self._refs.setdefault(stem, 0)
+            self._refs[stem] += 1
+            tracked = self._arrays.get(id(arr))
+            if tracked != stem:
+                self._refs[stem] += 1
+                self._arrays[id(arr)] = stem
+                if tracked is None:
+                    weakref.finalize(arr, self._forget, id(arr))
+                else:
+                    self._release(tracked)
+        return dep, tas
+
+    def release(self, dep):
+        '''Releases the files acquired for a tool run'''
+        with self._lock:
+            self._release(os.path.splitext(dep)[0])
+
+    def _forget(self, arr_id):
+        with self._lock:
+            stem = self._arrays.pop(arr_id, None)
+            if stem is not None:
+                self._release(stem)
+
+    def _release(self, stem):
+        self._refs[stem] -= 1
+        if self._refs[stem] <= 0:
+            del self._refs[stem]
+            for fname in (stem + '.dep', stem + '.tas'):
+                if os.path.exists(fname):
+                    os.remove(fname)
+
+
+SERIALIZED_ARRAYS = SerializedArrays()
+
+
+# memory directories handed out by memory_dir
+_MEMORY_DIRS = set()
+_MEMORY_LOCK = threading.Lock()
+_private_memory_dir = None
+
+
+def _is_private_dir(path):
+    '''True if path is a directory (not a symlink) only the current
+    user can write to'''
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not os.path.isdir(path) or os.path.islink(path):
+        return False
+    if hasattr(os, 'getuid'):
+        return st.st_uid == os.getuid() and not st.st_mode & 0o022
+    return os.access(path, os.W_OK)
+
+
+def memory_dir():
+    '''Returns the RAM-backed directory for in-memory tool runs, or
+    None if there is none the current user can safely use
+
+    WHITEBOX_MEMORY_DIR is used if it is set (and created with mode
+    0700 if missing); otherwise a private directory is made in
+    MEMORY_ROOT for the process, and removed when it exits.
+    '''
+    global _private_memory_dir
+    with _MEMORY_LOCK:
+        if WHITEBOX_MEMORY_DIR:
+            path = WHITEBOX_MEMORY_DIR
+            if not os.path.exists(path):
+                try:
+                    os.makedirs(path, 0o700)
+                except OSError:
+                    pass
+            # someone else's directory may be read or planted with
+            # symlinks by them
+            if not _is_private_dir(path):
+                return None
+        elif MEMORY_ROOT:
+            path = _private_memory_dir
+            if path is None or not os.path.isdir(path):
+                try:
+                    path = tempfile.mkdtemp(prefix='whitebox_tools-', dir=MEMORY_ROOT)
+                except OSError:
+                    return None
+                atexit.register(shutil.rmtree, path, True)
+                _private_memory_dir = path
+        else:
+            return None
+        _MEMORY_DIRS.add(path)
+        return path
+
+
+def _serialized_size(inputs, n_outputs):
+    '''Bytes the .tas files of a tool run take: those of the inputs,
+    and as many outputs, as large as the largest input in DOUBLE'''
+    cells = []
+    size = 0
+    for v in inputs:
+        arrs = [v] if isinstance(v, xr.DataArray) else list(v.data_vars.values())
+        for arr in arrs:
+            _, dtype = _get_dtype(arr.dtype.name)
+            size += arr.size * np.dtype(dtype).itemsize
+            cells.append(arr.size)
+    return size + n_outputs * max(cells or [0]) * 8
+
+
+def select_temp_dir(n_outputs=None, **kwargs):
+    '''Choose the directory for a tool run's temporary .dep/.tas files
+
+    Parameters:
+       n_outputs:  Number of output rasters that will be written there
+                   (default: one per output argument in kwargs), e.g.
+                   by several runs with the same inputs
+       kwargs:  Keyword arguments to the tool, e.g. --dem
+    Returns:
+       memory_dir() if it is available, every input is an
+       in-memory (not dask-backed) xarray object and the inputs
+       and outputs fit in it, else WHITEBOX_TEMP_DIR
+    '''
+    inputs = [v for k, v in kwargs.items()
+              if _is_input_field(k) and v is not None]
+    if not inputs:
+        return WHITEBOX_TEMP_DIR
+    if not all(isinstance(v, (xr.DataArray, xr.Dataset)) for v in inputs):
+        return WHITEBOX_TEMP_DIR
+    if any(_is_dask(v.data) if isinstance(v, xr.DataArray) else
+           any(_is_dask(a.data) for a in v.data_vars.values())
+           for v in inputs):
+        return WHITEBOX_TEMP_DIR
+    temp_dir = memory_dir()
+    if temp_dir is None:
+        return WHITEBOX_TEMP_DIR
+    # tmpfs is often small (64 MB in a default Docker container)
+    if n_outputs is None:
+        n_outputs = sum(1 for k, v in kwargs.items() if _is_output_field(k) and v is not None)
+    if (hasattr(shutil, 'disk_usage') and
+            shutil.disk_usage(temp_dir).free < _serialized_size(inputs, max(1, n_outputs))):
+        return WHITEBOX_TEMP_DIR
+    return temp_dir
+
+
 def xarray_whitebox_io(**kwargs):
     '''Returns a callable to be used after WhiteBox tool runs -
     the callable returns an xarray.DataArray or Dataset
 
     Parameters:
        kwargs:  Keyword arguments to the tool, e.g. --dem
+       temp_dir: directory for serialized inputs (default
+           WHITEBOX_TEMP_DIR).  Outputs are removed after
+           loading (or a failed run) when it is memory_dir()
+       nodata_mode: "nan" or "keep", see assign_nodata
     Returns:
        tuple of (func, kwargs) where kwargs are input
-           kwargs modified in place
+           kwargs modified in place.  func releases the
+           serialized inputs (see SerializedArrays), and
+           loads the outputs if the return code is 0,
+           memory-mapping those of WHITEBOX_MMAP_BYTES or more,
+           or as dask arrays if an input was one
     '''
     optional_imports_error(np, xr)
     load_afterwards = {}
     delete_tempdir = kwargs.pop('delete_tempdir', True)
+    nodata_mode = kwargs.pop('nodata_mode', None)
+    temp_dir = kwargs.pop('temp_dir', None) or WHITEBOX_TEMP_DIR
+    in_memory = temp_dir in _MEMORY_DIRS
     fnames = {}
+    acquired = []
+    chunks = None
     dumped_an_xarray = used_str = False
     for k, v in kwargs.items():
         if _is_input_field(k):
@@ -314,29 +680,53 @@ def xarray_whitebox_io(**kwargs):
             elif isinstance(v, xr.Dataset):
                 if k in ('input', 'dem'):
                     raise ValueError('Cannot use xarray.Dataset unless the tool allows --inputs.  Here --input was used, and the tool must be called for each xarray.DataArray')
+                deps = []
                 for k2 in v.data_vars:
                     data_arr = getattr(v, k2)
-                    dep, tas = data_array_to_dep(data_arr, tag=k2)
-                    fnames[(k, k2)] = [dep, tas]
-                kwargs[k] = ', '.join(dep for (k1, k2), (dep, tas) in fnames.items()
-                                      if k1 == k)
+                    if _is_dask(data_arr.data):
+                        chunks = chunks or data_arr.data.chunksize
+                    dep, tas = SERIALIZED_ARRAYS.acquire(data_arr, temp_dir=temp_dir)
+                    deps.append(dep)
+                acquired.extend(deps)
+                kwargs[k] = ', '.join(deps)
                 dumped_an_xarray = k
             elif isinstance(v, xr.DataArray):
-                kwargs[k] = data_array_to_dep(v, tag=k)[0]
+                if _is_dask(v.data):
+                    chunks = chunks or v.data.chunksize
+                dep, tas = SERIALIZED_ARRAYS.acquire(v, temp_dir=temp_dir)
+                acquired.append(dep)
+                kwargs[k] = dep
                 dumped_an_xarray = k
         elif _is_output_field(k):
             load_afterwards[k] = fix_path(v)
     def delayed_load_later(ret_val):
-        if not load_afterwards:
+        while acquired:
+            SERIALIZED_ARRAYS.release(acquired.pop())
+        if ret_val and in_memory:
+            # whatever a failed tool wrote would otherwise fill up RAM
+            for paths in load_afterwards.values():
+                for path in paths.split(', '):
+                    for fname in (path, path[:-4] + '.tas'):
+                        if os.path.exists(fname):
+                            os.remove(fname)
+        if ret_val or not load_afterwards:
             return ret_val
         data_arrs = {}
         attrs = dict(kwargs=kwargs, return_code=ret_val)
 
         for k, paths in load_afterwards.items():
             for path in paths.split(', '):
-                data_arrs[k] = from_dep(path)
+                tas = path[:-4] + '.tas'
+                # Windows cannot remove the mapped files of in_memory runs
+                can_map = not (in_memory and sys.platform == 'win32')
+                mmap = (can_map and os.path.exists(tas) and
+                        os.path.getsize(tas) >= WHITEBOX_MMAP_BYTES)
+                data_arrs[k] = from_dep(path, mmap=mmap,
+                                        chunks=chunks if can_map else None)
                 data_arrs[k].attrs.update(attrs)
-        dset = assign_nodata(xr.Dataset(data_arrs, attrs=attrs))
+                if in_memory:
+                    fnames[(k, path)] = data_arrs[k].attrs['filename']
+        dset = assign_nodata(xr.Dataset(data_arrs, attrs=attrs), nodata_mode)
         for dep, tas in fnames.values():
             for fname in (dep, tas):
                 os.remove(fname)
@@ -373,12 +763,7 @@ def add_dep_meta(arr,
         v[np.isnan(v)] = no_data
     y = getattr(arr, y_coord_name).values
     x = getattr(arr, x_coord_name).values
-    if 'float' in v.dtype.name:
-        dtype_str = 'float'
-        dtype = '<f4'
-    else:
-        dtype_str = 'integer'
-        dtype_str = '<2'
+    dtype, _ = _get_dtype(v.dtype.name)
     dep_file = {
         'Min': v.min(), 'Max': v.min(),
         'North': y.max(), 'South': y.min(),